@@ -1,17 +1,16 @@
 #!/usr/bin/env python3.7
 
 import click
-import factom
 import json
-from factom import Factomd, FactomWalletd
-from factom_keys.ec import ECAddress, ECPrivateKey
+from factom_keys.ec import ECAddress
 from factom_keys.fct import FactoidAddress, FactoidPrivateKey
-from typing import List
 
-import alchemy.main
 import alchemy.consts as consts
 import alchemy.rpc
-import alchemy.transactions.models
+import alchemy.storage
+
+# Commands import what they need themselves (alchemy.main, factom, alchemy.transactions.models, ...) so that quick
+# commands like get-sync-head don't pay for loading pylxr, plyvel, numpy, pandas or plotly.
 
 
 HEADER = r"""
@@ -36,10 +35,21 @@ def main():
 
 @main.command()
 @click.option("--testnet", is_flag=True)
-def run(testnet):
+@click.option("--profile", type=int, default=0, help="Profile the next N blocks executed")
+@click.option("--reverify-signatures", is_flag=True, help="Ignore cached transaction signature verdicts")
+@click.option("--storage", type=click.Choice(alchemy.storage.ENGINES), default="leveldb")
+@click.option("--lxr-map-size-bits", type=int, default=30, help="Only change this to sync a synthetic chain")
+@click.option("--grader", type=str, default="stock", help="Grader to execute blocks with. Others fork from PegNet.")
+@click.option("--shadow-grader", type=str, multiple=True, help="Also grade every block with this grader, for research")
+@click.option("--archive-oprs", is_flag=True, help="Archive the verified top 50 of every block for grader research")
+def run(testnet, profile, reverify_signatures, storage, lxr_map_size_bits, grader, shadow_grader, archive_oprs):
     """Main entry point for the node"""
+    import alchemy.main
+
     print(HEADER)
-    alchemy.main.run(testnet)
+    alchemy.main.run(
+        testnet, profile, reverify_signatures, storage, lxr_map_size_bits, grader, shadow_grader, archive_oprs
+    )
 
 
 @main.command()
@@ -49,6 +59,9 @@ def run(testnet):
 @click.option("--dry-run", is_flag=True)
 def burn(amount, fct_address, testnet, dry_run):
     """Burn FCT for pFCT"""
+    import factom
+    from factom import Factomd, FactomWalletd
+
     factomd = Factomd()
     try:
         balance = factomd.factoid_balance(fct_address).get("balance")
@@ -95,6 +108,10 @@ def burn(amount, fct_address, testnet, dry_run):
 @click.option("--dry-run", is_flag=True)
 def convert(amount, from_ticker, address, to, ec_address, dry_run):
     """Perform a conversion between assets"""
+    import factom
+    import alchemy.transactions.models
+    from factom import Factomd, FactomWalletd
+
     # Input validation
     if from_ticker[0] != "p" or from_ticker[1:] not in consts.ALL_ASSETS:
         print(f"Error: invalid ticker symbol ({from_ticker})\n")
@@ -160,6 +177,10 @@ def convert(amount, from_ticker, address, to, ec_address, dry_run):
 @click.option("--dry-run", is_flag=True)
 def send(amount, from_ticker, address, to, ec_address, dry_run):
     """Send a like-kind transaction"""
+    import factom
+    import alchemy.transactions.models
+    from factom import Factomd, FactomWalletd
+
     # Input validation
     if from_ticker[0] != "p" or from_ticker[1:] not in consts.ALL_ASSETS:
         print(f"Error: invalid ticker symbol ({from_ticker})\n")
@@ -230,6 +251,122 @@ def reset():
     print(f"Deleted database at: {path}")
 
 
+@main.command()
+@click.option("--to", "height", required=True, type=int, help="Height of the last block to keep")
+@click.option("--testnet", is_flag=True)
+@click.option("--storage", type=click.Choice(["leveldb", "sqlite"]), default="leveldb")
+@click.confirmation_option(prompt="Are you sure you want to rewind the database?")
+def rewind(height, testnet, storage):
+    """
+    Undo all blocks above the given height, also dropping them from the price and difficulty CSV exports (but not
+    those of shadow graders). The node must be stopped.
+    """
+    import alchemy.csv_exporting
+    from alchemy.db import AlchemyDB
+
+    try:
+        database = AlchemyDB(testnet, storage)
+    except IOError:
+        print("Error: failed to open the database, ensure alchemy is not running")
+        return
+    try:
+        database.rewind(height, progress=lambda h: print(f"Undid block {h}"))
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    finally:
+        database.close()
+    alchemy.csv_exporting.truncate(height, alchemy.csv_exporting.prices_filename)
+    alchemy.csv_exporting.truncate(height, alchemy.csv_exporting.difficulties_filename)
+    print(f"Done. Sync head is now {height}")
+
+
+@main.command()
+@click.argument("fixture", type=click.Path(exists=True, dir_okay=False))
+@click.option("--port", type=int, default=8088)
+@click.option("--block-time", type=float, default=0, help="Release one more block every N seconds")
+@click.option("--initial-height", type=int, help="Highest block visible at start when releasing blocks over time")
+@click.option("--latency", type=float, default=0, help="Seconds to delay each response")
+@click.option("--jitter", type=float, default=0, help="Up to N more seconds of random delay per response")
+@click.option("--failure-rate", type=float, default=0, help="Fraction of requests to fail with an internal error")
+def factomd_standin(fixture, port, block_time, initial_height, latency, jitter, failure_rate):
+    """Serve the factomd API from a fixture file, for offline testing and benchmarks"""
+    import alchemy.factomd_standin as standin
+
+    chain = standin.Chain(standin.load_fixture(fixture))
+    server = standin.make_server(
+        standin.FactomdStandin(chain, block_time, initial_height, latency, jitter, failure_rate), port=port
+    )
+    print(f"Serving blocks {chain.first_height} to {chain.last_height} on http://127.0.0.1:{port}/v2")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+@main.command()
+@click.argument("output", type=click.Path(dir_okay=False, writable=True))
+@click.option("--start", type=int, required=True)
+@click.option("--end", type=int, required=True)
+@click.option("--address", "-a", type=str, multiple=True, help="Also record the FCT balance of this address")
+def record_fixture(output, start, end, address):
+    """Record the PegNet chains and factoid blocks of a height range from factomd into a fixture file"""
+    import factom
+    import alchemy.factomd_standin as standin
+
+    chain_ids = [consts.OPR_CHAIN_ID, consts.TRANSACTIONS_CHAIN_ID]
+    fixture = standin.record_fixture(factom.Factomd(), start, end, chain_ids, address)
+    standin.write_fixture(output, fixture)
+    print(f"Recorded {len(fixture['blocks'])} blocks to {output}")
+
+
+@main.command()
+@click.argument("output", type=click.Path(dir_okay=False, writable=True))
+@click.option("--blocks", type=int, default=100)
+@click.option("--oprs-per-block", type=int, default=50)
+@click.option("--dishonest-rate", type=float, default=0.05, help="Fraction of OPRs with a false difficulty")
+@click.option("--transactions-per-block", type=int, default=10)
+@click.option("--conversion-rate", type=float, default=0.5, help="Fraction of transactions that are conversions")
+@click.option("--burns-per-block", type=int, default=2)
+@click.option("--accounts", type=int, default=100)
+@click.option("--lxr-map-size-bits", type=int, default=20)
+@click.option("--seed", type=int, default=0)
+@click.option("--testnet", is_flag=True)
+def generate_chain(
+    output,
+    blocks,
+    oprs_per_block,
+    dishonest_rate,
+    transactions_per_block,
+    conversion_rate,
+    burns_per_block,
+    accounts,
+    lxr_map_size_bits,
+    seed,
+    testnet,
+):
+    """Generate a synthetic PegNet chain into a fixture file for factomd-standin"""
+    import alchemy.factomd_standin as standin
+    import alchemy.synthetic as synthetic
+
+    config = synthetic.SyntheticChainConfig(
+        blocks=blocks,
+        oprs_per_block=oprs_per_block,
+        dishonest_rate=dishonest_rate,
+        transactions_per_block=transactions_per_block,
+        conversion_rate=conversion_rate,
+        burns_per_block=burns_per_block,
+        accounts=accounts,
+        lxr_map_size_bits=lxr_map_size_bits,
+        is_testnet=testnet,
+        seed=seed,
+    )
+    fixture = synthetic.generate_chain(config, progress=lambda h: print(f"Generated block {h}"))
+    standin.write_fixture(output, fixture)
+    print(f"Wrote {len(fixture['blocks'])} blocks to {output}")
+    print(f"Sync it with: ./alchemy.py run --lxr-map-size-bits {lxr_map_size_bits}")
+
+
 # --------------------------------------------------------------------------------
 # RPC Wrapper Commands
 
@@ -257,6 +394,25 @@ def get_winners(height):
     print(json.dumps(result))
 
 
+@main.command()
+@click.argument("entry_hash", type=str)
+@click.option("--height", type=int, help="Only look at this height")
+def find_winner(entry_hash, height):
+    """Find where the OPR with the given full or short entry hash won"""
+    try:
+        if len(bytes.fromhex(entry_hash)) not in {8, 32}:
+            raise ValueError
+    except ValueError:
+        print("Error: expected a full (64 hex characters) or short (16 hex characters) entry hash")
+        return
+    try:
+        result = alchemy.rpc.find_winner(entry_hash, height)
+    except ConnectionRefusedError:
+        print("Error: failed to make request, ensure alchemy is running")
+        return
+    print(json.dumps(result))
+
+
 @main.command()
 @click.argument("address", type=str)
 @click.option("--testnet", is_flag=True)
@@ -285,6 +441,111 @@ def get_rates(height):
     print(json.dumps(result))
 
 
+@main.command()
+@click.argument("asset", type=str)
+@click.option("-n", type=int, default=10)
+@click.option("--offset", type=int, default=0)
+def get_top_holders(asset, n, offset):
+    """Get the largest holders of the given balance ticker (e.g. pXBT)"""
+    try:
+        result = alchemy.rpc.get_top_holders(asset, n, offset)
+    except ConnectionRefusedError:
+        print("Error: failed to make request, ensure alchemy is running")
+        return
+    print(json.dumps(result))
+
+
+@main.command()
+@click.argument("address", type=str)
+@click.option("--limit", type=int, default=50)
+@click.option("--cursor", type=str)
+def get_address_history(address, limit, cursor):
+    """Get the balance changes of the given address, newest first"""
+    if not FactoidAddress.is_valid(address):
+        print(f"Error: invalid address ({address}), must be a valid Factoid address")
+        return
+    try:
+        result = alchemy.rpc.get_address_history(address, limit, cursor)
+    except ConnectionRefusedError:
+        print("Error: failed to make request, ensure alchemy is running")
+        return
+    print(json.dumps(result))
+
+
+@main.command()
+@click.argument("key", required=False, type=str)
+@click.option("--miner-id", is_flag=True, help="KEY is a miner id rather than a coinbase address")
+@click.option("--blocks", type=int, help="Only count the last this many blocks (at most 1000)")
+def get_miner_stats(key, miner_id, blocks):
+    """Get wins, PNT earned and top 50 appearances of a coinbase address (or all of them)"""
+    kind = "miner_id" if miner_id else "coinbase"
+    try:
+        result = alchemy.rpc.get_miner_stats(kind, key, blocks)
+    except ConnectionRefusedError:
+        print("Error: failed to make request, ensure alchemy is running")
+        return
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    print(json.dumps(result))
+
+
+@main.command()
+@click.option("--address", "-a", type=str, multiple=True, help="Include balance changes of this address")
+@click.option("--rates", is_flag=True, help="Include the rates of every block")
+@click.option("--after-height", type=int, help="Start after this height instead of the current sync head")
+def subscribe(address, rates, after_height):
+    """Print what changes in every block as soon as it's executed, one JSON line per block"""
+    for a in address:
+        if not FactoidAddress.is_valid(a):
+            print(f"Error: invalid address ({a}), must be a valid Factoid address")
+            return
+    try:
+        if after_height is None:
+            after_height = alchemy.rpc.get_sync_head()["sync_head"]
+        while True:
+            result = alchemy.rpc.subscribe(after_height, list(address), rates)
+            if not result["complete"]:
+                print(f"Warning: missed blocks after {after_height}, continuing from {result['sync_head']}")
+            for event in result["events"]:
+                print(json.dumps(event), flush=True)
+            after_height = result["sync_head"]
+    except ConnectionRefusedError:
+        print("Error: failed to make request, ensure alchemy is running")
+        return
+
+
+@main.command()
+@click.argument("start", type=int)
+@click.argument("end", required=False, type=int)
+def get_difficulties(start, end):
+    """Get submission counts and verified top 50 difficulties of the blocks from START to END (at most 1000)"""
+    try:
+        result = alchemy.rpc.get_difficulties(start, end)
+    except ConnectionRefusedError:
+        print("Error: failed to make request, ensure alchemy is running")
+        return
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    print(json.dumps(result))
+
+
+@main.command()
+@click.argument("amount", type=int)
+@click.argument("from_ticker", type=str)
+@click.argument("to_ticker", type=str)
+@click.option("--height", type=int)
+def quote_conversion(amount, from_ticker, to_ticker, height):
+    """Quote the output of converting AMOUNT of one asset into another"""
+    try:
+        result = alchemy.rpc.quote_conversion(from_ticker, to_ticker, amount, height)
+    except ConnectionRefusedError:
+        print("Error: failed to make request, ensure alchemy is running")
+        return
+    print(json.dumps(result))
+
+
 @main.command()
 @click.option("--ticker", "-t", type=str, multiple=True)
 @click.option("--by-height", is_flag=True)
@@ -0,0 +1,177 @@
+import numpy as np
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple
+
+import alchemy.consts as consts
+from alchemy.opr import OPR
+
+home = os.getenv("HOME")
+archive_path = f"{home}/.pegnet/alchemy/archive/"
+
+# Column name --> (dtype, values per record). Each column is a raw file of records appended in height order.
+COLUMNS = {
+    "heights": (np.dtype("<u4"), 1),
+    "difficulties": (np.dtype("<u8"), 1),
+    "coinbase_ids": (np.dtype("<u4"), 1),
+    "entry_hashes": (np.dtype("S8"), 1),
+    "estimates": (np.dtype("<f8"), len(consts.ASSET_GRADING_ORDER)),
+}
+
+
+@dataclass
+class ArchivedOPRs:
+    """
+    Verified OPRs of a range of heights, as columns of equal length in height order (and by difficulty, descending,
+    within each height). Loaded columns are read-only memory maps of the archive files.
+    """
+
+    heights: np.ndarray
+    difficulties: np.ndarray
+    coinbase_ids: np.ndarray
+    entry_hashes: np.ndarray  # First 8 bytes of each entry hash, the short hash that winners are referenced by
+    estimates: np.ndarray  # Shape (n, 32), columns in consts.ASSET_GRADING_ORDER
+    coinbases: List[str]  # Coinbase id --> coinbase address
+
+    def __len__(self):
+        return len(self.heights)
+
+    def __getitem__(self, item: slice) -> "ArchivedOPRs":
+        return ArchivedOPRs(
+            heights=self.heights[item],
+            difficulties=self.difficulties[item],
+            coinbase_ids=self.coinbase_ids[item],
+            entry_hashes=self.entry_hashes[item],
+            estimates=self.estimates[item],
+            coinbases=self.coinbases,
+        )
+
+    def blocks(self) -> Iterator[Tuple[int, "ArchivedOPRs"]]:
+        """Yields (height, records of that height) for every archived height in the range"""
+        if len(self) == 0:
+            return
+        boundaries = [0, *(np.flatnonzero(np.diff(self.heights)) + 1), len(self)]
+        for start, stop in zip(boundaries, boundaries[1:]):
+            yield int(self.heights[start]), self[start:stop]
+
+    def to_records(self) -> List[OPR]:
+        """
+        Rebuilds OPR objects, for graders' grade_eligible_records functions. Only the archived fields are filled in:
+        entry hashes are the short 8 byte ones, and nonces, previous winners, miner ids and timestamps are empty.
+        """
+        records = []
+        for i in range(len(self)):
+            records.append(
+                OPR(
+                    entry_hash=bytes(self.entry_hashes[i]).ljust(8, b"\x00"),
+                    nonce=b"",
+                    self_reported_difficulty=int(self.difficulties[i]).to_bytes(8, "big"),
+                    coinbase_address=self.coinbases[self.coinbase_ids[i]],
+                    height=int(self.heights[i]),
+                    asset_estimates=dict(zip(consts.ASSET_GRADING_ORDER, self.estimates[i])),
+                    prev_winners=[],
+                    miner_id="",
+                    timestamp=0,
+                )
+            )
+        return records
+
+
+class OPRArchive:
+    def __init__(self, is_testnet: bool = False, path: str = None):
+        """
+        Columnar archive of the LXR verified OPRs that the graders were handed at each height (the top 50 honest
+        records with the right previous winners), so grader research can replay history without factomd or LXR.
+
+        Writing is append only. Re-archiving a height (after a rewind) first drops it and every height above it.
+        """
+        if path is None:
+            path = os.path.join(archive_path, "data" if not is_testnet else "data-testnet")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.coinbases: List[str] = []
+        coinbases_filename = self._filename("coinbases")
+        if os.path.exists(coinbases_filename):
+            with open(coinbases_filename) as f:
+                self.coinbases = f.read().splitlines()
+        self.coinbase_ids: Dict[str, int] = {address: i for i, address in enumerate(self.coinbases)}
+        # Columns are appended one after another, so a crash can leave some of them a record ahead of the others
+        self._truncate(min(self._column_length(name) for name in COLUMNS))
+
+    def _filename(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _column_length(self, name: str) -> int:
+        dtype, width = COLUMNS[name]
+        filename = self._filename(name)
+        return os.path.getsize(filename) // (dtype.itemsize * width) if os.path.exists(filename) else 0
+
+    def _column(self, name: str, length: int) -> np.ndarray:
+        dtype, width = COLUMNS[name]
+        shape = (length, width) if width != 1 else (length,)
+        if length == 0:
+            return np.empty(shape, dtype)  # Empty files can't be memory mapped
+        return np.memmap(self._filename(name), dtype=dtype, mode="r", shape=shape)
+
+    def _truncate(self, length: int):
+        for name, (dtype, width) in COLUMNS.items():
+            with open(self._filename(name), "ab") as f:
+                f.truncate(length * dtype.itemsize * width)
+
+    def __len__(self):
+        return self._column_length("heights")
+
+    def _coinbase_id(self, address: str) -> int:
+        coinbase_id = self.coinbase_ids.get(address)
+        if coinbase_id is None:
+            coinbase_id = len(self.coinbases)
+            with open(self._filename("coinbases"), "a") as f:
+                f.write(f"{address}\n")
+            self.coinbases.append(address)
+            self.coinbase_ids[address] = coinbase_id
+        return coinbase_id
+
+    def put(self, height: int, records: List[OPR]):
+        """Archives the verified records of a height, in the order given. Heights must be put in increasing order."""
+        length = len(self)
+        if length != 0:
+            heights = self._column("heights", length)
+            keep = int(np.searchsorted(heights, height))
+            del heights  # Release the map before truncating the file under it
+            if keep != length:
+                self._truncate(keep)
+        if len(records) == 0:
+            return
+
+        columns = {
+            "heights": np.full(len(records), height, dtype=COLUMNS["heights"][0]),
+            "difficulties": np.array(
+                [int.from_bytes(r.self_reported_difficulty, "big") for r in records], dtype=COLUMNS["difficulties"][0]
+            ),
+            "coinbase_ids": np.array(
+                [self._coinbase_id(r.coinbase_address) for r in records], dtype=COLUMNS["coinbase_ids"][0]
+            ),
+            "entry_hashes": np.array([r.entry_hash[:8] for r in records], dtype=COLUMNS["entry_hashes"][0]),
+            "estimates": np.array(
+                [[r.asset_estimates[asset] for asset in consts.ASSET_GRADING_ORDER] for r in records],
+                dtype=COLUMNS["estimates"][0],
+            ),
+        }
+        for name, values in columns.items():
+            with open(self._filename(name), "ab") as f:
+                f.write(values.tobytes())
+
+    def load(self, start: int = 0, end: int = None) -> ArchivedOPRs:
+        """Memory maps the archived records from height start to end (inclusive, defaults to the last height)"""
+        length = len(self)
+        heights = self._column("heights", length)
+        first = int(np.searchsorted(heights, start, side="left"))
+        last = int(np.searchsorted(heights, end, side="right")) if end is not None else length
+        return ArchivedOPRs(
+            heights=heights[first:last],
+            difficulties=self._column("difficulties", length)[first:last],
+            coinbase_ids=self._column("coinbase_ids", length)[first:last],
+            entry_hashes=self._column("entry_hashes", length)[first:last],
+            estimates=self._column("estimates", length)[first:last],
+            coinbases=list(self.coinbases),
+        )
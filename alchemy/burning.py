@@ -1,17 +1,36 @@
-from collections import defaultdict
+import collections
+import copy
+import factom
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from factom import Factomd
-from typing import Dict
+from factom.session import FactomAPISession
+from typing import Callable, Iterator, List, Tuple
 
 import alchemy.consts as consts
+import alchemy.metrics as metrics
 
 
-def process_block(height: int, factomd: Factomd, is_testnet: bool = False):
+@dataclass
+class Burn:
+    address: bytes
+    amount: int
+    tx_id: str
+
+
+def process_block(height: int, factomd: Factomd, is_testnet: bool = False) -> List[Burn]:
     """Parse all unseen Factoid Blocks looking for FCT burn transactions"""
+    with metrics.timed("alchemy_stage_seconds", stage="factomd_fetch"):
+        factoid_block = factomd.factoid_block_by_height(height)["fblock"]
+    return parse_factoid_block(factoid_block, is_testnet)
+
+
+def parse_factoid_block(factoid_block: dict, is_testnet: bool = False) -> List[Burn]:
+    """Returns all FCT burn transactions in the given factoid block"""
     expected_burn_address = consts.BurnAddresses.MAINNET.value if not is_testnet else consts.BurnAddresses.TESTNET.value
-    all_account_deltas: Dict[bytes, Dict[str:float]] = {}
+    burns: List[Burn] = []
 
-    factoid_block = factomd.factoid_block_by_height(height)["fblock"]
-    burn_count = 0
     transactions = factoid_block["transactions"]
     for tx in transactions:
         inputs = tx.get("inputs")
@@ -23,12 +42,64 @@ def process_block(height: int, factomd: Factomd, is_testnet: bool = False):
         if ec_address != expected_burn_address:
             continue
 
-        # Successful burn, update the balance
+        # Successful burn, credit the input address with pFCT
         burn_amount = inputs[0].get("amount", 0)
         address = bytes.fromhex(inputs[0].get("address"))
-        this_account_deltas = all_account_deltas.get(address, defaultdict(float))
-        this_account_deltas[f"pFCT"] += burn_amount
-        all_account_deltas[address] = this_account_deltas
-        burn_count += 1
+        burns.append(Burn(address=address, amount=burn_amount, tx_id=tx.get("txid")))
+
+    metrics.observe("alchemy_block_records", len(burns), kind="burn")
+    return burns
+
+
+def client_factory(factomd: Factomd) -> Callable[[], Factomd]:
+    """Returns a factory of clients of the same factomd (host, credentials, TLS), each with its own session"""
+
+    def make() -> Factomd:
+        client = copy.copy(factomd)
+        client.session = FactomAPISession()
+        client.session.headers.update(factomd.session.headers)
+        client.session.verify = factomd.session.verify
+        return client
+
+    return make
+
+
+def scan_range(
+    start: int,
+    end: int,
+    is_testnet: bool = False,
+    workers: int = 8,
+    window: int = 64,
+    factomd_factory: Callable[[], Factomd] = Factomd,
+) -> Iterator[Tuple[int, List[Burn]]]:
+    """
+    Yields (height, burns) for every height from start to end (inclusive), in order. Factoid blocks are fetched and
+    parsed by a pool of worker threads, keeping up to `window` heights in flight ahead of the consumer, so the
+    sequential block executor can merge burns at each height without waiting on factomd one block at a time.
+    A height without a factoid block yields an empty list.
+    :param factomd_factory: Makes the client of each worker thread, see client_factory to match an existing client
+    """
+    local = threading.local()
+
+    def scan(height: int) -> List[Burn]:
+        if not hasattr(local, "factomd"):
+            local.factomd = factomd_factory()  # Sessions aren't shared between threads
+        try:
+            return process_block(height, local.factomd, is_testnet)
+        except factom.exceptions.BlockNotFound:
+            return []
 
-    return burn_count, all_account_deltas
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="alchemy-burn-scan")
+    in_flight = collections.deque()
+    try:
+        next_height = start
+        while next_height <= end or len(in_flight) != 0:
+            while next_height <= end and len(in_flight) < window:
+                in_flight.append((next_height, executor.submit(scan, next_height)))
+                next_height += 1
+            height, future = in_flight.popleft()
+            yield height, future.result()
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=False)
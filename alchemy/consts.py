@@ -7,6 +7,9 @@ OPR_CHAIN_ID = "a642a8674f46696cc47fdb6b65f9c87b2a19c5ea8123b3d2f0c13b6f33a9d5ef
 START_HEIGHT = 206422
 FACTOSHIS_PER_FCT = 1e8
 
+# Most blocks a windowed query may cover, since the node answers queries on the event loop that serves all of them
+MAX_QUERY_BLOCKS = 1000
+
 BLOCK_REWARDS: Dict[int, int] = {
     0: int(800 * 1e8),
     1: int(600 * 1e8),
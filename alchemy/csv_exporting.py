@@ -12,19 +12,20 @@ difficulties_path = f"{home}/.pegnet/alchemy/difficulties/"
 difficulties_filename = f"{difficulties_path}/data.csv"
 
 
-def write_prices(prices, height, timestamp):
-    if not os.path.exists(prices_path):
-        os.makedirs(prices_path)
+def write_prices(prices, height, timestamp, filename: str = prices_filename):
+    directory = os.path.dirname(filename)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
     headers = ["Date", "Height"] + sorted(list(consts.ALL_ASSETS))
-    row = prices
+    row = dict(prices)  # Don't add Date and Height to the winning prices themselves
     row["Date"] = np.datetime64(datetime.datetime.utcfromtimestamp(timestamp))
     row["Height"] = height
-    if os.path.exists(prices_filename):
-        with open(prices_filename, "a") as f:
+    if os.path.exists(filename):
+        with open(filename, "a") as f:
             writer = csv.DictWriter(f, fieldnames=headers)
             writer.writerow(row)
     else:
-        with open(prices_filename, "w") as f:
+        with open(filename, "w") as f:
             writer = csv.DictWriter(f, fieldnames=headers)
             writer.writeheader()
             writer.writerow(row)
@@ -48,3 +49,17 @@ def write_difficulty(top_record, bottom_record):
             writer = csv.DictWriter(f, fieldnames=row.keys())
             writer.writeheader()
             writer.writerow(row)
+
+
+def truncate(height: int, filename: str):
+    """Drops the rows of blocks above the given height, e.g. after a rewind, so they aren't there twice once redone"""
+    if not os.path.exists(filename):
+        return
+    with open(filename, newline="") as f:
+        reader = csv.DictReader(f)
+        headers = reader.fieldnames
+        rows = [row for row in reader if int(row["Height"]) <= height]
+    with open(filename, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=headers)
+        writer.writeheader()
+        writer.writerows(rows)
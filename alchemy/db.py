@@ -1,9 +1,12 @@
 import json
-import plyvel
 import os
 import struct
+import threading
 from factom_keys.fct import FactoidAddress
-from typing import Dict, List, Union
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+import alchemy.consts as consts
+import alchemy.storage
 
 
 SYNC_HEAD = b"SyncHead"
@@ -11,45 +14,261 @@ WINNERS_HEAD = b"WinnersHead"
 BALANCES = b"Balances"
 WINNERS = b"Winners"
 RATES = b"Rates"
+RICH_LIST = b"RichList"
+RICH_LIST_VERSION = b"RichListVersion"
+HISTORY = b"History"
+UNDO = b"Undo"
+SIGNATURES = b"Signatures"
+WINNER_BY_HASH = b"WinnerByHash"
+WINNER_BY_SHORT_HASH = b"WinnerByShortHash"
+WINNER_INDEX_VERSION = b"WinnerIndexVersion"
+MINER_STATS = b"MinerStats"
+MINER_BLOCKS = b"MinerBlocks"
+DIFFICULTIES = b"Difficulties"
+
+# Undo records are kept for this many blocks below the one just committed, i.e. how far back rewind() can go
+MAX_REWIND_DEPTH = 1000
+
+# Miner statistics kind --> key byte. Coinbase addresses and miner ids are tracked separately.
+MINER_STATS_KINDS = {"coinbase": b"c", "miner_id": b"m"}
 
 BalanceMap = Dict[str, int]
 
 
 class AlchemyDB:
-    def __init__(self, is_testnet: bool = False, **kwargs):
-        """An alchemy specific wrapper around level-db"""
+    def __init__(
+        self, is_testnet: bool = False, storage: str = "leveldb", max_rewind_depth: int = MAX_REWIND_DEPTH, **kwargs
+    ):
+        """An alchemy specific wrapper around level-db, or another engine from alchemy.storage
+        :param storage: One of alchemy.storage.ENGINES. kwargs are passed to plyvel.DB for leveldb.
+        :param max_rewind_depth: Number of blocks to keep undo records of, older ones are pruned as blocks commit
+        """
         home = os.getenv("HOME")
         data_dir = "data" if not is_testnet else "data-testnet"
         path = f"{home}/.pegnet/alchemy/{data_dir}/"
-        if not os.path.exists(path):
-            os.makedirs(path)
-        self._db = plyvel.DB(path, **kwargs)
+        if storage == "sqlite":
+            path = f"{home}/.pegnet/alchemy/{data_dir}.sqlite3"
+        self._db = alchemy.storage.open_engine(storage, path, **kwargs)
+        self.max_rewind_depth = max_rewind_depth
+        self._pending: Union[None, Dict[bytes, Union[None, bytes]]] = None
+        self._pending_height: Union[None, int] = None
+        self._history_seq: Dict[bytes, int] = {}
+        self._commit_listeners: List[Tuple[Callable[[Dict[str, Any]], None], Callable[[], bool]]] = []
+        self._rewind_listeners: List[Callable[[int], None]] = []
+        self._ensure_rich_list()
+        self._ensure_winner_index()
+        self._snapshot_lock = threading.Lock()
+        self._read_snapshot: Union[None, "AlchemySnapshot"] = None
 
     def close(self):
+        self._read_snapshot = None
         self._db.close()
 
+    def read_view(self) -> "AlchemyDB":
+        """
+        Returns a read only view of the database as of the last write outside of block staging, i.e. the last
+        committed block. Safe to use from other threads while a block is being executed.
+        """
+        with self._snapshot_lock:
+            if self._read_snapshot is None:
+                self._read_snapshot = AlchemySnapshot(self._db)
+            return self._read_snapshot
+
+    def _invalidate_read_view(self):
+        # Readers still holding the previous snapshot keep it alive until they're done with it
+        with self._snapshot_lock:
+            self._read_snapshot = None
+
+    # -------------------------------------
+    # Block staging
+
+    def begin_block(self, height: int = None):
+        """
+        Stage all following writes in memory until commit_block() writes them to disk in a single batch.
+        If a height is given, an undo record of the values the block overwrites is committed along with it.
+        """
+        self._pending = {}
+        self._pending_height = height
+        self._history_seq = {}
+
+    def commit_block(self):
+        block = None
+        with self._db.write_batch(transaction=True) as wb:
+            if self._pending_height is not None:
+                undo_record = [(key, self._db.get(key)) for key in self._pending]
+                wb.put(UNDO + struct.pack(">I", self._pending_height), self._encode_undo_record(undo_record))
+                floor = self._pending_height - self.max_rewind_depth
+                if 0 <= floor:
+                    # Usually just the record that fell out of the window, but also any left by a larger window
+                    stop = UNDO + struct.pack(">I", floor + 1)
+                    for key in list(self._db.iterator(start=UNDO, stop=stop, include_value=False)):
+                        wb.delete(key)
+                if len(self._commit_listeners) != 0:
+                    wants = [wants_balances is None or wants_balances() for _, wants_balances in self._commit_listeners]
+                    block = self._describe_block(self._pending_height, self._pending, dict(undo_record), any(wants))
+            for key, value in self._pending.items():
+                if value is None:
+                    wb.delete(key)
+                else:
+                    wb.put(key, value)
+        self._pending = None
+        self._pending_height = None
+        self._invalidate_read_view()
+        if block is not None:
+            for (listener, _), wants_balances in zip(self._commit_listeners, wants):
+                listener(block if wants_balances else {**block, "balances": None})
+
+    def abort_block(self):
+        """Throw away all writes staged since begin_block()"""
+        self._pending = None
+        self._pending_height = None
+
+    def _get(self, key: bytes) -> Union[None, bytes]:
+        if self._pending is not None and key in self._pending:
+            return self._pending[key]
+        return self._db.get(key)
+
+    def _put(self, key: bytes, value: bytes):
+        if self._pending is not None:
+            self._pending[key] = value
+        else:
+            self._db.put(key, value)
+            self._invalidate_read_view()
+
+    def _delete(self, key: bytes):
+        if self._pending is not None:
+            self._pending[key] = None
+        else:
+            self._db.delete(key)
+            self._invalidate_read_view()
+
+    def add_commit_listener(
+        self, listener: Callable[[Dict[str, Any]], None], wants_balances: Callable[[], bool] = None
+    ):
+        """
+        Calls listener with what changed in every block committed from now on, once it's readable:
+        {"height": ..., "rates": rates put for the block or None, "balances": {address: {"balances", "deltas"}}}
+        Balance changes take decoding every balance the block wrote, so "balances" is None whenever wants_balances is
+        given and returns False at commit time.
+        """
+        self._commit_listeners.append((listener, wants_balances))
+
+    @staticmethod
+    def _describe_block(
+        height: int,
+        pending: Dict[bytes, Union[None, bytes]],
+        previous: Dict[bytes, Union[None, bytes]],
+        include_balances: bool = True,
+    ) -> Dict[str, Any]:
+        rates_bytes = pending.get(RATES + struct.pack(">I", height))
+        block = {"height": height, "rates": None if rates_bytes is None else json.loads(rates_bytes.decode())}
+        if not include_balances:
+            block["balances"] = None
+            return block
+        balances = {}
+        for key, value in pending.items():
+            if not key.startswith(BALANCES) or value is None:
+                continue
+            new_balances = json.loads(value.decode())
+            old_balances = {} if previous.get(key) is None else json.loads(previous[key].decode())
+            deltas = {}
+            for ticker in new_balances.keys() | old_balances.keys():
+                delta = new_balances.get(ticker, 0) - old_balances.get(ticker, 0)
+                if delta != 0:
+                    deltas[ticker] = delta
+            address = FactoidAddress(rcd_hash=key[len(BALANCES) :]).to_string()
+            balances[address] = {"balances": new_balances, "deltas": deltas}
+        block["balances"] = balances
+        return block
+
+    # -------------------------------------
+    # Undo log: Undo | height (uint32)  -->  every key the block wrote, with the value it had before the block
+
+    @staticmethod
+    def _encode_undo_record(undo_record: List[Tuple[bytes, Union[None, bytes]]]) -> bytes:
+        parts = []
+        for key, value in undo_record:
+            parts.append(struct.pack(">H", len(key)) + key)
+            if value is None:
+                parts.append(struct.pack(">BI", 0, 0))
+            else:
+                parts.append(struct.pack(">BI", 1, len(value)) + value)
+        return b"".join(parts)
+
+    @staticmethod
+    def _decode_undo_record(data: bytes) -> List[Tuple[bytes, Union[None, bytes]]]:
+        undo_record = []
+        i = 0
+        while i < len(data):
+            (key_length,) = struct.unpack_from(">H", data, i)
+            key = data[i + 2 : i + 2 + key_length]
+            i += 2 + key_length
+            has_value, value_length = struct.unpack_from(">BI", data, i)
+            i += 5
+            undo_record.append((key, data[i : i + value_length] if has_value else None))
+            i += value_length
+        return undo_record
+
+    def get_undo_floor(self) -> int:
+        """Returns the lowest height that can be rewound to, or -1 if no undo records exist"""
+        for key in self._db.iterator(prefix=UNDO, include_value=False):
+            return struct.unpack(">I", key[len(UNDO) :])[0] - 1
+        return -1
+
+    def rewind(self, height: int, progress=None):
+        """
+        Restores the database to the state it was in right after the block at the given height was committed, by
+        applying the undo records of every block above it in reverse order. Each undone block is its own batch, so
+        an interrupted rewind leaves a consistent database at some height in between.
+        :param progress: Optional callback, called with each height after it has been undone
+        """
+        sync_head = self.get_sync_head()
+        if sync_head < height:
+            raise ValueError(f"Cannot rewind forward (sync head is {sync_head})")
+        for h in range(sync_head, height, -1):
+            if self._db.get(UNDO + struct.pack(">I", h)) is None:
+                raise ValueError(f"No undo record for block {h}, can rewind no further than {h}")
+        for h in range(sync_head, height, -1):
+            undo_key = UNDO + struct.pack(">I", h)
+            with self._db.write_batch(transaction=True) as wb:
+                for key, value in self._decode_undo_record(self._db.get(undo_key)):
+                    if value is None:
+                        wb.delete(key)
+                    else:
+                        wb.put(key, value)
+                wb.delete(undo_key)
+            self._invalidate_read_view()
+            for listener in self._rewind_listeners:
+                listener(h - 1)
+            if progress is not None:
+                progress(h)
+
+    def add_rewind_listener(self, listener: Callable[[int], None]):
+        """Calls listener with the new sync head after each block undone by rewind(), for caches of later blocks"""
+        self._rewind_listeners.append(listener)
+
     def get_sync_head(self) -> int:
-        height_bytes = self._db.get(SYNC_HEAD)
+        height_bytes = self._get(SYNC_HEAD)
         return -1 if height_bytes is None else struct.unpack(">I", height_bytes)[0]
 
     def put_sync_head(self, height: int):
         height_bytes = struct.pack(">I", height)
-        self._db.put(SYNC_HEAD, height_bytes)
+        self._put(SYNC_HEAD, height_bytes)
 
     def get_balances(self, address: Union[bytes, str]) -> Union[None, Dict[str, int]]:
         """Gets a map of balances for the given address.
         :param address: A bytes object of the address RCD hash, or a string of the address in human readable notation
         """
-        sub_db = self._db.prefixed_db(BALANCES)
         if type(address) == str:
             address = FactoidAddress(address_string=address).rcd_hash
-        balances_bytes = sub_db.get(address)
+        balances_bytes = self._get(BALANCES + address)
         return {} if balances_bytes is None else json.loads(balances_bytes.decode())
 
     def put_balances(self, address: bytes, balances: BalanceMap):
-        sub_db = self._db.prefixed_db(BALANCES)
+        previous_balances = self.get_balances(address)
         balance_bytes = json.dumps(balances).encode()
-        sub_db.put(address, balance_bytes)
+        self._put(BALANCES + address, balance_bytes)
+        self._update_rich_list(address, previous_balances, balances)
 
     def update_balances(self, address: bytes, deltas: BalanceMap):
         balances = self.get_balances(address)
@@ -63,41 +282,355 @@ class AlchemyDB:
         else:
             self.put_balances(address, deltas)
 
+    # -------------------------------------
+    # Rich list: RichList | len(ticker) | ticker | balance (uint64) | address  -->  b""
+
+    @staticmethod
+    def _rich_list_prefix(ticker: str) -> bytes:
+        ticker_bytes = ticker.encode()
+        return RICH_LIST + bytes([len(ticker_bytes)]) + ticker_bytes
+
+    @staticmethod
+    def _rich_list_key(ticker: str, balance: Union[int, float], address: bytes) -> bytes:
+        return AlchemyDB._rich_list_prefix(ticker) + struct.pack(">Q", int(balance)) + address
+
+    def _update_rich_list(self, address: bytes, previous_balances: BalanceMap, balances: BalanceMap):
+        for ticker in set(previous_balances).union(balances):
+            previous = int(previous_balances.get(ticker, 0))
+            current = int(balances.get(ticker, 0))
+            if previous == current:
+                continue
+            if 0 < previous:
+                self._delete(self._rich_list_key(ticker, previous, address))
+            if 0 < current:
+                self._put(self._rich_list_key(ticker, current, address), b"")
+
+    def _ensure_rich_list(self):
+        """Builds the rich list from all stored balances if this database predates it"""
+        if self._db.get(RICH_LIST_VERSION) is not None:
+            return
+        with self._db.write_batch(transaction=True) as wb:
+            for key, balance_bytes in self._db.iterator(prefix=BALANCES):
+                address = key[len(BALANCES) :]
+                for ticker, balance in json.loads(balance_bytes.decode()).items():
+                    if 0 < int(balance):
+                        wb.put(self._rich_list_key(ticker, balance, address), b"")
+            wb.put(RICH_LIST_VERSION, struct.pack(">I", 1))
+
+    def get_top_holders(self, asset: str, n: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        """Returns the n largest holders of a balance ticker (e.g. "pXBT" or "PNT"), skipping the first offset"""
+        prefix = self._rich_list_prefix(asset)
+        holders = []
+        for i, key in enumerate(self._db.iterator(prefix=prefix, reverse=True, include_value=False)):
+            if i < offset:
+                continue
+            if n <= len(holders):
+                break
+            balance_bytes, address = key[len(prefix) : len(prefix) + 8], key[len(prefix) + 8 :]
+            holders.append(
+                {
+                    "rank": i + 1,
+                    "address": FactoidAddress(rcd_hash=address).to_string(),
+                    "balance": struct.unpack(">Q", balance_bytes)[0],
+                }
+            )
+        return holders
+
+    # -------------------------------------
+    # Address history: History | address | height (uint32) | seq (uint16)  -->  json record
+
+    def put_history(
+        self, address: bytes, height: int, source: str, deltas: BalanceMap, entry_hash: Union[None, bytes, str] = None
+    ):
+        """Appends a record of why the balances of the given address changed at the given height.
+        :param source: One of "reward", "burn", "transfer" or "conversion"
+        :param entry_hash: The OPR or transaction entry hash, or factoid transaction id, that caused the change
+        """
+        prefix = HISTORY + address + struct.pack(">I", height)
+        seq = self._history_seq.get(prefix, 0)
+        self._history_seq[prefix] = seq + 1
+        if type(entry_hash) == bytes:
+            entry_hash = entry_hash.hex()
+        record = {"source": source, "entry_hash": entry_hash, "deltas": deltas}
+        self._put(prefix + struct.pack(">H", seq), json.dumps(record, separators=(",", ":")).encode())
+
+    def get_address_history(self, address: Union[bytes, str], limit: int = 50, cursor: str = None) -> Dict[str, Any]:
+        """Returns up to `limit` history records for the address, newest first.
+        :param cursor: The "next_cursor" from a previous call, to continue where it left off
+        """
+        if type(address) == str:
+            address = FactoidAddress(address_string=address).rcd_hash
+        prefix = HISTORY + address
+        stop = prefix + bytes.fromhex(cursor) if cursor is not None else prefix + b"\xff" * 6
+        records = []
+        next_cursor = None
+        last_key = stop
+        for key, value in self._db.iterator(start=prefix, stop=stop, reverse=True):
+            if limit <= len(records):
+                next_cursor = last_key[len(prefix) :].hex()  # More records remain, continue after the last one
+                break
+            height, seq = struct.unpack(">IH", key[len(prefix) :])
+            record = json.loads(value.decode())
+            record["height"] = height
+            record["seq"] = seq
+            records.append(record)
+            last_key = key
+        return {"history": records, "next_cursor": next_cursor}
+
+    # -------------------------------------
+    # Signature verdicts: Signatures | entry hash  -->  b"\x01" if valid, b"\x00" if not
+    # Written outside of block staging and the undo log, so verdicts survive rewinds and resyncs.
+
+    def get_signature_verdict(self, entry_hash: bytes) -> Union[None, bool]:
+        verdict = self._db.get(SIGNATURES + entry_hash)
+        return None if verdict is None else verdict == b"\x01"
+
+    def put_signature_verdict(self, entry_hash: bytes, is_valid: bool):
+        self._db.put(SIGNATURES + entry_hash, b"\x01" if is_valid else b"\x00")
+
     def get_winners_head(self) -> int:
-        height_bytes = self._db.get(WINNERS_HEAD)
+        height_bytes = self._get(WINNERS_HEAD)
         return -1 if height_bytes is None else struct.unpack(">I", height_bytes)[0]
 
     def put_winners_head(self, height: int):
         height_bytes = struct.pack(">I", height)
-        self._db.put(WINNERS_HEAD, height_bytes)
+        self._put(WINNERS_HEAD, height_bytes)
 
     def get_winners(self, height: int, encode_to_hex: bool = False) -> Union[List[bytes], List[str]]:
-        sub_db = self._db.prefixed_db(WINNERS)
         height_bytes = struct.pack(">I", height)
-        winners_bytes = sub_db.get(height_bytes)
+        winners_bytes = self._get(WINNERS + height_bytes)
         if winners_bytes is None:
             return []
         result = [winners_bytes[i : i + 32] for i in range(0, 10 * 32, 32)]
         return result if not encode_to_hex else [h.hex() for h in result]
 
     def put_winners(self, height: int, winners: List[bytes]):
-        sub_db = self._db.prefixed_db(WINNERS)
         height_bytes = struct.pack(">I", height)
         winners_bytes = b"".join(winners)
-        sub_db.put(height_bytes, winners_bytes)
+        for entry_hash in self.get_winners(height):
+            self._delete(WINNER_BY_HASH + entry_hash)
+            self._delete(WINNER_BY_SHORT_HASH + entry_hash[:8] + height_bytes)
+        self._put(WINNERS + height_bytes, winners_bytes)
+        for key, value in self._winner_index_items(height, winners):
+            self._put(key, value)
 
     def get_highest_winners(self, encode_to_hex: bool = False) -> Union[List[bytes], List[str]]:
         height = self.get_winners_head()
         return [] if height == -1 else self.get_winners(height, encode_to_hex)
 
+    # -------------------------------------
+    # Winner index:
+    #   WinnerByHash | entry hash  -->  height (uint32) | place (uint8)
+    #   WinnerByShortHash | short hash (first 8 bytes) | height (uint32)  -->  place (uint8) | entry hash
+
+    @staticmethod
+    def _winner_index_items(height: int, winners: List[bytes]) -> List[Tuple[bytes, bytes]]:
+        height_bytes = struct.pack(">I", height)
+        places: Dict[bytes, int] = {}
+        for place, entry_hash in enumerate(winners):
+            places.setdefault(entry_hash, place)
+        items = []
+        for entry_hash, place in places.items():
+            items.append((WINNER_BY_HASH + entry_hash, height_bytes + bytes([place])))
+            items.append((WINNER_BY_SHORT_HASH + entry_hash[:8] + height_bytes, bytes([place]) + entry_hash))
+        return items
+
+    def _ensure_winner_index(self):
+        """Builds the winner index from all stored winners if this database predates it"""
+        if self._db.get(WINNER_INDEX_VERSION) is not None:
+            return
+        with self._db.write_batch(transaction=True) as wb:
+            for key, winners_bytes in self._db.iterator(prefix=WINNERS):
+                if len(key) != len(WINNERS) + 4 or len(winners_bytes) != 10 * 32:
+                    continue  # WinnersHead
+                height = struct.unpack(">I", key[len(WINNERS) :])[0]
+                winners = [winners_bytes[i : i + 32] for i in range(0, 10 * 32, 32)]
+                for index_key, value in self._winner_index_items(height, winners):
+                    wb.put(index_key, value)
+            wb.put(WINNER_INDEX_VERSION, struct.pack(">I", 1))
+
+    def find_winner(self, entry_hash: Union[bytes, str], height: int = None) -> List[Dict[str, Any]]:
+        """
+        Returns where the given OPR won, as a list of {"height", "place", "entry_hash"} (empty if it never did).
+        Places start at 1, like in rpc.get_winners.
+        :param entry_hash: The full entry hash, or the 8 byte short hash OPRs reference previous winners by
+        :param height: Only look at this height. Short hashes are only unique within a height.
+        """
+        if type(entry_hash) == str:
+            entry_hash = bytes.fromhex(entry_hash)
+        if len(entry_hash) == 32:
+            value = self._get(WINNER_BY_HASH + entry_hash)
+            if value is None:
+                return []
+            winner_height, place = struct.unpack(">IB", value)
+            if height is not None and height != winner_height:
+                return []
+            return [{"height": winner_height, "place": place + 1, "entry_hash": entry_hash.hex()}]
+        if len(entry_hash) != 8:
+            raise ValueError("entry_hash must be a full (32 byte) or short (8 byte) entry hash")
+
+        prefix = WINNER_BY_SHORT_HASH + entry_hash
+        if height is not None:
+            value = self._get(prefix + struct.pack(">I", height))
+            items = [] if value is None else [(prefix + struct.pack(">I", height), value)]
+        else:
+            items = self._db.iterator(prefix=prefix)
+        matches = []
+        for key, value in items:
+            matches.append(
+                {
+                    "height": struct.unpack(">I", key[len(prefix) :])[0],
+                    "place": value[0] + 1,
+                    "entry_hash": value[1:].hex(),
+                }
+            )
+        return matches
+
     def get_rates(self, height: int) -> Dict[str, float]:
-        sub_db = self._db.prefixed_db(RATES)
         height_bytes = struct.pack(">I", height)
-        rates_bytes = sub_db.get(height_bytes)
+        rates_bytes = self._get(RATES + height_bytes)
         return None if rates_bytes is None else json.loads(rates_bytes.decode())
 
+    def get_rates_height(self, height: int) -> int:
+        """Returns the highest height at or below the given one that has rates, or -1 if there is none"""
+        stop = RATES + struct.pack(">I", height + 1)
+        for key in self._db.iterator(start=RATES, stop=stop, reverse=True, include_value=False):
+            return struct.unpack(">I", key[len(RATES) :])[0]
+        return -1
+
     def put_rates(self, height: int, rates: Dict[str, float]) -> None:
-        sub_db = self._db.prefixed_db(RATES)
         height_bytes = struct.pack(">I", height)
         rates_bytes = json.dumps(rates, separators=(",", ":")).encode()
-        sub_db.put(height_bytes, rates_bytes)
+        self._put(RATES + height_bytes, rates_bytes)
+
+    # -------------------------------------
+    # Difficulties:
+    #   Difficulties | height (uint32)  -->  entries, sane records, dishonest records (uint32 each), followed by the
+    #   difficulties of the verified top 50 (uint64 each, descending). Written for every block, graded or not.
+
+    def put_difficulties(self, height: int, entries: int, records: int, dishonest: int, difficulties: List[int]):
+        value = struct.pack(f">III{len(difficulties)}Q", entries, records, dishonest, *difficulties)
+        self._put(DIFFICULTIES + struct.pack(">I", height), value)
+
+    def get_difficulties(self, start: int, end: int = None) -> List[Dict[str, Any]]:
+        """
+        Returns the submission counts and verified top 50 difficulties of each block from start to end, inclusive,
+        that has them: [{"height", "entries", "records", "dishonest", "difficulties"}]. At most consts.MAX_QUERY_BLOCKS.
+        """
+        end = start if end is None else end
+        result = []
+        if end < start:
+            return result
+        if consts.MAX_QUERY_BLOCKS <= end - start:
+            raise ValueError(f"At most {consts.MAX_QUERY_BLOCKS} blocks can be queried at once")
+        begin = DIFFICULTIES + struct.pack(">I", start)
+        stop = DIFFICULTIES + struct.pack(">I", end + 1)
+        for key, value in self._db.iterator(start=begin, stop=stop):
+            entries, records, dishonest = struct.unpack(">III", value[:12])
+            result.append(
+                {
+                    "height": struct.unpack(">I", key[len(DIFFICULTIES) :])[0],
+                    "entries": entries,
+                    "records": records,
+                    "dishonest": dishonest,
+                    "difficulties": list(struct.unpack(f">{(len(value) - 12) // 8}Q", value[12:])),
+                }
+            )
+        return result
+
+    # -------------------------------------
+    # Miner statistics:
+    #   MinerStats | kind | coinbase address or miner id  -->  json totals since the first block it was graded in
+    #   MinerBlocks | height (uint32)  -->  json totals of the block: {kind: {coinbase address or miner id: totals}}
+    # Totals are {"wins": wins by place, "pnt": PNT rewarded, "appearances": records in the top 50,
+    # "first_height": ..., "last_height": ...}
+
+    @staticmethod
+    def _new_miner_stats(first_height: int = None, last_height: int = None) -> Dict[str, Any]:
+        return {"wins": [0] * 10, "pnt": 0, "appearances": 0, "first_height": first_height, "last_height": last_height}
+
+    @staticmethod
+    def _add_miner_stats(stats: Dict[str, Any], other: Dict[str, Any]):
+        stats["wins"] = [a + b for a, b in zip(stats["wins"], other["wins"])]
+        stats["pnt"] += other["pnt"]
+        stats["appearances"] += other["appearances"]
+        if stats["first_height"] is None or other["first_height"] < stats["first_height"]:
+            stats["first_height"] = other["first_height"]
+        if stats["last_height"] is None or stats["last_height"] < other["last_height"]:
+            stats["last_height"] = other["last_height"]
+
+    @staticmethod
+    def _miner_stats_key(kind: str, key: str) -> bytes:
+        # Miner ids are whatever miners put in their OPRs, lone surrogates included
+        return MINER_STATS + MINER_STATS_KINDS[kind] + key.encode("utf-8", "surrogatepass")
+
+    def put_miner_block(self, height: int, records: List[Tuple[str, str, int, int]]):
+        """
+        Records who made it into the graded top 50 of the block at the given height, and adds it to their totals.
+        :param records: (coinbase address, miner id, place, PNT reward) of every record in the top 50. Places start
+            at 1, and are 0 for records that didn't win.
+        """
+        block = {kind: {} for kind in MINER_STATS_KINDS}
+        for coinbase, miner_id, place, reward in records:
+            for kind, key in (("coinbase", coinbase), ("miner_id", miner_id)):
+                stats = block[kind].setdefault(key, self._new_miner_stats(height, height))
+                stats["appearances"] += 1
+                stats["pnt"] += reward
+                if 0 < place:
+                    stats["wins"][place - 1] += 1
+        self._put(MINER_BLOCKS + struct.pack(">I", height), json.dumps(block, separators=(",", ":")).encode())
+
+        for kind, block_stats in block.items():
+            for key, stats in block_stats.items():
+                stats_key = self._miner_stats_key(kind, key)
+                totals_bytes = self._get(stats_key)
+                totals = json.loads(totals_bytes.decode()) if totals_bytes is not None else self._new_miner_stats()
+                self._add_miner_stats(totals, stats)
+                self._put(stats_key, json.dumps(totals, separators=(",", ":")).encode())
+
+    def get_miner_stats(self, kind: str, key: str = None, blocks: int = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns {coinbase address or miner id: totals}, for the given one or all of them.
+        :param kind: "coinbase" or "miner_id"
+        :param blocks: Only count the last this many blocks up to the sync head (at most consts.MAX_QUERY_BLOCKS)
+        """
+        if kind not in MINER_STATS_KINDS:
+            raise ValueError(f"kind must be one of {sorted(MINER_STATS_KINDS)}")
+        if blocks is not None and not 1 <= blocks <= consts.MAX_QUERY_BLOCKS:
+            raise ValueError(f"blocks must be between 1 and {consts.MAX_QUERY_BLOCKS}")
+        if blocks is None:
+            if key is not None:
+                totals_bytes = self._get(self._miner_stats_key(kind, key))
+                return {} if totals_bytes is None else {key: json.loads(totals_bytes.decode())}
+            prefix = MINER_STATS + MINER_STATS_KINDS[kind]
+            return {
+                k[len(prefix) :].decode("utf-8", "surrogatepass"): json.loads(v.decode())
+                for k, v in self._db.iterator(prefix=prefix)
+            }
+
+        result: Dict[str, Dict[str, Any]] = {}
+        head = self.get_sync_head()
+        start = MINER_BLOCKS + struct.pack(">I", max(head - blocks + 1, 0))
+        stop = MINER_BLOCKS + struct.pack(">I", head + 1)
+        for _, block_bytes in self._db.iterator(start=start, stop=stop):
+            block_stats = json.loads(block_bytes.decode())[kind]
+            if key is not None:
+                block_stats = {key: block_stats[key]} if key in block_stats else {}
+            for k, stats in block_stats.items():
+                self._add_miner_stats(result.setdefault(k, self._new_miner_stats()), stats)
+        return result
+
+
+class AlchemySnapshot(AlchemyDB):
+    def __init__(self, db):
+        """A read only AlchemyDB over a level-db snapshot, see AlchemyDB.read_view()"""
+        self._db = db.snapshot()
+        self._pending = None
+        self._pending_height = None
+        self._history_seq = {}
+
+    def close(self):
+        self._db.release()
+
+    def read_view(self) -> "AlchemyDB":
+        return self
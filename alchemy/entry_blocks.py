@@ -0,0 +1,50 @@
+from factom import Factomd
+from factom.client import NULL_BLOCK
+from typing import Dict, List
+
+import alchemy.metrics as metrics
+
+
+class EntryBlockIndex:
+    def __init__(self, chain_id: str):
+        """
+        A height --> entry block KeyMR index for a single chain, built by walking the chain's entry blocks backwards
+        from its head. Heights the chain has no entry block at can then be skipped without asking factomd, instead of
+        fetching the directory block at every height like Factomd.entries_at_height does.
+        """
+        self.chain_id = chain_id
+        self.covered_height = -1  # Every height <= this is known to be either in the index or empty
+        self._keymrs: Dict[int, str] = {}
+
+    def update(self, factomd: Factomd, from_height: int, to_height: int):
+        """
+        Indexes all entry blocks of the chain between from_height and the chain head.
+        :param to_height: The height factomd has all entry blocks up to (see heights()["entryblockheight"])
+        """
+        if to_height <= self.covered_height:
+            return
+        known_keymrs = set(self._keymrs.values())
+        keymr = factomd.chain_head(self.chain_id)["chainhead"]
+        while keymr != NULL_BLOCK and keymr not in known_keymrs:
+            with metrics.timed("alchemy_stage_seconds", stage="factomd_fetch"):
+                header = factomd.entry_block(keymr)["header"]
+            if header["dbheight"] < from_height:
+                break
+            self._keymrs[header["dbheight"]] = keymr
+            keymr = header["prevkeymr"]
+        self.covered_height = to_height
+
+    def prune(self, below_height: int):
+        """Forgets entry blocks below the given height, once they have been processed"""
+        for height in [h for h in self._keymrs if h < below_height]:
+            del self._keymrs[height]
+
+    def entries_at_height(self, factomd: Factomd, height: int, include_entry_context: bool = False) -> List[dict]:
+        """Same as Factomd.entries_at_height, but skips factomd entirely for indexed heights without entries"""
+        if self.covered_height < height:
+            return list(factomd.entries_at_height(self.chain_id, height, include_entry_context=include_entry_context))
+        keymr = self._keymrs.get(height)
+        if keymr is None:
+            return []
+        entry_block = factomd.entry_block(keymr)
+        return list(factomd.entries_in_entry_block(entry_block, include_entry_context=include_entry_context))
@@ -0,0 +1,316 @@
+import gzip
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from factom.client import NULL_BLOCK
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Tuple
+
+# A fixture is a json file (gzipped if its name ends in .gz) describing a stretch of chain block by block:
+#
+#   {
+#     "blocks": [
+#       {
+#         "height": 210000,
+#         "timestamp": 1565000000,              # Unix seconds the block started at
+#         "entry_blocks": [
+#           {"chainid": "<hex>", "keymr": "<hex, optional>", "entries": [
+#             {"extids": ["<hex>", ...], "content": "<hex>", "timestamp": 1565000060, "entryhash": "<hex, optional>"}
+#           ]}
+#         ],
+#         "fblock": {"transactions": [...]}     # As returned by factomd's fblock-by-height, optional
+#       }
+#     ],
+#     "balances": {"FA...": 100000000}          # Factoid balances in factoshis, optional
+#   }
+#
+# Missing entry hashes are computed like factomd does, and missing entry block KeyMRs are derived from the chain id
+# and height, so generated fixtures only need to provide the entries themselves.
+
+ERROR_BLOCK_NOT_FOUND = (-32008, "Block not found")
+ERROR_INVALID_PARAMS = (-32602, "Invalid params")
+ERROR_METHOD_NOT_FOUND = (-32601, "Method not found")
+ERROR_INTERNAL = (-32603, "Internal error")
+
+
+class StandinError(Exception):
+    def __init__(self, error: Tuple[int, str]):
+        super().__init__(error[1])
+        self.code, self.message = error
+
+
+def entry_hash(chain_id: str, external_ids: List[bytes], content: bytes) -> str:
+    """The factom entry hash: sha256(sha512(entry) + entry) over the marshalled entry"""
+    marshalled_ids = b"".join(struct.pack(">H", len(x)) + x for x in external_ids)
+    data = b"\x00" + bytes.fromhex(chain_id) + struct.pack(">H", len(marshalled_ids)) + marshalled_ids + content
+    return hashlib.sha256(hashlib.sha512(data).digest() + data).hexdigest()
+
+
+def load_fixture(path: str) -> Dict[str, Any]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        return json.load(f)
+
+
+def write_fixture(path: str, fixture: Dict[str, Any]):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt") as f:
+        json.dump(fixture, f, separators=(",", ":"))
+
+
+class Chain:
+    def __init__(self, fixture: Dict[str, Any]):
+        """Indexes a fixture by everything the factomd API looks things up by"""
+        self.directory_blocks: Dict[int, Dict[str, Any]] = {}
+        self.entry_blocks: Dict[str, Dict[str, Any]] = {}
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.factoid_blocks: Dict[int, Dict[str, Any]] = {}
+        self.balances: Dict[str, int] = fixture.get("balances", {})
+        chain_heads: Dict[str, Tuple[int, str]] = {}
+
+        for block in sorted(fixture["blocks"], key=lambda b: b["height"]):
+            height = block["height"]
+            timestamp = block.get("timestamp", 0)
+            dbentries = []
+            for entry_block in block.get("entry_blocks", []):
+                chain_id = entry_block["chainid"]
+                keymr = entry_block.get("keymr") or hashlib.sha256(f"{chain_id}{height}".encode()).hexdigest()
+                sequence, previous_keymr = chain_heads.get(chain_id, (-1, NULL_BLOCK))
+                entry_list = []
+                for entry in entry_block["entries"]:
+                    external_ids = [bytes.fromhex(x) for x in entry["extids"]]
+                    content = bytes.fromhex(entry["content"])
+                    hash_hex = entry.get("entryhash") or entry_hash(chain_id, external_ids, content)
+                    self.entries[hash_hex] = {
+                        "chainid": chain_id,
+                        "extids": entry["extids"],
+                        "content": entry["content"],
+                    }
+                    entry_list.append({"entryhash": hash_hex, "timestamp": entry.get("timestamp", timestamp)})
+                self.entry_blocks[keymr] = {
+                    "header": {
+                        "blocksequencenumber": sequence + 1,
+                        "chainid": chain_id,
+                        "prevkeymr": previous_keymr,
+                        "timestamp": timestamp,
+                        "dbheight": height,
+                    },
+                    "entrylist": entry_list,
+                }
+                chain_heads[chain_id] = (sequence + 1, keymr)
+                dbentries.append({"chainid": chain_id, "keymr": keymr})
+            self.directory_blocks[height] = {
+                "header": {"dbheight": height, "timestamp": timestamp // 60},
+                "dbentries": dbentries,
+            }
+            fblock = block.get("fblock", {"transactions": []})
+            self.factoid_blocks[height] = {**fblock, "dbheight": height}
+
+        self.first_height = min(self.directory_blocks) if len(self.directory_blocks) != 0 else 0
+        self.last_height = max(self.directory_blocks) if len(self.directory_blocks) != 0 else -1
+        # chain id --> [(height, keymr)], to find the head as of the currently visible height
+        self.entry_block_heights: Dict[str, List[Tuple[int, str]]] = {}
+        for keymr, entry_block in self.entry_blocks.items():
+            header = entry_block["header"]
+            self.entry_block_heights.setdefault(header["chainid"], []).append((header["dbheight"], keymr))
+        for heights in self.entry_block_heights.values():
+            heights.sort()
+
+
+class FactomdStandin:
+    def __init__(
+        self,
+        chain: Chain,
+        block_time: float = 0,
+        initial_height: int = None,
+        latency: float = 0,
+        jitter: float = 0,
+        failure_rate: float = 0,
+        seed: int = None,
+    ):
+        """
+        Answers factomd API v2 requests from a Chain.
+
+        :param block_time: If set, only blocks up to initial_height are visible at first, and one more block is
+            released every block_time seconds, like a live network. Otherwise all blocks are visible.
+        :param latency: Seconds to wait before answering each request, plus a uniformly random 0 to jitter seconds
+        :param failure_rate: Fraction of requests answered with an internal error instead
+        """
+        self.chain = chain
+        self.block_time = block_time
+        self.initial_height = chain.last_height if initial_height is None else initial_height
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.started_at = time.time()
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.methods = {
+            "heights": self.heights,
+            "current-minute": self.current_minute,
+            "dblock-by-height": self.directory_block_by_height,
+            "entry-block": self.entry_block,
+            "entry": self.entry,
+            "chain-head": self.chain_head,
+            "fblock-by-height": self.factoid_block_by_height,
+            "factoid-balance": self.factoid_balance,
+        }
+
+    def visible_height(self) -> int:
+        if self.block_time <= 0:
+            return self.chain.last_height
+        released = int((time.time() - self.started_at) / self.block_time)
+        return min(self.chain.last_height, self.initial_height + released)
+
+    def handle(self, method: str, params: Dict[str, Any]) -> Any:
+        """Returns the result of a request, or raises a StandinError after the configured latency"""
+        with self._random_lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.failure_rate
+        if 0 < delay:
+            time.sleep(delay)
+        if fail:
+            raise StandinError(ERROR_INTERNAL)
+        f = self.methods.get(method)
+        if f is None:
+            raise StandinError(ERROR_METHOD_NOT_FOUND)
+        try:
+            return f(**(params or {}))
+        except TypeError:
+            raise StandinError(ERROR_INVALID_PARAMS)
+
+    def heights(self) -> Dict[str, int]:
+        height = self.visible_height()
+        return {
+            "directoryblockheight": height,
+            "leaderheight": height + 1,
+            "entryblockheight": height,
+            "entryheight": height,
+        }
+
+    def current_minute(self) -> Dict[str, Any]:
+        height = self.visible_height()
+        now = time.time()
+        block_seconds = self.block_time if 0 < self.block_time else 600
+        if 0 < self.block_time:
+            block_start = self.started_at + (height - self.initial_height) * self.block_time
+        else:
+            block_start = now - (now % block_seconds)
+        minute = min(9, int((now - block_start) / (block_seconds / 10)))
+        return {
+            "leaderheight": height + 1,
+            "directoryblockheight": height,
+            "minute": minute,
+            "currentblockstarttime": int(block_start * 1e9),
+            "currentminutestarttime": int((block_start + minute * block_seconds / 10) * 1e9),
+            "currenttime": int(now * 1e9),
+            "directoryblockinseconds": int(block_seconds),
+            "stalldetected": False,
+            "faulttimeout": 120,
+            "roundtimeout": 30,
+        }
+
+    def _check_visible(self, height: int):
+        if height < self.chain.first_height or self.visible_height() < height:
+            raise StandinError(ERROR_BLOCK_NOT_FOUND)
+
+    def directory_block_by_height(self, height: int) -> Dict[str, Any]:
+        self._check_visible(height)
+        return {"dblock": self.chain.directory_blocks[height], "rawdata": ""}
+
+    def entry_block(self, keymr: str) -> Dict[str, Any]:
+        entry_block = self.chain.entry_blocks.get(keymr)
+        if entry_block is None:
+            raise StandinError(ERROR_BLOCK_NOT_FOUND)
+        self._check_visible(entry_block["header"]["dbheight"])
+        return entry_block
+
+    def entry(self, hash: str) -> Dict[str, Any]:
+        entry = self.chain.entries.get(hash)
+        if entry is None:
+            raise StandinError((-32008, "Entry not found"))
+        return dict(entry)
+
+    def chain_head(self, chainid: str) -> Dict[str, Any]:
+        height = self.visible_height()
+        heads = [keymr for h, keymr in self.chain.entry_block_heights.get(chainid, []) if h <= height]
+        if len(heads) == 0:
+            raise StandinError((-32009, "Missing Chain Head"))
+        return {"chainhead": heads[-1], "chaininprocesslist": False}
+
+    def factoid_block_by_height(self, height: int) -> Dict[str, Any]:
+        self._check_visible(height)
+        return {"fblock": self.chain.factoid_blocks[height], "rawdata": ""}
+
+    def factoid_balance(self, address: str) -> Dict[str, int]:
+        from factom_keys.fct import FactoidAddress
+
+        if not FactoidAddress.is_valid(address):
+            raise StandinError(ERROR_INVALID_PARAMS)
+        return {"balance": self.chain.balances.get(address, 0)}
+
+
+def make_server(standin: FactomdStandin, host: str = "127.0.0.1", port: int = 8088) -> ThreadingHTTPServer:
+    """Returns an HTTP server answering factomd JSON-RPC requests on /v2. Pass port 0 to pick a free one."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            request_id = None
+            try:
+                request = json.loads(body)
+                request_id = request.get("id")
+                result = standin.handle(request["method"], request.get("params"))
+                status, response = 200, {"jsonrpc": "2.0", "id": request_id, "result": result}
+            except StandinError as e:
+                error = {"code": e.code, "message": e.message}
+                status, response = 400, {"jsonrpc": "2.0", "id": request_id, "error": error}
+            except (ValueError, KeyError, AttributeError):
+                error = {"code": -32700, "message": "Parse error"}
+                status, response = 400, {"jsonrpc": "2.0", "id": request_id, "error": error}
+            data = json.dumps(response).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def record_fixture(factomd, start: int, end: int, chain_ids: Iterable[str], addresses: Iterable[str] = ()) -> Dict:
+    """Records the given chains' entries and all factoid blocks from start to end (inclusive) from a real factomd"""
+    chain_ids = set(chain_ids)
+    blocks = []
+    for height in range(start, end + 1):
+        directory_block = factomd.directory_block_by_height(height)["dblock"]
+        entry_blocks = []
+        for pointer in directory_block["dbentries"]:
+            if pointer["chainid"] not in chain_ids:
+                continue
+            entry_block = factomd.entry_block(pointer["keymr"])
+            entries = []
+            for entry_pointer in entry_block["entrylist"]:
+                entry = factomd.entry(entry_pointer["entryhash"], encode_as_hex=True)
+                entries.append(
+                    {
+                        "extids": entry["extids"],
+                        "content": entry["content"],
+                        "timestamp": entry_pointer["timestamp"],
+                        "entryhash": entry_pointer["entryhash"],
+                    }
+                )
+            entry_blocks.append({"chainid": pointer["chainid"], "keymr": pointer["keymr"], "entries": entries})
+        fblock = factomd.factoid_block_by_height(height)["fblock"]
+        timestamp = directory_block["header"]["timestamp"] * 60
+        blocks.append({"height": height, "timestamp": timestamp, "entry_blocks": entry_blocks, "fblock": fblock})
+    balances = {address: factomd.factoid_balance(address)["balance"] for address in addresses}
+    return {"blocks": blocks, "balances": balances}
@@ -1 +1 @@
-from .grading import process_block
+from .grading import BlockSubmissions, GradingPipeline, process_block
@@ -1,5 +1,25 @@
+from typing import Dict, Type
+
 from .base import BaseGrader
 from .stock import StockGrader
 
 # Custom implementations
 from .straight_difficulty import StraightDifficultyGrader
+
+# Name --> grader class, for selecting graders by name (e.g. `alchemy.py run --grader stock`)
+GRADERS: Dict[str, Type[BaseGrader]] = {
+    "stock": StockGrader,
+    "straight_difficulty": StraightDifficultyGrader,
+}
+
+
+def register_grader(name: str, grader_class: Type[BaseGrader]):
+    """Makes a custom grader available by name"""
+    GRADERS[name] = grader_class
+
+
+def make_grader(name: str, lxr) -> BaseGrader:
+    grader_class = GRADERS.get(name)
+    if grader_class is None:
+        raise ValueError(f"Unknown grader {name}, expected one of {sorted(GRADERS)}")
+    return grader_class(lxr)
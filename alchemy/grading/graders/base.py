@@ -1,10 +1,20 @@
+import heapq
 import pylxr
+import time
+from collections import Counter
 from dataclasses import dataclass
-from typing import List
+from typing import List, Set, Tuple
 
+import alchemy.metrics as metrics
 from alchemy.opr import OPR
 
 
+def _reject(reason: str, rejections: Counter = None):
+    metrics.increment("alchemy_opr_rejections_total", reason=reason)
+    if rejections is not None:
+        rejections[reason] += 1
+
+
 @dataclass
 class BaseGrader:
     lxr: pylxr.LXR
@@ -17,4 +27,73 @@ class BaseGrader:
         - a list of the top 50 records sorted by grade
         - a list of the top 50 records sorted by difficulty
         """
-        raise NotImplementedError("All graders must implement the grade_records function")
+        if len(records) < 10:
+            return None, None, None  # Not enough sane records to grade
+
+        # Get top 50 honest submissions by difficulty
+        eligible_records = self.filter_top_50(previous_winners, records)
+        return self.grade_eligible_records(eligible_records)
+
+    def grade_eligible_records(self, eligible_records: List[OPR]):
+        """
+        Grades the top 50 honest records by difficulty, as returned by filter_top_50, and returns the same as
+        grade_records. Records may be modified (grade) and reordered, so pass each grader its own copies.
+        """
+        raise NotImplementedError("All graders must implement the grade_eligible_records function")
+
+    def filter_top_50(self, previous_winners: List[str], records: List[OPR], rejections: Counter = None) -> List[OPR]:
+        """
+        Returns the top 50 most difficult submissions that are honest and also have the right previous winners
+        :param rejections: If given, rejected records are counted in it by reason, same as alchemy_opr_rejections_total
+        """
+        candidates = BaseGrader.prefilter(previous_winners, records, rejections)
+        valid_records: List[OPR] = []
+        hashing_seconds = 0.0
+        while len(candidates) != 0:
+            _, _, o = heapq.heappop(candidates)
+            start = time.perf_counter()
+            difficulty = self.lxr.h(o.opr_hash + o.nonce)[:8]
+            hashing_seconds += time.perf_counter() - start
+            if difficulty != o.self_reported_difficulty:
+                _reject("dishonest_difficulty", rejections)
+                metrics.increment("alchemy_dishonest_difficulty_total")
+                print(
+                    f"Dishonest OPR difficulty: e_hash={o.entry_hash.hex()}, observed={difficulty.hex()}, reported={o.self_reported_difficulty.hex()}"
+                )
+                continue
+            valid_records.append(o)
+            if 50 <= len(valid_records):
+                break  # Found max number of honest submissions, go grade them
+        # Once per block, like every other stage
+        metrics.observe("alchemy_stage_seconds", hashing_seconds, stage="lxr_verify")
+        return valid_records
+
+    @classmethod
+    def prefilter(
+        cls, previous_winners: List[str], records: List[OPR], rejections: Counter = None
+    ) -> List[Tuple[int, int, OPR]]:
+        """
+        Drops the records that can be rejected without any LXR hashing, and returns the rest as a heap of
+        (-difficulty, position, record), popping in the order of a stable sort by self reported difficulty, descending.
+        Only the records popped before 50 honest ones are found ever get hashed, so spam costs no more than a heapify.
+        """
+        candidates = []
+        seen: Set[bytes] = set()
+        for i, o in enumerate(records):
+            if len(o.self_reported_difficulty) != 8:
+                # LXR difficulties are 8 bytes, anything else can't be honest
+                _reject("malformed_difficulty", rejections)
+                continue
+            if o.prev_winners != previous_winners:
+                _reject("wrong_previous_winners", rejections)
+                continue
+            key = o.opr_hash + o.nonce
+            if key in seen:
+                # RemoveDuplicateSubmissions: only the first copy of the same work in entry order is graded, whatever
+                # difficulty the others claim, like the reference implementation
+                _reject("duplicate", rejections)
+                continue
+            seen.add(key)
+            candidates.append((-int.from_bytes(o.self_reported_difficulty, "big"), i, o))
+        heapq.heapify(candidates)
+        return candidates
@@ -1,27 +1,128 @@
+import copy
 import hashlib
+import os
 import pylxr
+from collections import Counter
+from dataclasses import dataclass, field
 from factom import Factomd
-from typing import List
+from typing import Any, Dict, List, Sequence, Tuple
 
 import alchemy.consts as consts
+import alchemy.csv_exporting
 import alchemy.grading.graders as graders
+import alchemy.metrics as metrics
+from alchemy.archive import OPRArchive
 from alchemy.opr import OPR
 
+home = os.getenv("HOME")
+shadow_path = f"{home}/.pegnet/alchemy/shadow/"
 
-def process_block(height: int, previous_winners: List[str], factomd: Factomd, lxr: pylxr.LXR, is_testnet: bool = False):
-    """Grades all entries in the OPR chain at the given height"""
+
+@dataclass
+class BlockSubmissions:
+    """What was submitted to the OPR chain at a height, and how much of it held up, for estimating network hashrate"""
+
+    entries: int = 0  # Entries in the OPR chain
+    records: int = 0  # Entries that passed sanity checks
+    dishonest: int = 0  # Records found to misreport their difficulty while verifying the top 50
+    difficulties: List[int] = field(default_factory=list)  # Difficulties of the verified top 50, descending
+
+
+class GradingPipeline:
+    def __init__(
+        self,
+        lxr: pylxr.LXR,
+        grader: str = "stock",
+        shadow_graders: Sequence[str] = (),
+        archive: OPRArchive = None,
+    ):
+        """
+        Grades blocks with a consensus grader, whose results the node executes, and any number of shadow graders for
+        research. Honesty verification (the LXR hashing) happens once per block, then every grader is handed the
+        same verified top 50, so shadow graders cost no extra hashing.
+
+        :param grader: Name of the consensus grader in graders.GRADERS. Anything but "stock" forks from PegNet.
+        :param shadow_graders: Names of graders whose results are only reported, never executed
+        :param archive: Where to keep the verified top 50 of every graded block, for replaying graders later
+        """
+        self.grader = graders.make_grader(grader, lxr)
+        self.shadow_graders = {name: graders.make_grader(name, lxr) for name in shadow_graders}
+        self.shadow_results: Dict[str, Tuple[Any, Any, Any]] = {}
+        self.archive = archive
+
+    def grade_records(self, previous_winners: List[str], records: List[OPR], height: int = None, entries: int = None):
+        """
+        Returns the consensus grader's results (see BaseGrader.grade_records), followed by the BlockSubmissions of the
+        block. Shadow results go in shadow_results.
+        :param height: Height of the records, required to archive them
+        :param entries: Number of entries the records were parsed from, len(records) if None
+        """
+        self.shadow_results = {}
+        # Blocks too small to grade are verified all the same, their difficulties still say something about hashrate
+        rejections = Counter()
+        eligible_records = self.grader.filter_top_50(previous_winners, records, rejections) if records else []
+        submissions = BlockSubmissions(
+            entries=len(records) if entries is None else entries,
+            records=len(records),
+            dishonest=rejections["dishonest_difficulty"],
+            difficulties=[int.from_bytes(r.self_reported_difficulty, "big") for r in eligible_records],
+        )
+        if self.archive is not None:
+            # Before grading, which reorders the records. Empty blocks are put too, to drop what a rewind left behind.
+            with metrics.timed("alchemy_stage_seconds", stage="opr_archive"):
+                self.archive.put(height, eligible_records if 10 <= len(records) else [])
+        if len(records) < 10:
+            return None, None, None, submissions  # Not enough sane records to grade
+        # Graders set grades and reorder what they're given, and may change estimates in place, so each shadow grader
+        # works on deep copies taken before consensus grading touches anything
+        shadow_records = {name: copy.deepcopy(eligible_records) for name in self.shadow_graders}
+        result = self.grader.grade_eligible_records(list(eligible_records))
+        for name, grader in self.shadow_graders.items():
+            self.shadow_results[name] = grader.grade_eligible_records(shadow_records[name])
+        return (*result, submissions)
+
+    def report_shadow_results(self, height: int, winners: List[OPR]):
+        """Prints how each shadow grader's winners compare to the consensus winners and exports its winning prices"""
+        consensus_winners = set(r.entry_hash for r in winners[:10]) if winners is not None else set()
+        for name, (prices, shadow_winners, _) in self.shadow_results.items():
+            if shadow_winners is None:
+                print(f"Shadow grader {name}: skipped block {height}")
+                continue
+            shared = len(consensus_winners.intersection(r.entry_hash for r in shadow_winners[:10]))
+            print(f"Shadow grader {name}: {shared}/10 winners shared with consensus")
+            filename = os.path.join(shadow_path, name, "prices.csv")
+            alchemy.csv_exporting.write_prices(prices, height, shadow_winners[0].timestamp, filename)
+
+
+def process_block(
+    height: int,
+    previous_winners: List[str],
+    factomd: Factomd,
+    lxr: pylxr.LXR,
+    is_testnet: bool = False,
+    pipeline: GradingPipeline = None,
+):
+    """
+    Grades all entries in the OPR chain at the given height, returning the same as GradingPipeline.grade_records
+    :param pipeline: The graders to use, the stock grader alone if None
+    """
     current_block_records = []
-    entries = factomd.entries_at_height(consts.OPR_CHAIN_ID, height, include_entry_context=True)
-    for e in entries:
-        entry_hash = bytes.fromhex(e["entryhash"])
-        external_ids, content, timestamp = e["extids"], e["content"], e["timestamp"]
-        record = OPR.from_entry(entry_hash, external_ids, content, timestamp)
-        if record is None or record.height != height:
-            continue  # Failed sanity check, throw it out
-        # It's a valid OPR, compute its hash and append to current block OPRs
-        record.opr_hash = hashlib.sha256(content).digest()
-        current_block_records.append(record)
-
-    # Pluggable grader below. Swap out the following line for a custom implementation for testing purposes.
-    grader = graders.StockGrader(lxr)
-    return grader.grade_records(previous_winners, current_block_records)
+    with metrics.timed("alchemy_stage_seconds", stage="factomd_fetch"):
+        entries = list(factomd.entries_at_height(consts.OPR_CHAIN_ID, height, include_entry_context=True))
+    with metrics.timed("alchemy_stage_seconds", stage="opr_parse"):
+        for e in entries:
+            entry_hash = bytes.fromhex(e["entryhash"])
+            external_ids, content, timestamp = e["extids"], e["content"], e["timestamp"]
+            record = OPR.from_entry(entry_hash, external_ids, content, timestamp)
+            if record is None or record.height != height:
+                continue  # Failed sanity check, throw it out
+            # It's a valid OPR, compute its hash and append to current block OPRs
+            record.opr_hash = hashlib.sha256(content).digest()
+            current_block_records.append(record)
+    metrics.observe("alchemy_block_records", len(current_block_records), kind="opr")
+
+    if pipeline is None:
+        pipeline = GradingPipeline(lxr)
+    result = pipeline.grade_records(previous_winners, current_block_records, height, len(entries))
+    pipeline.report_shadow_results(height, result[1])
+    return result
@@ -1,5 +1,6 @@
 import aiorpc
 import asyncio
+import concurrent.futures
 import factom
 import pylxr
 import uvloop
@@ -7,34 +8,162 @@ from collections import defaultdict
 from colorama import Fore as color
 from factom import Factomd
 from factom_keys.fct import FactoidAddress
+from typing import List, Sequence
 
 import alchemy.burning
 import alchemy.consts as consts
 import alchemy.csv_exporting
 import alchemy.grading
+import alchemy.metrics as metrics
+import alchemy.polling
+import alchemy.profiling
 import alchemy.transactions
 import alchemy.rpc
+from alchemy.archive import OPRArchive
 from alchemy.db import AlchemyDB
+from alchemy.entry_blocks import EntryBlockIndex
 
 
-async def run_protocol(database: AlchemyDB, is_testnet: bool = False):
-    lxr = pylxr.LXR(map_size_bits=30)
+async def run_protocol(
+    database: AlchemyDB,
+    is_testnet: bool = False,
+    profiler: alchemy.profiling.BlockProfiler = None,
+    reverify_signatures: bool = False,
+    lxr_map_size_bits: int = 30,
+    grader: str = "stock",
+    shadow_graders: Sequence[str] = (),
+    archive_oprs: bool = False,
+):
+    lxr = pylxr.LXR(map_size_bits=lxr_map_size_bits)
+    archive = OPRArchive(is_testnet) if archive_oprs else None
+    grading_pipeline = alchemy.grading.GradingPipeline(lxr, grader, shadow_graders, archive)
     factomd = Factomd()
+    profiler = profiler or alchemy.profiling.BlockProfiler(0)
+    poller = alchemy.polling.BlockPoller(factomd)
+    transactions_index = EntryBlockIndex(consts.TRANSACTIONS_CHAIN_ID)
+    # Blocks are executed on a single worker thread, so the event loop stays free to serve aiorpc requests from the
+    # snapshot of the last committed block (see AlchemyDB.read_view) for however long a catch up takes
+    loop = asyncio.get_event_loop()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="alchemy-executor")
     while True:
         sync_head = database.get_sync_head()
         if sync_head == -1:
             sync_head += consts.START_HEIGHT
-        latest_block = factomd.heights()["directoryblockheight"]
+        heights = await loop.run_in_executor(executor, factomd.heights)
+        latest_block = heights["directoryblockheight"]
+        metrics.set_gauge("alchemy_sync_lag_blocks", latest_block - sync_head)
         if latest_block == sync_head:
-            await asyncio.sleep(15)
+            await poller.wait_for_block(sync_head + 1)
             continue
-        for height in range(sync_head + 1, latest_block + 1):
-            print(f"\nExecuting block {height}...")
-            execute_block(height, factomd, lxr, database, is_testnet)
+        await loop.run_in_executor(
+            executor,
+            execute_blocks,
+            sync_head + 1,
+            latest_block,
+            heights["entryblockheight"],
+            factomd,
+            lxr,
+            database,
+            is_testnet,
+            profiler,
+            transactions_index,
+            reverify_signatures,
+            grading_pipeline,
+        )
         print("\nDone. Waiting for next block...")
 
 
-def execute_block(height: int, factomd: Factomd, lxr: pylxr.LXR, database: AlchemyDB, is_testnet: bool = False):
+def execute_blocks(
+    start: int,
+    end: int,
+    entry_block_height: int,
+    factomd: Factomd,
+    lxr: pylxr.LXR,
+    database: AlchemyDB,
+    is_testnet: bool,
+    profiler: alchemy.profiling.BlockProfiler,
+    transactions_index: EntryBlockIndex,
+    reverify_signatures: bool = False,
+    grading_pipeline: alchemy.grading.GradingPipeline = None,
+):
+    """Executes all blocks from start to end (inclusive), in order"""
+    # The transactions chain is empty at most heights, so find the ones it has entry blocks at up front
+    transactions_index.prune(start)
+    transactions_index.update(factomd, start, min(end, entry_block_height))
+    # Burns only depend on factoid blocks, so they're scanned concurrently ahead of the sequential executor
+    for height, burns in alchemy.burning.scan_range(
+        start, end, is_testnet, factomd_factory=alchemy.burning.client_factory(factomd)
+    ):
+        print(f"\nExecuting block {height}...")
+        with profiler.block(height):
+            execute_block(
+                height,
+                factomd,
+                lxr,
+                database,
+                is_testnet,
+                burns,
+                transactions_index,
+                reverify_signatures,
+                grading_pipeline,
+            )
+        metrics.set_gauge("alchemy_sync_lag_blocks", end - height)
+
+
+def execute_block(
+    height: int,
+    factomd: Factomd,
+    lxr: pylxr.LXR,
+    database: AlchemyDB,
+    is_testnet: bool = False,
+    burns: List[alchemy.burning.Burn] = None,
+    transactions_index: EntryBlockIndex = None,
+    reverify_signatures: bool = False,
+    grading_pipeline: alchemy.grading.GradingPipeline = None,
+):
+    """
+    Executes a single block and commits all of its writes at once.
+    :param burns: Burns already scanned for this height (see alchemy.burning.scan_range). Fetched inline if None.
+    :param transactions_index: Index of the transactions chain, used to skip fetching at heights without entries
+    :param reverify_signatures: Verify transaction signatures again instead of trusting recorded verdicts
+    :param grading_pipeline: The consensus and shadow graders to grade OPRs with, the stock grader alone if None
+    """
+    # All writes for the block (balances, indexes, winners, rates and sync head) are committed in one batch, along
+    # with an undo record of everything they overwrite
+    with metrics.timed("alchemy_block_seconds"):
+        database.begin_block(height)
+        try:
+            _execute_block(
+                height,
+                factomd,
+                lxr,
+                database,
+                is_testnet,
+                burns,
+                transactions_index,
+                reverify_signatures,
+                grading_pipeline,
+            )
+        except Exception:
+            database.abort_block()
+            raise
+        with metrics.timed("alchemy_stage_seconds", stage="db_commit"):
+            database.commit_block()
+    metrics.increment("alchemy_blocks_executed_total")
+    metrics.set_gauge("alchemy_sync_head", height)
+
+
+def _execute_block(
+    height: int,
+    factomd: Factomd,
+    lxr: pylxr.LXR,
+    database: AlchemyDB,
+    is_testnet: bool = False,
+    burns: List[alchemy.burning.Burn] = None,
+    transactions_index: EntryBlockIndex = None,
+    reverify_signatures: bool = False,
+    grading_pipeline: alchemy.grading.GradingPipeline = None,
+):
     # 1) Grade OPRs
     previous_winners_full = database.get_highest_winners()
     previous_winners = (
@@ -42,7 +171,14 @@ def execute_block(height: int, factomd: Factomd, lxr: pylxr.LXR, database: Alche
         if len(previous_winners_full) != 0
         else ["" for _ in range(10)]
     )
-    prices, winners, top50 = alchemy.grading.process_block(height, previous_winners, factomd, lxr, is_testnet)
+    with metrics.timed("alchemy_stage_seconds", stage="grading"):
+        prices, winners, top50, submissions = alchemy.grading.process_block(
+            height, previous_winners, factomd, lxr, is_testnet, grading_pipeline
+        )
+    # Kept for every block, graded or not: the network hashrate can be estimated without hashing OPRs again
+    database.put_difficulties(
+        height, submissions.entries, submissions.records, submissions.dishonest, submissions.difficulties
+    )
     if winners is not None:
         # Update winners in database. Calculate PNT reward deltas. Export winning prices to csv
         winning_entry_hashes = [record.entry_hash for record in winners[:10]]
@@ -62,6 +198,17 @@ def execute_block(height: int, factomd: Factomd, lxr: pylxr.LXR, database: Alche
         for address, delta in pnt_deltas.items():
             address_bytes = FactoidAddress(address_string=address).rcd_hash
             database.update_balances(address_bytes, {consts.PNT: delta})
+        for i, record in enumerate(winners[:10]):
+            address_bytes = FactoidAddress(address_string=record.coinbase_address).rcd_hash
+            reward = {consts.PNT: consts.BLOCK_REWARDS.get(i, 0)}
+            database.put_history(address_bytes, height, "reward", reward, record.entry_hash)
+
+        # Miner statistics: everyone in the top 50 (all of winners), with places and rewards for the first 10
+        miner_records = [
+            (record.coinbase_address, record.miner_id, i + 1 if i < 10 else 0, consts.BLOCK_REWARDS.get(i, 0))
+            for i, record in enumerate(winners)
+        ]
+        database.put_miner_block(height, miner_records)
 
         rates = winners[0].asset_estimates
         winners_description = [x[:8].hex() for x in winning_entry_hashes]
@@ -73,31 +220,66 @@ def execute_block(height: int, factomd: Factomd, lxr: pylxr.LXR, database: Alche
 
     # 2) Find new FCT --> pFCT burns
     try:
-        burn_count, account_deltas = alchemy.burning.process_block(height, factomd, is_testnet)
-        for address, deltas in account_deltas.items():
-            database.update_balances(address, deltas)
-        print(f"Parsed factoid block {height} (burns found: {burn_count})")
+        with metrics.timed("alchemy_stage_seconds", stage="burns"):
+            if burns is None:
+                burns = alchemy.burning.process_block(height, factomd, is_testnet)
+            for burn in burns:
+                database.update_balances(burn.address, {"pFCT": burn.amount})
+                database.put_history(burn.address, height, "burn", {"pFCT": burn.amount}, burn.tx_id)
+        print(f"Parsed factoid block {height} (burns found: {len(burns)})")
     except factom.exceptions.BlockNotFound:
         pass
 
     # 3) Execute transactions
-    alchemy.transactions.process_block(height, rates, factomd, database)
+    with metrics.timed("alchemy_stage_seconds", stage="transactions"):
+        alchemy.transactions.process_block(height, rates, factomd, database, transactions_index, reverify_signatures)
 
     database.put_sync_head(height)
 
 
-def run(is_testnet: bool):
-    """Main entry point for an alchemy node"""
+def run(
+    is_testnet: bool,
+    profile_blocks: int = 0,
+    reverify_signatures: bool = False,
+    storage: str = "leveldb",
+    lxr_map_size_bits: int = 30,
+    grader: str = "stock",
+    shadow_graders: Sequence[str] = (),
+    archive_oprs: bool = False,
+):
+    """Main entry point for an alchemy node
+    :param profile_blocks: Number of blocks to profile, starting with the next one executed
+    :param reverify_signatures: Verify transaction signatures again instead of trusting recorded verdicts
+    :param storage: The storage engine to keep the database in, one of alchemy.storage.ENGINES
+    :param lxr_map_size_bits: Size of the LXR hash map. Anything but 30 only works with synthetic chains.
+    :param grader: Name of the grader whose results are executed (see alchemy.grading.graders.GRADERS)
+    :param shadow_graders: Names of graders to also run on every block, only reporting their results
+    :param archive_oprs: Keep the verified top 50 of every block in an alchemy.archive.OPRArchive
+    """
     loop = uvloop.new_event_loop()
     asyncio.set_event_loop(loop)
 
-    database = AlchemyDB(is_testnet, create_if_missing=True)
+    database = AlchemyDB(is_testnet, storage, create_if_missing=True)
     alchemy.rpc.register_database_functions(database)
 
     server_coro = asyncio.start_server(aiorpc.serve, "127.0.0.1", 6000, loop=loop)
     server = loop.run_until_complete(server_coro)
+    profiler = alchemy.profiling.BlockProfiler(profile_blocks)
     try:
-        loop.run_until_complete(run_protocol(database, is_testnet))
+        loop.run_until_complete(
+            run_protocol(
+                database,
+                is_testnet,
+                profiler,
+                reverify_signatures,
+                lxr_map_size_bits,
+                grader,
+                shadow_graders,
+                archive_oprs,
+            )
+        )
     except (KeyboardInterrupt, SystemExit):
+        # Don't lose the blocks profiled so far when stopped before all of them were
+        profiler.finish()
         server.close()
         loop.run_until_complete(server.wait_closed())
@@ -0,0 +1,145 @@
+import bisect
+import contextlib
+import functools
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# name --> (type, help text, histogram buckets)
+DEFINITIONS: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {
+    "alchemy_stage_seconds": (
+        HISTOGRAM,
+        "Seconds spent per block in each stage of execution. factomd_fetch, opr_parse, lxr_verify and opr_archive are "
+        "also counted within their enclosing grading, burns and transactions stages.",
+        SECONDS_BUCKETS,
+    ),
+    "alchemy_block_seconds": (HISTOGRAM, "Seconds spent executing each block end to end", SECONDS_BUCKETS),
+    "alchemy_block_records": (HISTOGRAM, "Number of records of each kind found per block", COUNT_BUCKETS),
+    "alchemy_blocks_executed_total": (COUNTER, "Number of blocks executed since the node started", ()),
+    "alchemy_dishonest_difficulty_total": (COUNTER, "OPRs whose self reported difficulty failed LXR verification", ()),
+    "alchemy_opr_rejections_total": (
+        COUNTER,
+        "OPRs left out of grading, by reason: malformed_difficulty, wrong_previous_winners, duplicate or "
+        "dishonest_difficulty. Only dishonest_difficulty costs an LXR hash.",
+        (),
+    ),
+    "alchemy_sync_head": (GAUGE, "Highest block height executed", ()),
+    "alchemy_sync_lag_blocks": (GAUGE, "Blocks between the sync head and the factomd directoryblockheight", ()),
+    "alchemy_rpc_seconds": (HISTOGRAM, "Seconds spent answering each aiorpc method", SECONDS_BUCKETS),
+    "alchemy_block_detection_seconds": (
+        HISTOGRAM,
+        "Seconds between factomd closing a directory block and the node noticing it was saved, while caught up",
+        SECONDS_BUCKETS,
+    ),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Registry:
+    def __init__(self):
+        """A thread safe store of counters, gauges and histograms, keyed by metric name and label values"""
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[LabelKey, Any]] = {name: {} for name in DEFINITIONS}
+
+    def increment(self, name: str, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[name][key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = DEFINITIONS[name][2]
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = {"counts": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0}
+                series[key] = histogram
+            histogram["counts"][bisect.bisect_left(buckets, value)] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    @contextlib.contextmanager
+    def timed(self, name: str, **labels):
+        """Observes the wall time spent inside the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns all metrics as plain dicts and lists, suitable for sending over aiorpc"""
+        result = {}
+        with self._lock:
+            for name, series in self._values.items():
+                metric_type, help_text, buckets = DEFINITIONS[name]
+                samples = []
+                for key, value in series.items():
+                    if metric_type == HISTOGRAM:
+                        value = {"counts": list(value["counts"]), "sum": value["sum"], "count": value["count"]}
+                    samples.append({"labels": dict(key), "value": value})
+                result[name] = {"type": metric_type, "help": help_text, "buckets": list(buckets), "samples": samples}
+        return result
+
+
+REGISTRY = Registry()
+increment = REGISTRY.increment
+set_gauge = REGISTRY.set_gauge
+observe = REGISTRY.observe
+timed = REGISTRY.timed
+snapshot = REGISTRY.snapshot
+
+
+def timed_function(f, name: str, **labels):
+    """Wraps f so that every call is observed in the given histogram"""
+
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        with REGISTRY.timed(name, **labels):
+            return f(*args, **kwargs)
+
+    return wrapper
+
+
+def _format_labels(labels: Dict[str, str], extra: Dict[str, str] = None) -> str:
+    items = list(labels.items()) + (list(extra.items()) if extra else [])
+    if len(items) == 0:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in items]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def to_prometheus_text(metrics_snapshot: Dict[str, Any]) -> str:
+    """Renders a snapshot() in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for name, metric in sorted(metrics_snapshot.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for sample in metric["samples"]:
+            labels = sample["labels"]
+            if metric["type"] != HISTOGRAM:
+                lines.append(f"{name}{_format_labels(labels)} {sample['value']}")
+                continue
+            cumulative = 0
+            upper_bounds = [str(b) for b in metric["buckets"]] + ["+Inf"]
+            for upper_bound, count in zip(upper_bounds, sample["value"]["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, {'le': upper_bound})} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {sample['value']['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {sample['value']['count']}")
+    return "\n".join(lines) + "\n"
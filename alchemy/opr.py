@@ -1,13 +1,12 @@
-import factom_keys.fct
-import json
 import numpy as np
 from dataclasses import dataclass
 from typing import Dict, List
 
 import alchemy.consts as consts
-
+import alchemy.decoding as decoding
 
 AssetEstimates = Dict[str, np.float64]
+NUMBER_TYPES = {int, float}
 
 
 @dataclass
@@ -31,23 +30,19 @@ class OPR:
             return None
         if len(external_ids) != 3:
             return None
-        try:
-            record_json = json.loads(content.decode())
-        except ValueError:
-            return None
-
-        nonce = external_ids[0]
-        self_reported_difficulty = external_ids[1]
-        version = external_ids[2]
+        nonce, self_reported_difficulty, version = external_ids
         if type(nonce) != bytes or type(self_reported_difficulty) != bytes or type(version) != bytes:
             return None
-        if len(version) != 1 or version[0] != 1:
+        if version != b"\x01":
             return None
-
-        coinbase = record_json.get("coinbase")
-        if not factom_keys.fct.FactoidAddress.is_valid(coinbase):
+        try:
+            record_json = decoding.loads(content)
+        except ValueError:
+            return None
+        if type(record_json) != dict:
             return None
 
+        # Cheapest checks first, the coinbase address is validated last
         height = record_json.get("dbht")
         if type(height) != int or height < 0:
             return None
@@ -61,20 +56,21 @@ class OPR:
             return None
         for winner in prev_winners:
             if type(winner) != str:
-                return
+                return None
 
         # Check that the OPR has all required assets (and no more)
         asset_estimates = record_json.get("assets")
-        if type(asset_estimates) != dict or len(asset_estimates.keys()) != len(consts.ALL_ASSETS):
+        if type(asset_estimates) != dict or asset_estimates.keys() != consts.ALL_ASSETS:
+            return None
+        estimates = list(asset_estimates.values())
+        if not set(map(type, estimates)) <= NUMBER_TYPES:
+            return None
+        if estimates.count(0) != (1 if asset_estimates[consts.PNT] == 0 else 0):
+            return None  # Only PNT may be 0
+
+        coinbase = record_json.get("coinbase")
+        if not decoding.is_valid_address(coinbase):
             return None
-        for k, v in asset_estimates.items():
-            if type(k) != str or type(v) not in {int, float}:
-                return None
-            if k != consts.PNT and v == 0:
-                return None
-        for k in consts.ALL_ASSETS:
-            if k not in asset_estimates:
-                return None
 
         return OPR(
             entry_hash=entry_hash,
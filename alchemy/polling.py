@@ -0,0 +1,73 @@
+import asyncio
+import factom
+from factom import Factomd
+from typing import Any, Dict
+
+import alchemy.metrics as metrics
+
+NANOSECONDS = 1e9
+
+
+def next_poll_delay(
+    status: Dict[str, Any], height: int, min_interval: float, max_interval: float, lead: float
+) -> float:
+    """
+    Returns how long to wait before asking factomd whether directory block `height` was saved yet.
+
+    While `height` is still being built, sleep until `lead` seconds before its last minute is expected to end (from
+    factomd's current minute and minute start time). Once factomd has moved past it (leaderheight > height) the block
+    is only waiting on signatures, so poll tightly, backing off the longer it stays unsaved.
+    :param status: A response of Factomd.current_minute()
+    """
+    if status["stalldetected"]:
+        return max_interval
+    now = status["currenttime"] / NANOSECONDS
+    minute_seconds = status["directoryblockinseconds"] / 10
+    if status["leaderheight"] <= height:
+        minutes_left = 10 - status["minute"]
+        expected_end = status["currentminutestarttime"] / NANOSECONDS + minutes_left * minute_seconds
+        until_lead = expected_end - now - lead
+        if 0 < until_lead:
+            return min(max_interval, until_lead)
+        return min_interval
+    overdue = now - status["currentblockstarttime"] / NANOSECONDS
+    return min(max_interval, max(min_interval, overdue / 10))
+
+
+class BlockPoller:
+    def __init__(self, factomd: Factomd, min_interval: float = 0.5, max_interval: float = 15, lead: float = 5):
+        """
+        Waits for new directory blocks, polling factomd tightly around the time a block is expected to be saved
+        and backing off otherwise. Falls back to polling heights() every max_interval seconds if factomd doesn't
+        support current-minute.
+        """
+        self.factomd = factomd
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.lead = lead
+
+    async def wait_for_block(self, height: int) -> int:
+        """Returns the directoryblockheight, once factomd has saved the block at the given height"""
+        loop = asyncio.get_event_loop()
+        waited = False
+        while True:
+            try:
+                status = await loop.run_in_executor(None, self.factomd.current_minute)
+            except factom.exceptions.FactomAPIError:
+                status = None
+            if status is None:
+                latest_block = (await loop.run_in_executor(None, self.factomd.heights))["directoryblockheight"]
+                if height <= latest_block:
+                    return latest_block
+                delay = self.max_interval
+            else:
+                latest_block = status["directoryblockheight"]
+                if height <= latest_block:
+                    if waited and latest_block == height and status["leaderheight"] == height + 1:
+                        # The next block started when this one ended, both by factomd's clock
+                        latency = (status["currenttime"] - status["currentblockstarttime"]) / NANOSECONDS
+                        metrics.observe("alchemy_block_detection_seconds", max(latency, 0))
+                    return latest_block
+                delay = next_poll_delay(status, height, self.min_interval, self.max_interval, self.lead)
+            waited = True
+            await asyncio.sleep(delay)
@@ -0,0 +1,158 @@
+import collections
+import contextlib
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from typing import Dict, List, Tuple
+
+home = os.getenv("HOME")
+profiles_path = f"{home}/.pegnet/alchemy/profiles/"
+
+# Subsystem name --> path fragment of the source files that belong to it
+SUBSYSTEMS = {
+    "grading": os.path.join("alchemy", "grading") + os.sep,
+    "transactions": os.path.join("alchemy", "transactions") + os.sep,
+    "burning": os.path.join("alchemy", "burning.py"),
+    "db": os.path.join("alchemy", "db.py"),
+}
+
+
+def subsystem_of(filename: str):
+    for name, fragment in SUBSYSTEMS.items():
+        if fragment in filename:
+            return name
+    return None
+
+
+class StackSampler:
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        """
+        Periodically samples the stack of the given thread, counting identical stacks in collapsed form.
+        Starts out paused, so only what happens between resume() and pause() is sampled.
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Dict[str, int] = collections.Counter()
+        self._stop = threading.Event()
+        self._active = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="alchemy-stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def resume(self):
+        self._active.set()
+
+    def pause(self):
+        self._active.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._active.set()  # Wakes up a paused sampler so it can exit
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._active.wait()
+            if self._stop.wait(self.interval) or not self._active.is_set():
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            frames: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if len(frames) != 0:
+                self.stacks[";".join(reversed(frames))] += 1
+
+    def write_collapsed(self, filename: str):
+        """Writes stacks in the collapsed format understood by flamegraph.pl and speedscope"""
+        with open(filename, "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class BlockProfiler:
+    def __init__(self, n_blocks: int, output_dir: str = profiles_path):
+        """
+        Profiles the next n_blocks executed blocks with cProfile, while also sampling stacks for flame graphs.
+        Once all blocks are done, writes <name>.pstats and <name>.collapsed into output_dir and prints a summary.
+        Call finish() on shutdown to do the same with the blocks profiled so far.
+        """
+        self.remaining = n_blocks
+        self.output_dir = output_dir
+        self._profile = cProfile.Profile()
+        self._sampler = None
+        self._heights: List[int] = []
+        self._finished = False
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def block(self, height: int):
+        """Wrap the execution of a single block. Does nothing once the requested number of blocks were profiled."""
+        if self.remaining <= 0:
+            yield
+            return
+        if self._sampler is None:
+            self._sampler = StackSampler(threading.get_ident())
+            self._sampler.start()
+        self._heights.append(height)
+        self._sampler.resume()
+        self._profile.enable()
+        try:
+            yield
+        finally:
+            self._profile.disable()
+            self._sampler.pause()
+            self.remaining -= 1
+            if self.remaining == 0:
+                self.finish()
+
+    def finish(self):
+        """Writes and summarizes what was profiled, unless nothing was or it already has been"""
+        with self._lock:
+            if self._sampler is None or self._finished:
+                return
+            self._finished = True
+            self.remaining = 0
+            self._sampler.stop()
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        name = f"blocks-{self._heights[0]}-{self._heights[-1]}-{int(time.time())}"
+        pstats_filename = os.path.join(self.output_dir, f"{name}.pstats")
+        collapsed_filename = os.path.join(self.output_dir, f"{name}.collapsed")
+        self._profile.dump_stats(pstats_filename)
+        self._sampler.write_collapsed(collapsed_filename)
+
+        print(f"\nProfiled {len(self._heights)} blocks ({self._heights[0]} to {self._heights[-1]})")
+        print(summarize(pstats.Stats(self._profile)))
+        print(f"Wrote {pstats_filename}")
+        print(f"Wrote {collapsed_filename}")
+
+
+def summarize(stats: pstats.Stats, top_n: int = 5) -> str:
+    """
+    Summarizes profiled time per subsystem. A subsystem's total is the cumulative time of all calls made into it from
+    outside of it, so time spent in libraries it calls (pylxr, plyvel, factomd requests) counts towards it.
+    """
+    totals: Dict[str, float] = collections.defaultdict(float)
+    hot: Dict[str, List[Tuple[float, int, str]]] = collections.defaultdict(list)
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        filename, line, func_name = func
+        subsystem = subsystem_of(filename)
+        if subsystem is None:
+            continue
+        hot[subsystem].append((ct, nc, f"{func_name} ({os.path.basename(filename)}:{line})"))
+        for caller, caller_stats in callers.items():
+            if subsystem_of(caller[0]) != subsystem:
+                totals[subsystem] += caller_stats[3]
+
+    lines = []
+    for subsystem in SUBSYSTEMS:
+        lines.append(f"{subsystem}: {totals[subsystem]:.3f}s")
+        for ct, nc, description in sorted(hot[subsystem], reverse=True)[:top_n]:
+            lines.append(f"    {ct:9.3f}s cumulative  {nc:8d} calls  {description}")
+    return "\n".join(lines)
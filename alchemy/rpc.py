@@ -1,28 +1,61 @@
 import aiorpc
 import asyncio
-import uvloop
-import factom
-import plotly.subplots
-import plotly.graph_objects as go
-import pandas as pd
-from typing import List
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Dict, List
 
-import alchemy.csv_exporting
-from alchemy.db import AlchemyDB
+import alchemy.consts as consts
+import alchemy.metrics as metrics
+from alchemy.subscriptions import CALL_MAX_SECONDS, LONG_POLL_MAX_SECONDS, BlockEvents
 
+# This module is imported by every CLI command and by alchemy_api.py, so it must stay cheap to import. Heavy
+# dependencies (factom, plyvel, pandas, plotly, numpy) are imported inside the functions that need them.
+if TYPE_CHECKING:
+    import factom
+    from alchemy.db import AlchemyDB
 
-def register_database_functions(database: AlchemyDB):
-    aiorpc.register("sync_head", database.get_sync_head)
-    aiorpc.register("winners", database.get_winners)
-    aiorpc.register("latest-winners", database.get_highest_winners)
-    aiorpc.register("balances", database.get_balances)
-    aiorpc.register("rates", database.get_rates)
 
+def _register(name: str, f):
+    aiorpc.register(name, metrics.timed_function(f, "alchemy_rpc_seconds", method=name))
 
-def _make_call(coro):
-    loop = uvloop.new_event_loop()
+
+def _register_reader(name: str, database: "AlchemyDB", method: str):
+    """Registers a database getter that reads from the snapshot of the last committed block"""
+
+    def f(*args):
+        return getattr(database.read_view(), method)(*args)
+
+    _register(name, f)
+
+
+def register_database_functions(database: "AlchemyDB"):
+    from alchemy.transactions.rates import RatesCache
+
+    rates_cache = RatesCache(database)
+    _register_reader("sync_head", database, "get_sync_head")
+    _register_reader("winners", database, "get_winners")
+    _register_reader("latest-winners", database, "get_highest_winners")
+    _register_reader("find_winner", database, "find_winner")
+    _register_reader("balances", database, "get_balances")
+    _register_reader("rates", database, "get_rates")
+    _register_reader("top_holders", database, "get_top_holders")
+    _register_reader("address_history", database, "get_address_history")
+    _register_reader("miner_stats", database, "get_miner_stats")
+    _register_reader("difficulties", database, "get_difficulties")
+    _register("metrics", metrics.snapshot)
+    _register("quote_conversion", rates_cache.quote)
+
+    # Held open on purpose (for up to CALL_MAX_SECONDS), so not timed
+    block_events = BlockEvents(database.get_sync_head(), asyncio.get_event_loop())
+    database.add_commit_listener(block_events.publish, block_events.wants_balances)
+    aiorpc.register("subscribe", block_events.wait)
+
+
+def _make_call(coro, timeout: float = 3):
+    loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    client = aiorpc.RPCClient("127.0.0.1", 6000)
+    client = aiorpc.RPCClient("127.0.0.1", 6000, timeout=timeout)
     return loop.run_until_complete(coro(client))
 
 
@@ -49,13 +82,91 @@ def get_winners(height: int = None):
     return {"winners": winners}
 
 
+def find_winner(entry_hash: str, height: int = None):
+    """Where the OPR with the given full or short (16 hex characters) entry hash won, if it ever did"""
+
+    async def f(client):
+        return await client.call_once("find_winner", entry_hash, height)
+
+    return {"wins": _make_call(f)}
+
+
+class FactoidBalanceCache:
+    def __init__(self, height_ttl: float = 5.0):
+        """
+        Caches FCT balances from factomd per address, invalidating everything when the directory block height changes.
+        Concurrent lookups for the same address share a single in-flight factomd request.
+
+        :param height_ttl: Seconds to trust the last observed directory block height before asking factomd again
+        """
+        self.height_ttl = height_ttl
+        self._lock = threading.Lock()
+        self._height = None
+        self._height_checked_at = 0.0
+        self._refreshing = False
+        self._balances: Dict[str, int] = {}
+        self._in_flight: Dict[str, Future] = {}
+
+    def _refresh_height(self, factomd: "factom.Factomd") -> int:
+        with self._lock:
+            is_fresh = time.monotonic() - self._height_checked_at < self.height_ttl
+            if self._height is not None and (is_fresh or self._refreshing):
+                # While one caller asks factomd, the others carry on with the last height it gave
+                return self._height
+            self._refreshing = True
+        # Asked without holding the lock, so a slow or hung factomd doesn't hold up lookups that are cached
+        try:
+            height = factomd.heights()["directoryblockheight"]
+        finally:
+            with self._lock:
+                self._refreshing = False
+        with self._lock:
+            if height != self._height:
+                self._balances.clear()
+                self._height = height
+            self._height_checked_at = time.monotonic()
+            return self._height
+
+    def get(self, address: str, factomd: "factom.Factomd") -> int:
+        height = self._refresh_height(factomd)
+        with self._lock:
+            if address in self._balances:
+                return self._balances[address]
+            future = self._in_flight.get(address)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._in_flight[address] = future
+        if not is_owner:
+            return future.result()
+
+        try:
+            balance = factomd.factoid_balance(address).get("balance")
+        except Exception as e:
+            with self._lock:
+                del self._in_flight[address]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[address]
+            if height == self._height:
+                self._balances[address] = balance  # Only keep it if no new block arrived while we were waiting
+        future.set_result(balance)
+        return balance
+
+
+_fct_balance_cache = FactoidBalanceCache()
+
+
 def get_balances(address: str):
     async def f(client):
         return await client.call_once("balances", address)
 
+    import factom
+
     factomd = factom.Factomd()
     try:
-        fct_balance = factomd.factoid_balance(address).get("balance")
+        fct_balance = _fct_balance_cache.get(address, factomd)
     except factom.exceptions.InvalidParams:
         return {"error": "Invalid Address"}
 
@@ -73,7 +184,83 @@ def get_rates(height: int):
     return {"rates": _make_call(f)}
 
 
+def get_top_holders(asset: str, n: int = 10, offset: int = 0):
+    async def f(client):
+        return await client.call_once("top_holders", asset, n, offset)
+
+    return {"holders": _make_call(f)}
+
+
+def get_address_history(address: str, limit: int = 50, cursor: str = None):
+    async def f(client):
+        return await client.call_once("address_history", address, limit, cursor)
+
+    return _make_call(f)
+
+
+def get_miner_stats(kind: str, key: str = None, blocks: int = None):
+    """Totals by coinbase address or miner id (kind "coinbase" or "miner_id"), over the last `blocks` or all time"""
+    if blocks is not None and not 1 <= blocks <= consts.MAX_QUERY_BLOCKS:
+        raise ValueError(f"blocks must be between 1 and {consts.MAX_QUERY_BLOCKS}")
+
+    async def f(client):
+        return await client.call_once("miner_stats", kind, key, blocks)
+
+    return {"miners": _make_call(f)}
+
+
+def get_difficulties(start: int, end: int = None):
+    """Submission counts and verified top 50 difficulties of the blocks from start to end, inclusive"""
+    if end is not None and consts.MAX_QUERY_BLOCKS <= end - start:
+        raise ValueError(f"At most {consts.MAX_QUERY_BLOCKS} blocks can be queried at once")
+
+    async def f(client):
+        return await client.call_once("difficulties", start, end)
+
+    return {"blocks": _make_call(f)}
+
+
+def subscribe(
+    after_height: int, addresses: List[str] = None, rates: bool = False, timeout: float = LONG_POLL_MAX_SECONDS
+):
+    """
+    Long polls for the blocks committed after the given height, see BlockEvents.wait. Returns as soon as there is one,
+    or after timeout seconds (at most LONG_POLL_MAX_SECONDS) without any.
+    """
+
+    deadline = time.monotonic() + min(timeout, LONG_POLL_MAX_SECONDS)
+
+    async def f(client):
+        # The node answers each call within CALL_MAX_SECONDS, so only this client waits longer than aiorpc's default
+        while True:
+            remaining = max(0.0, deadline - time.monotonic())
+            result = await client.call_once("subscribe", after_height, addresses, rates, remaining)
+            if len(result["events"]) != 0 or not result["complete"] or deadline <= time.monotonic():
+                return result
+
+    return _make_call(f, timeout=CALL_MAX_SECONDS + 3)
+
+
+def quote_conversion(from_ticker: str, to_ticker: str, amount: int, height: int = None):
+    async def f(client):
+        return await client.call_once("quote_conversion", from_ticker, to_ticker, amount, height)
+
+    return {"quote": _make_call(f)}
+
+
+def get_metrics():
+    async def f(client):
+        return await client.call_once("metrics")
+
+    return _make_call(f)
+
+
 def graph_prices(tickers: List[str], is_by_height: bool = False, show: bool = False):
+    import pandas as pd
+    import plotly.graph_objects as go
+    import plotly.subplots
+    import alchemy.csv_exporting
+
     df = pd.read_csv(alchemy.csv_exporting.prices_filename)
     fig = plotly.subplots.make_subplots(rows=len(tickers), cols=1, subplot_titles=tickers)
     for i, ticker in enumerate(tickers):
@@ -91,6 +278,10 @@ def graph_prices(tickers: List[str], is_by_height: bool = False, show: bool = Fa
 
 
 def graph_difficulties(is_by_height: bool = False, show: bool = False):
+    import pandas as pd
+    import plotly.graph_objects as go
+    import alchemy.csv_exporting
+
     df = pd.read_csv(alchemy.csv_exporting.difficulties_filename)
     fig = go.Figure()
     fig.add_trace(
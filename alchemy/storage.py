@@ -0,0 +1,271 @@
+import bisect
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+# Storage engines implement the subset of the plyvel.DB interface that AlchemyDB uses:
+#   get(key), put(key, value), delete(key), write_batch(transaction=True), close(),
+#   iterator(prefix=None, start=None, stop=None, reverse=False, include_value=True) and
+#   snapshot(), returning an object with get(key), iterator(...) and release().
+# Keys are ordered bytewise in all engines, and start is inclusive while stop is exclusive, like level-db.
+
+ENGINES = ("leveldb", "sqlite", "memory")
+
+Op = Tuple[bytes, Union[None, bytes]]  # A put, or a delete if the value is None
+
+
+def _prefix_stop(prefix: bytes) -> Union[None, bytes]:
+    """Returns the smallest key greater than every key starting with prefix, or None if there is none"""
+    stripped = prefix.rstrip(b"\xff")
+    if len(stripped) == 0:
+        return None
+    return stripped[:-1] + bytes([stripped[-1] + 1])
+
+
+def _bounds(prefix: bytes, start: bytes, stop: bytes) -> Tuple[Union[None, bytes], Union[None, bytes]]:
+    if prefix is not None:
+        return prefix, _prefix_stop(prefix)
+    return start, stop
+
+
+class WriteBatch:
+    def __init__(self, apply):
+        """Collects puts and deletes, handing them to apply() at once if the with-block exits without an error"""
+        self._apply = apply
+        self._ops: List[Op] = []
+
+    def put(self, key: bytes, value: bytes):
+        self._ops.append((key, value))
+
+    def delete(self, key: bytes):
+        self._ops.append((key, None))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self._apply(self._ops)
+
+
+class LevelDBEngine:
+    def __init__(self, path: str, **kwargs):
+        """The default engine: plyvel's own methods are bound directly, so this adds no overhead per call"""
+        import plyvel
+
+        self._db = plyvel.DB(path, **kwargs)
+        self.get = self._db.get
+        self.put = self._db.put
+        self.delete = self._db.delete
+        self.write_batch = self._db.write_batch
+        self.iterator = self._db.iterator
+        self.snapshot = self._db.snapshot
+        self.close = self._db.close
+
+
+class _SortedMap:
+    def __init__(self, values: Dict[bytes, bytes] = None, keys: List[bytes] = None):
+        self.values = values if values is not None else {}
+        self.keys = keys if keys is not None else []
+
+    def get(self, key: bytes, default=None) -> Union[None, bytes]:
+        return self.values.get(key, default)
+
+    def iterator(
+        self,
+        prefix: bytes = None,
+        start: bytes = None,
+        stop: bytes = None,
+        reverse: bool = False,
+        include_value: bool = True,
+    ) -> Iterator[Any]:
+        start, stop = _bounds(prefix, start, stop)
+        i = 0 if start is None else bisect.bisect_left(self.keys, start)
+        j = len(self.keys) if stop is None else bisect.bisect_left(self.keys, stop)
+        keys = self.keys[i:j]
+        if reverse:
+            keys.reverse()
+        if not include_value:
+            return iter(keys)
+        # Values are looked up right away, as of the same moment as the keys
+        return iter([(key, self.values[key]) for key in keys])
+
+
+class MemoryEngine(_SortedMap):
+    def __init__(self):
+        """
+        Keeps everything in a dict plus a sorted list of its keys. Nothing is persisted, which makes it useful for
+        tests and replays. Inserting a new key is O(n) and snapshots copy the whole map, so both slow down on large
+        data sets.
+        """
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def put(self, key: bytes, value: bytes):
+        self._apply([(key, value)])
+
+    def delete(self, key: bytes):
+        self._apply([(key, None)])
+
+    def write_batch(self, transaction: bool = True) -> WriteBatch:
+        return WriteBatch(self._apply)
+
+    def iterator(self, **kwargs) -> Iterator[Any]:
+        with self._lock:
+            return super().iterator(**kwargs)
+
+    def _apply(self, ops: List[Op]):
+        with self._lock:
+            for key, value in ops:
+                if value is None:
+                    if self.values.pop(key, None) is not None:
+                        del self.keys[bisect.bisect_left(self.keys, key)]
+                else:
+                    if key not in self.values:
+                        bisect.insort(self.keys, key)
+                    self.values[key] = value
+
+    def snapshot(self) -> "MemorySnapshot":
+        with self._lock:
+            return MemorySnapshot(dict(self.values), list(self.keys))
+
+    def close(self):
+        pass
+
+
+class MemorySnapshot(_SortedMap):
+    def release(self):
+        pass
+
+
+class SQLiteEngine:
+    def __init__(self, path: str):
+        """
+        A single key/value table in SQLite, in WAL mode so that snapshots (read transactions on their own
+        connections) don't block the writer. BLOB keys compare bytewise, matching level-db's ordering.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS kv (key BLOB PRIMARY KEY, value BLOB NOT NULL) WITHOUT ROWID")
+        self._conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+
+    def get(self, key: bytes, default=None) -> Union[None, bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def put(self, key: bytes, value: bytes):
+        self._apply([(key, value)])
+
+    def delete(self, key: bytes):
+        self._apply([(key, None)])
+
+    def write_batch(self, transaction: bool = True) -> WriteBatch:
+        return WriteBatch(self._apply)
+
+    def _apply(self, ops: List[Op]):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for key, value in ops:
+                    if value is None:
+                        self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+                    else:
+                        self._conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, value))
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def iterator(self, **kwargs) -> Iterator[Any]:
+        return _select(self._conn, self._lock, **kwargs)
+
+    def snapshot(self) -> "SQLiteSnapshot":
+        return SQLiteSnapshot(self._connect())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SQLiteSnapshot:
+    def __init__(self, conn: sqlite3.Connection):
+        """Holds a read transaction open, which in WAL mode keeps seeing the database as it was when it started"""
+        self._conn = conn
+        self._lock = threading.Lock()
+        self._conn.execute("BEGIN")
+        self._conn.execute("SELECT 1 FROM kv LIMIT 1").fetchall()
+
+    def get(self, key: bytes, default=None) -> Union[None, bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def iterator(self, **kwargs) -> Iterator[Any]:
+        return _select(self._conn, self._lock, **kwargs)
+
+    def release(self):
+        with self._lock:
+            self._conn.execute("ROLLBACK")
+            self._conn.close()
+
+    close = release
+
+
+def _select(
+    conn: sqlite3.Connection,
+    lock: threading.Lock,
+    prefix: bytes = None,
+    start: bytes = None,
+    stop: bytes = None,
+    reverse: bool = False,
+    include_value: bool = True,
+    batch_size: int = 256,
+) -> Iterator[Any]:
+    # Rows are fetched lazily in batches, since callers like get_top_holders usually stop after a few
+    start, stop = _bounds(prefix, start, stop)
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("key >= ?")
+        params.append(start)
+    if stop is not None:
+        conditions.append("key < ?")
+        params.append(stop)
+    where = f"WHERE {' AND '.join(conditions)}" if len(conditions) != 0 else ""
+    columns = "key, value" if include_value else "key"
+    order = "DESC" if reverse else "ASC"
+    with lock:
+        cursor = conn.execute(f"SELECT {columns} FROM kv {where} ORDER BY key {order}", params)
+    while True:
+        with lock:
+            rows = cursor.fetchmany(batch_size)
+        if len(rows) == 0:
+            return
+        for row in rows:
+            yield row if include_value else row[0]
+
+
+def open_engine(storage: str, path: str, **kwargs):
+    """
+    Opens one of ENGINES. path is a directory for leveldb, a file for sqlite and ignored for memory.
+    kwargs are passed to plyvel.DB for leveldb.
+    """
+    if storage == "leveldb":
+        if not os.path.exists(path):
+            os.makedirs(path)
+        return LevelDBEngine(path, **kwargs)
+    if storage == "sqlite":
+        directory = os.path.dirname(path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        return SQLiteEngine(path)
+    if storage == "memory":
+        return MemoryEngine()
+    raise ValueError(f"Unknown storage engine {storage}, expected one of {ENGINES}")
@@ -0,0 +1,98 @@
+import asyncio
+import collections
+import time
+from typing import Any, Dict, List, Sequence
+
+# Longest a subscriber may wait for the next block
+LONG_POLL_MAX_SECONDS = 30
+# Longest the node holds a single subscribe call, within aiorpc's server timeout (3s, the default for every method).
+# Subscribers call again until their own timeout passes, see alchemy.rpc.subscribe.
+CALL_MAX_SECONDS = 2
+
+
+class BlockEvents:
+    def __init__(self, sync_head: int, loop: asyncio.AbstractEventLoop, size: int = 1000):
+        """
+        What changed in each of the last `size` blocks committed (see AlchemyDB.add_commit_listener), for clients that
+        long poll the node for new blocks instead of polling get_sync_head and querying everything again.
+        Blocks are published from the executor thread and handed over to the event loop, which owns all of the state.
+
+        :param sync_head: Height of the last block committed before the first one published
+        """
+        self.loop = loop
+        self.sync_head = sync_head
+        self.covered_from = sync_head  # Every block after this height is buffered
+        self._events: collections.deque = collections.deque(maxlen=size)
+        self._waiters: List[asyncio.Future] = []
+        self._last_called = float("-inf")
+
+    def publish(self, block: Dict[str, Any]):
+        """Thread safe, meant to be a commit listener of the database"""
+        self.loop.call_soon_threadsafe(self._append, block)
+
+    def wants_balances(self) -> bool:
+        """
+        Thread safe, meant to be the database's wants_balances for publish: balance changes are only worth working out
+        while someone is waiting, or called recently enough to be about to again
+        """
+        return len(self._waiters) != 0 or time.monotonic() - self._last_called < LONG_POLL_MAX_SECONDS
+
+    def _append(self, block: Dict[str, Any]):
+        if block["balances"] is None:
+            # Published without balance changes since nobody was subscribed, so blocks up to it can't be buffered
+            self._events.clear()
+            self.covered_from = block["height"]
+        elif block["height"] != self.sync_head + 1:
+            # Not the next block (the database was written without publishing), what's buffered can't be trusted
+            self._events.clear()
+            self.covered_from = block["height"] - 1
+        elif len(self._events) == self._events.maxlen:
+            self.covered_from = self._events[0]["height"]
+        if block["balances"] is not None:
+            self._events.append(block)
+        self.sync_head = block["height"]
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters = []
+
+    async def wait(
+        self,
+        after_height: int,
+        addresses: Sequence[str] = None,
+        rates: bool = False,
+        timeout: float = LONG_POLL_MAX_SECONDS,
+    ) -> Dict[str, Any]:
+        """
+        Returns the blocks committed after the given height, waiting up to timeout seconds (at most CALL_MAX_SECONDS)
+        for the next one if there are none yet. Every block has its height, plus its rates and the balance changes of
+        the given addresses if asked for. If "complete" is false, some blocks are no longer (or were never) buffered:
+        query the current state the usual way and carry on from the returned sync head.
+        """
+        self._last_called = time.monotonic()
+        if after_height == self.sync_head and 0 < timeout:
+            waiter = self.loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, min(timeout, CALL_MAX_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                self._last_called = time.monotonic()
+
+        complete = self.covered_from <= after_height <= self.sync_head
+        events = []
+        if complete:
+            addresses = set(addresses or ())
+            for block in self._events:
+                if block["height"] <= after_height:
+                    continue
+                event = {"height": block["height"]}
+                if rates:
+                    event["rates"] = block["rates"]
+                if len(addresses) != 0:
+                    event["balances"] = {a: b for a, b in block["balances"].items() if a in addresses}
+                events.append(event)
+        return {"sync_head": self.sync_head, "complete": complete, "events": events}
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import random
+from collections import defaultdict
+from dataclasses import dataclass
+from factom_keys.fct import FactoidPrivateKey
+from typing import Any, Dict, List, Tuple
+
+import alchemy.consts as consts
+from alchemy.factomd_standin import entry_hash
+from alchemy.transactions.models import Transaction, TransactionEntry
+from alchemy.transactions.rates import ConversionRates
+
+# Assets that transactions move around. PNT has no price to convert at, and its balances are keyed differently.
+TRADED_ASSETS = [asset for asset in consts.ALL_ASSETS if asset != consts.PNT]
+
+
+@dataclass
+class SyntheticChainConfig:
+    blocks: int = 100
+    start_height: int = consts.START_HEIGHT
+    start_timestamp: int = 1565000000
+    oprs_per_block: int = 50
+    dishonest_rate: float = 0.05
+    transactions_per_block: int = 10
+    conversion_rate: float = 0.5
+    burns_per_block: int = 2
+    accounts: int = 100
+    miners: int = 20
+    lxr_map_size_bits: int = 20
+    is_testnet: bool = False
+    seed: int = 0
+
+
+def make_keys(n: int, rng: random.Random) -> List[FactoidPrivateKey]:
+    return [FactoidPrivateKey(seed_bytes=rng.getrandbits(256).to_bytes(32, "big")) for _ in range(n)]
+
+
+def burn_transaction(key: FactoidPrivateKey, amount: int, is_testnet: bool, rng: random.Random) -> Dict[str, Any]:
+    """An FCT --> pFCT burn, shaped like a transaction in factomd's fblock-by-height response"""
+    burn_address = consts.BurnAddresses.TESTNET.value if is_testnet else consts.BurnAddresses.MAINNET.value
+    address = key.get_factoid_address()
+    return {
+        "txid": rng.getrandbits(256).to_bytes(32, "big").hex(),
+        "inputs": [{"amount": amount, "address": address.rcd_hash.hex(), "useraddress": address.to_string()}],
+        "outputs": [],
+        "outecs": [{"amount": 0, "address": "00" * 32, "useraddress": burn_address}],
+    }
+
+
+def coinbase_transaction(rng: random.Random) -> Dict[str, Any]:
+    return {"txid": rng.getrandbits(256).to_bytes(32, "big").hex(), "inputs": [], "outputs": [], "outecs": []}
+
+
+def walk_prices(prices: Dict[str, float], rng: random.Random, volatility: float = 0.01) -> Dict[str, float]:
+    return {asset: price * (1 + rng.uniform(-volatility, volatility)) for asset, price in prices.items()}
+
+
+def opr_content(height: int, coinbase: str, miner_id: str, previous_winners: List[str], prices: Dict[str, float]):
+    record = {
+        "coinbase": coinbase,
+        "dbht": height,
+        "winners": previous_winners,
+        "minerid": miner_id,
+        "assets": {consts.PNT: 0, **{asset: round(price, 8) for asset, price in prices.items()}},
+    }
+    return json.dumps(record, separators=(",", ":")).encode()
+
+
+class Ledger:
+    def __init__(self, keys: List[FactoidPrivateKey]):
+        """
+        Tracks the pegged balances of the generated accounts exactly like the node computes them, so generated
+        transactions never overdraw (which the node treats as an error, not an invalid entry).
+        """
+        self.keys = {key.get_factoid_address().rcd_hash: key for key in keys}
+        self.balances: Dict[bytes, Dict[str, float]] = defaultdict(dict)
+
+    def credit(self, address: bytes, ticker: str, amount: int):
+        self.balances[address][ticker] = self.balances[address].get(ticker, 0) + amount
+
+    def apply(self, deltas: Dict[bytes, Dict[str, int]]):
+        for address, asset_deltas in deltas.items():
+            for asset, delta in asset_deltas.items():
+                self.credit(address, f"p{asset}", delta)
+
+    def random_transaction_entry(
+        self, rates: ConversionRates, conversion_rate: float, timestamp: str, rng: random.Random
+    ) -> Tuple[List[bytes], bytes]:
+        """
+        Returns a signed transfer or conversion spending up to half of a random funded balance, and applies it to the
+        ledger. Returns None if no account has funds.
+        """
+        funded = [
+            (address, ticker)
+            for address, balances in self.balances.items()
+            for ticker, balance in balances.items()
+            if address in self.keys and ticker[1:] in TRADED_ASSETS and 2 <= balance
+        ]
+        if len(funded) == 0:
+            return None
+        address, ticker = rng.choice(funded)
+        asset = ticker[1:]
+        amount = rng.randint(1, int(self.balances[address][ticker]) // 2)
+        key = self.keys[address]
+
+        tx = Transaction()
+        tx.set_input(key.get_factoid_address(), asset, amount)
+        if rates is not None and rng.random() < conversion_rate:
+            output_asset = rng.choice([a for a in TRADED_ASSETS if a != asset and 0 < rates[a]])  # Avoid dividing by 0
+            tx.add_output(key.get_factoid_address(), output_asset)
+        else:
+            receiver = rng.choice(list(self.keys.values())).get_factoid_address()
+            tx.add_output(receiver, asset, amount)
+        self.apply(tx.get_deltas(rates if rates is not None else {}))
+
+        tx_entry = TransactionEntry(timestamp=timestamp)
+        tx_entry.add_transaction(tx)
+        tx_entry.add_signer(key)
+        return tx_entry.sign()
+
+
+def generate_chain(config: SyntheticChainConfig, progress=None) -> Dict[str, Any]:
+    """
+    Generates a PegNet chain in the fixture format of alchemy.factomd_standin. OPRs carry real LXR proof of work
+    under a map of config.lxr_map_size_bits, so the node has to be run with the same map size to sync it.
+    Every block is graded while generating, so OPRs reference the correct previous winners and conversions can
+    be tracked at the rates the node will execute them at.
+    :param progress: Optional callback, called with each height after it has been generated
+    """
+    import pylxr
+    import alchemy.grading.graders as graders
+    from alchemy.opr import OPR
+
+    rng = random.Random(config.seed)
+    lxr = pylxr.LXR(map_size_bits=config.lxr_map_size_bits)
+    grader = graders.StockGrader(lxr)
+    accounts = make_keys(config.accounts, rng)
+    miners = [key.get_factoid_address().to_string() for key in make_keys(config.miners, rng)]
+    ledger = Ledger(accounts)
+    prices = {asset: 10 ** rng.uniform(-2, 4) for asset in TRADED_ASSETS}
+    previous_winners = ["" for _ in range(10)]
+    rates = None
+
+    blocks = []
+    for i in range(config.blocks):
+        height = config.start_height + i
+        timestamp = config.start_timestamp + 600 * i
+        prices = walk_prices(prices, rng)
+
+        # 1) OPRs, each with a single nonce. Dishonest ones report a difficulty their hash doesn't have.
+        opr_entries, records = [], []
+        for j in range(config.oprs_per_block):
+            miner = rng.randrange(len(miners))
+            content = opr_content(height, miners[miner], f"miner-{miner}", previous_winners, walk_prices(prices, rng))
+            nonce = rng.getrandbits(64).to_bytes(8, "big")
+            difficulty = lxr.h(hashlib.sha256(content).digest() + nonce)[:8]
+            if rng.random() < config.dishonest_rate:
+                difficulty = rng.getrandbits(64).to_bytes(8, "big")
+            external_ids = [nonce, difficulty, b"\x01"]
+            entry_timestamp = timestamp + 60 * rng.randrange(10)
+            opr_entries.append(
+                {"extids": [x.hex() for x in external_ids], "content": content.hex(), "timestamp": entry_timestamp}
+            )
+            hash_bytes = bytes.fromhex(entry_hash(consts.OPR_CHAIN_ID, external_ids, content))
+            record = OPR.from_entry(hash_bytes, external_ids, content, entry_timestamp)
+            record.opr_hash = hashlib.sha256(content).digest()
+            records.append(record)
+        _, winners, _ = grader.grade_records(previous_winners, records)
+        if winners is not None:
+            previous_winners = [record.entry_hash[:8].hex() for record in winners[:10]]
+            rates = ConversionRates(winners[0].asset_estimates)
+
+        # 2) Burns
+        fblock_transactions = [coinbase_transaction(rng)]
+        for _ in range(config.burns_per_block):
+            key = rng.choice(accounts)
+            amount = rng.randint(1, 1000) * int(consts.FACTOSHIS_PER_FCT)
+            fblock_transactions.append(burn_transaction(key, amount, config.is_testnet, rng))
+            ledger.credit(key.get_factoid_address().rcd_hash, "pFCT", amount)
+
+        # 3) Transactions, executed after burns at the rates of the last graded block
+        transaction_entries = []
+        for j in range(config.transactions_per_block):
+            signed = ledger.random_transaction_entry(rates, config.conversion_rate, f"{timestamp}.{j}", rng)
+            if signed is None:
+                break
+            external_ids, content = signed
+            transaction_entries.append({"extids": [x.hex() for x in external_ids], "content": content.hex()})
+
+        entry_blocks = [{"chainid": consts.OPR_CHAIN_ID, "entries": opr_entries}]
+        if len(transaction_entries) != 0:
+            entry_blocks.append({"chainid": consts.TRANSACTIONS_CHAIN_ID, "entries": transaction_entries})
+        blocks.append(
+            {
+                "height": height,
+                "timestamp": timestamp,
+                "entry_blocks": entry_blocks,
+                "fblock": {"transactions": fblock_transactions},
+            }
+        )
+        if progress is not None:
+            progress(height)
+
+    return {"blocks": blocks, "balances": {}}
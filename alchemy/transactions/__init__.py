@@ -1 +1,2 @@
+from .models import Transaction, TransactionEntry
 from .transactions import *
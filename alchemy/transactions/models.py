@@ -6,9 +6,11 @@ import numpy as np
 from collections import defaultdict
 from dataclasses import dataclass
 from factom_keys.fct import FactoidAddress, FactoidPrivateKey
-from typing import Any, Dict, List, Set, Tuple
+from typing import Any, Dict, List, Set, Tuple, Union
 
 import alchemy.consts as consts
+import alchemy.decoding as decoding
+from alchemy.transactions.rates import ConversionRates
 
 
 @dataclass
@@ -63,11 +65,11 @@ class Transaction:
             return False
 
         input_address = self.input.get("address")
-        if not FactoidAddress.is_valid(input_address):
+        if not decoding.is_valid_address(input_address):
             return False  # Address must be a valid Factoid address string
 
         input_type = self.input.get("type")
-        if input_type not in consts.ALL_ASSETS:
+        if type(input_type) != str or input_type not in consts.ALL_ASSETS:
             return False  # Input type must be a valid pegged asset
 
         input_amount = self.input.get("amount")
@@ -81,12 +83,12 @@ class Transaction:
                 return False
 
             output_address = output.get("address")
-            if not FactoidAddress.is_valid(output_address):
+            if not decoding.is_valid_address(output_address):
                 return False
 
             output_type = output.get("type")
             if output_type is not None:
-                if output_type not in consts.ALL_ASSETS:
+                if type(output_type) != str or output_type not in consts.ALL_ASSETS:
                     return False  # Not a valid token type
                 if output_type != input_type and output_address != input_address:
                     return False  # Conversion Tx. Must output to the same address
@@ -100,11 +102,13 @@ class Transaction:
                     return False  # Output amount must be None or a positive integer
         return True
 
-    def get_deltas(self, rates: Dict[str, np.float64]):
+    def get_deltas(self, rates: Union[ConversionRates, Dict[str, np.float64]]):
         """
         Returns the deltas by address that result from executing this transaction. If any output is a conversion, it
-        will be executed against the given rates dictionary passed in.
+        will be executed against the given rates passed in.
         """
+        if not isinstance(rates, ConversionRates):
+            rates = ConversionRates(rates)
         deltas = defaultdict(lambda: defaultdict(int))
         input_address = FactoidAddress(address_string=self.input["address"]).rcd_hash
         input_amount_remaining = self.input.get("amount")
@@ -120,13 +124,13 @@ class Transaction:
             elif output.get("amount") is None:
                 # Conversion, no output amount
                 # Convert all remaining input to this output
-                output_delta = np.trunc(np.float64(input_amount_remaining) * rates[input_type] / rates[output_type])
+                output_delta = rates.convert(input_amount_remaining, input_type, output_type)
                 input_amount_remaining = 0
             else:
                 # Conversion, output amount given
                 # Try to get all outputs from the remaining inputs
                 output_delta = output.get("amount")
-                input_amount_remaining -= np.trunc(np.float64(output_delta) * rates[output_type] / rates[input_type])
+                input_amount_remaining -= rates.convert(output_delta, output_type, input_type)
 
             deltas[output_address][output.get("type", input_type)] += output_delta
 
@@ -179,10 +183,15 @@ class TransactionEntry:
         return external_ids, content
 
     @classmethod
-    def from_entry(cls, external_ids: List[bytes], content: bytes):
+    def from_entry(cls, external_ids: List[bytes], content: bytes, entry_hash: bytes = None, signature_cache=None):
         """
         Parses an entry (the external_ids and content) and tries to construct a TransactionEntry.
         If it does not have the proper structure or all required signatures to cover inputs, None will be returned.
+
+        :param entry_hash: The hash of the entry, required to use the signature_cache
+        :param signature_cache: An object with get(entry_hash) -> Optional[bool] and put(entry_hash, bool) that
+            remembers the outcome of signature verification. The entry hash commits to the external ids and content,
+            so the verdict for an entry can never change.
         """
         if len(external_ids) < 3 or len(external_ids) % 2 != 1:
             return None  # Number of external ids = 1 + 2 * N, where N is number of signatures >= 1
@@ -204,10 +213,10 @@ class TransactionEntry:
 
         # Check that the content field has a valid json with a "transactions" list
         try:
-            tx_payload = json.loads(content.decode())
+            tx_payload = decoding.loads(content)
         except ValueError:
             return None
-        if "transactions" not in tx_payload:
+        if type(tx_payload) != dict or "transactions" not in tx_payload:
             return None
         tx_list = tx_payload["transactions"]
         if type(tx_list) != list:
@@ -228,6 +237,19 @@ class TransactionEntry:
                 return None  # Missing this input signer, not a valid entry
 
         # Finally check all the signatures
+        if signature_cache is not None and entry_hash is not None:
+            is_valid = signature_cache.get(entry_hash)
+            if is_valid is None:
+                is_valid = TransactionEntry._verify_signatures(observed_signatures, timestamp, content)
+                signature_cache.put(entry_hash, is_valid)
+        else:
+            is_valid = TransactionEntry._verify_signatures(observed_signatures, timestamp, content)
+        return e if is_valid else None
+
+    @staticmethod
+    def _verify_signatures(
+        observed_signatures: List[Tuple[FactoidAddress, bytes]], timestamp: bytes, content: bytes
+    ) -> bool:
         chain_id = consts.TRANSACTIONS_CHAIN_ID.encode()
         for i, full_signature in enumerate(observed_signatures):
             key, signature = full_signature
@@ -239,15 +261,24 @@ class TransactionEntry:
             message.extend(content)
             message_hash = hashlib.sha512(message).digest()
             if not key.verify(signature, message_hash):
-                return None
+                return False
+        return True
 
-        return e
+    def is_conversion(self) -> bool:
+        """Returns True if any transaction in this entry converts between asset types"""
+        for tx in self._txs:
+            input_type = tx.input.get("type")
+            if any(output.get("type", input_type) != input_type for output in tx.outputs):
+                return True
+        return False
 
-    def get_deltas(self, rates: Dict[str, np.float64]):
+    def get_deltas(self, rates: Union[ConversionRates, Dict[str, np.float64]]):
         """
         Computes and returns the deltas that result from this transaction.
         If it's a conversion, rates must be passed in as well.
         """
+        if not isinstance(rates, ConversionRates):
+            rates = ConversionRates(rates)
         deltas: Dict[bytes, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
         for tx in self._txs:
             sub_deltas = tx.get_deltas(rates)
@@ -0,0 +1,97 @@
+import collections
+import numpy as np
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Union
+
+import alchemy.consts as consts
+
+if TYPE_CHECKING:
+    from alchemy.db import AlchemyDB
+
+
+class ConversionRates:
+    def __init__(self, rates: Dict[str, float]):
+        """
+        The rates of a single block, laid out as a vector indexed by asset (in ASSET_GRADING_ORDER where possible) so
+        conversions don't rebuild anything per transaction.
+
+        `matrix[i, j]` is the value of one unit of asset i in units of asset j, useful for display. Conversions do not
+        use it: `amount * rates[a] / rates[b]` and `amount * (rates[a] / rates[b])` round differently, and every
+        conversion has to be truncated exactly like the reference Transaction.get_deltas.
+        """
+        tickers = [t for t in consts.ASSET_GRADING_ORDER if t in rates]
+        tickers += sorted(t for t in rates if t not in consts.ASSET_GRADING_ORDER)
+        self.tickers = tickers
+        self.index = {t: i for i, t in enumerate(tickers)}
+        self.vector = np.array([rates[t] for t in tickers], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.matrix = self.vector[:, np.newaxis] / self.vector[np.newaxis, :]
+
+    def __getitem__(self, ticker: str) -> np.float64:
+        return self.vector[self.index[ticker]]
+
+    def convert(self, amount: Union[int, float], from_ticker: str, to_ticker: str) -> np.float64:
+        """Returns how many `to_ticker` tokens `amount` of `from_ticker` tokens convert to, truncated"""
+        return np.trunc(np.float64(amount) * self.vector[self.index[from_ticker]] / self.vector[self.index[to_ticker]])
+
+
+class RatesCache:
+    def __init__(self, database: "AlchemyDB", size: int = 256):
+        """
+        An LRU cache of ConversionRates by graded height, built from the rates stored in the database. Rates of blocks
+        undone by a rewind are dropped, their heights may be graded differently when executed again.
+        """
+        self.database = database
+        self.size = size
+        self._lock = threading.Lock()
+        self._cache: Dict[int, ConversionRates] = collections.OrderedDict()
+        database.add_rewind_listener(self.invalidate)
+
+    def get(self, height: int, database: "AlchemyDB" = None) -> Union[None, ConversionRates]:
+        """Returns the rates transactions at the given height are executed against (the last graded block's)"""
+        if database is None:
+            database = self.database.read_view()
+        rates_height = database.get_rates_height(height)
+        if rates_height == -1:
+            return None
+        with self._lock:
+            if rates_height in self._cache:
+                self._cache.move_to_end(rates_height)
+                return self._cache[rates_height]
+        conversion_rates = ConversionRates(database.get_rates(rates_height))
+        with self._lock:
+            self._cache[rates_height] = conversion_rates
+            while self.size < len(self._cache):
+                self._cache.popitem(last=False)
+        return conversion_rates
+
+    def invalidate(self, height: int = -1):
+        """Drops the rates of every height above the given one"""
+        with self._lock:
+            for rates_height in [h for h in self._cache if height < h]:
+                del self._cache[rates_height]
+
+    def quote(self, from_ticker: str, to_ticker: str, amount: int, height: int = None) -> Dict[str, Any]:
+        """
+        Quotes the conversion of `amount` tokens of one asset into another at the given height (default: sync head),
+        exactly as a conversion transaction without an output amount would execute.
+        """
+        database = self.database.read_view()
+        if height is None:
+            height = database.get_sync_head()
+        from_ticker, to_ticker = _strip_pegged_prefix(from_ticker), _strip_pegged_prefix(to_ticker)
+        rates = self.get(height, database)
+        if rates is None or from_ticker not in rates.index or to_ticker not in rates.index:
+            return None
+        with np.errstate(divide="ignore", invalid="ignore"):
+            output = rates.convert(amount, from_ticker, to_ticker)
+        if not np.isfinite(output):
+            return None
+        return {"height": height, "from": from_ticker, "to": to_ticker, "input": amount, "output": int(output)}
+
+
+def _strip_pegged_prefix(ticker: str) -> str:
+    """Accepts both "pXBT" and "XBT" style tickers"""
+    if ticker[:1] == "p" and ticker[1:] in consts.ALL_ASSETS:
+        return ticker[1:]
+    return ticker
@@ -1,21 +1,69 @@
 import numpy as np
 from factom import Factomd
-from typing import Dict
+from typing import Dict, Union
 
 import alchemy.consts as consts
+import alchemy.metrics as metrics
 from alchemy.db import AlchemyDB
+from alchemy.entry_blocks import EntryBlockIndex
 from alchemy.transactions.models import TransactionEntry
+from alchemy.transactions.rates import ConversionRates
 
 
-def process_block(height: int, rates: Dict[str, np.float64], factomd: Factomd, database: AlchemyDB):
-    entries = factomd.entries_at_height(consts.TRANSACTIONS_CHAIN_ID, height, include_entry_context=True)
+class SignatureCache:
+    def __init__(self, database: AlchemyDB, reverify: bool = False):
+        """
+        Remembers signature verification verdicts by entry hash in the database.
+        :param reverify: Ignore stored verdicts and verify every signature again (still recording the results)
+        """
+        self.database = database
+        self.reverify = reverify
+
+    def get(self, entry_hash: bytes):
+        return None if self.reverify else self.database.get_signature_verdict(entry_hash)
+
+    def put(self, entry_hash: bytes, is_valid: bool):
+        previous = self.database.get_signature_verdict(entry_hash) if self.reverify else None
+        if previous is not None and previous != is_valid:
+            print(f"Signature verdict changed for entry {entry_hash.hex()}: {previous} --> {is_valid}")
+        self.database.put_signature_verdict(entry_hash, is_valid)
+
+
+def process_block(
+    height: int,
+    rates: Union[ConversionRates, Dict[str, np.float64]],
+    factomd: Factomd,
+    database: AlchemyDB,
+    entry_index: EntryBlockIndex = None,
+    reverify_signatures: bool = False,
+):
+    """
+    Executes all valid transaction entries at the given height against the given rates.
+    :param entry_index: An index of the transactions chain, used to skip heights without entries
+    :param reverify_signatures: Verify all signatures again rather than trusting previously recorded verdicts
+    """
+    signature_cache = SignatureCache(database, reverify_signatures)
+    if not isinstance(rates, ConversionRates):
+        rates = ConversionRates(rates)
+    with metrics.timed("alchemy_stage_seconds", stage="factomd_fetch"):
+        if entry_index is not None:
+            entries = entry_index.entries_at_height(factomd, height, include_entry_context=True)
+        else:
+            entries = list(factomd.entries_at_height(consts.TRANSACTIONS_CHAIN_ID, height, include_entry_context=True))
+    metrics.observe("alchemy_block_records", len(entries), kind="transaction")
     for e in entries:
-        tx_entry = TransactionEntry.from_entry(external_ids=e["extids"], content=e["content"])
+        tx_entry = TransactionEntry.from_entry(
+            external_ids=e["extids"],
+            content=e["content"],
+            entry_hash=bytes.fromhex(e["entryhash"]),
+            signature_cache=signature_cache,
+        )
         if tx_entry is None:
             continue
 
         # Valid TransactionEntry, try to execute it
         deltas = tx_entry.get_deltas(rates)
+        source = "conversion" if tx_entry.is_conversion() else "transfer"
         for address, balance_deltas in deltas.items():
             working_balances = database.get_balances(address)
             for ticker, delta in balance_deltas.items():
@@ -29,3 +77,5 @@ def process_block(height: int, rates: Dict[str, np.float64], factomd: Factomd, d
                     raise ValueError("Not enough funds to cover transaction")
             # All deltas check out, update the database
             database.put_balances(address, working_balances)
+            history_deltas = {f"p{ticker}": delta for ticker, delta in balance_deltas.items()}
+            database.put_history(address, height, source, history_deltas, e["entryhash"])
@@ -1,14 +1,30 @@
 import bottle
+import functools
+import gzip
 import json
+import os
+import socketserver
+import wsgiref.simple_server
 from dataclasses import dataclass
 from factom_keys.ec import ECAddress
 from factom_keys.fct import FactoidAddress, FactoidPrivateKey
 from typing import Any, Dict, Union
 
 import alchemy.consts as consts
+import alchemy.metrics as metrics
 import alchemy.rpc as rpc
 import alchemy.transactions.models as tx_models
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESSED_SIZE = 1024
+# Graphs change with every block, caches may keep them but must revalidate with the ETag
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
 
 @bottle.hook("before_request")
 def strip_path():
@@ -16,11 +32,99 @@ def strip_path():
     bottle.request.environ["PATH_INFO"] = bottle.request.environ["PATH_INFO"].rstrip("/")
 
 
+def negotiate_encoding(accept_encoding: str) -> Union[None, str]:
+    """Returns the preferred content coding ("br" if brotli is installed, then "gzip") of an Accept-Encoding header"""
+    accepted = {}
+    for coding in accept_encoding.lower().split(","):
+        name, _, parameters = coding.partition(";")
+        quality = 1.0
+        parameters = parameters.strip()
+        if parameters.startswith("q="):
+            try:
+                quality = float(parameters[2:])
+            except ValueError:
+                quality = 0
+        accepted[name.strip()] = quality
+    for name in ("br", "gzip"):
+        if name == "br" and brotli is None:
+            continue
+        if 0 < accepted.get(name, accepted.get("*", 0)):
+            return name
+    return None
+
+
+def compress_responses(callback):
+    """
+    Bottle plugin compressing response bodies with the best coding the client accepts. Dicts are serialized to JSON
+    here rather than by bottle's JSON plugin, which would only get to them afterwards.
+    """
+
+    @functools.wraps(callback)
+    def wrapper(*args, **kwargs):
+        body = callback(*args, **kwargs)
+        if isinstance(body, dict):
+            body = json.dumps(body)
+            bottle.response.content_type = "application/json"
+        if not isinstance(body, (str, bytes)):
+            return body
+        if isinstance(body, str):
+            body = body.encode()
+        if len(body) < MIN_COMPRESSED_SIZE:
+            return body
+        bottle.response.add_header("Vary", "Accept-Encoding")
+        encoding = negotiate_encoding(bottle.request.headers.get("Accept-Encoding", ""))
+        if encoding == "br":
+            body = brotli.compress(body, quality=5)  # The default (11) is meant for static files
+        elif encoding == "gzip":
+            body = gzip.compress(body, compresslevel=6)
+        else:
+            return body
+        bottle.response.set_header("Content-Encoding", encoding)
+        return body
+
+    return wrapper
+
+
+def sync_head_etag() -> Union[None, str]:
+    """
+    Returns an ETag for resources that only change when a block is executed, or None if alchemy isn't running. Weak,
+    since the compressed and uncompressed bodies differ.
+    """
+    try:
+        return f'W/"{rpc.get_sync_head()["sync_head"]}"'
+    except ConnectionRefusedError:
+        return None
+
+
+def check_not_modified(etag: Union[None, str]):
+    """Answers 304 Not Modified, before anything is generated, if the client already has the given version"""
+    if etag is None:
+        return
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if_none_match = bottle.request.headers.get("If-None-Match", "")
+    # Weak comparison: W/"1" matches "1"
+    tags = [tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip() for tag in if_none_match.split(",")]
+    if etag[2:] in tags or "*" in tags:
+        raise bottle.HTTPResponse(status=304, headers=headers)
+    for name, value in headers.items():
+        bottle.response.set_header(name, value)
+
+
 @bottle.get("/health")
 def health_check():
     return {"data": "Healthy!"}
 
 
+@bottle.get("/metrics")
+def prometheus_metrics():
+    try:
+        metrics_snapshot = rpc.get_metrics()
+    except ConnectionRefusedError:
+        bottle.abort(503)
+    bottle.response.content_type = "text/plain; version=0.0.4; charset=utf-8"
+    return metrics.to_prometheus_text(metrics_snapshot)
+
+
 # -------------------------------------
 # Web app endpoints
 
@@ -34,15 +138,39 @@ def graph_assets():
     elif not set(tickers).issubset(consts.ALL_ASSETS):
         print(tickers)
         bottle.abort(400)
+    check_not_modified(sync_head_etag())
     return rpc.graph_prices(tickers, is_by_height)
 
 
 @bottle.get("/graphs/miners")
 def graph_difficulties():
     is_by_height = bottle.request.query.get("by-height", "false").lower() == "true"
+    check_not_modified(sync_head_etag())
     return rpc.graph_difficulties(is_by_height)
 
 
+# Cacheable counterparts of the get_rates and get_winners methods, since caches don't reuse responses to POST /v1.
+# A block's results can still change (rewind, a different grader), so they're revalidated like the graphs.
+
+
+@bottle.get("/rates/<height:int>")
+def rates_at_height(height: int):
+    check_not_modified(sync_head_etag())
+    try:
+        return rpc.get_rates(height)
+    except ConnectionRefusedError:
+        bottle.abort(503)
+
+
+@bottle.get("/winners/<height:int>")
+def winners_at_height(height: int):
+    check_not_modified(sync_head_etag())
+    try:
+        return rpc.get_winners(height)
+    except ConnectionRefusedError:
+        bottle.abort(503)
+
+
 @bottle.error(400)
 def error400(e):
     body = {"errors": {"detail": "Bad request"}}
@@ -67,6 +195,12 @@ def error500(e):
     return json.dumps(body, separators=(",", ":"))
 
 
+@bottle.error(503)
+def error503(e):
+    body = {"errors": {"detail": "Service unavailable"}}
+    return json.dumps(body, separators=(",", ":"))
+
+
 # -------------------------------------
 # API handlers
 
@@ -167,6 +301,118 @@ def get_latest_winners(params: Dict[str, Any]):
         raise AlchemyConnectionRefusedError()
 
 
+def find_winner(params: Dict[str, Any]):
+    entry_hash = params.get("entry_hash")
+    height = params.get("height")
+    try:
+        if type(entry_hash) != str or len(bytes.fromhex(entry_hash)) not in {8, 32}:
+            raise InvalidParamsError()
+    except ValueError:
+        raise InvalidParamsError()
+    if height is not None and (type(height) != int or height < 0):
+        raise InvalidParamsError()
+    try:
+        return rpc.find_winner(entry_hash, height)
+    except ConnectionRefusedError:
+        raise AlchemyConnectionRefusedError()
+
+
+def get_top_holders(params: Dict[str, Any]):
+    asset = params.get("asset")
+    n = params.get("n", 10)
+    offset = params.get("offset", 0)
+    if type(asset) != str or len(asset) == 0:
+        raise InvalidParamsError()
+    if type(n) != int or n < 1 or 1000 < n or type(offset) != int or offset < 0:
+        raise InvalidParamsError()
+    try:
+        return rpc.get_top_holders(asset, n, offset)
+    except ConnectionRefusedError:
+        raise AlchemyConnectionRefusedError()
+
+
+def get_address_history(params: Dict[str, Any]):
+    address = params.get("address")
+    limit = params.get("limit", 50)
+    cursor = params.get("cursor")
+    if not FactoidAddress.is_valid(address):
+        raise InvalidParamsError()
+    if type(limit) != int or limit < 1 or 1000 < limit:
+        raise InvalidParamsError()
+    if cursor is not None:
+        try:
+            if type(cursor) != str or len(bytes.fromhex(cursor)) != 6:
+                raise InvalidParamsError()
+        except ValueError:
+            raise InvalidParamsError()
+    try:
+        return rpc.get_address_history(address, limit, cursor)
+    except ConnectionRefusedError:
+        raise AlchemyConnectionRefusedError()
+
+
+def get_miner_stats(params: Dict[str, Any]):
+    kind = params.get("kind", "coinbase")
+    key = params.get("key")
+    blocks = params.get("blocks")
+    if kind not in {"coinbase", "miner_id"}:
+        raise InvalidParamsError()
+    if key is not None and (type(key) != str or (kind == "coinbase" and not FactoidAddress.is_valid(key))):
+        raise InvalidParamsError()
+    if blocks is not None and (type(blocks) != int or blocks < 1 or consts.MAX_QUERY_BLOCKS < blocks):
+        raise InvalidParamsError()
+    try:
+        return rpc.get_miner_stats(kind, key, blocks)
+    except ConnectionRefusedError:
+        raise AlchemyConnectionRefusedError()
+
+
+def get_difficulties(params: Dict[str, Any]):
+    start = params.get("start")
+    end = params.get("end", start)
+    if type(start) != int or type(end) != int or start < 0 or end < start or consts.MAX_QUERY_BLOCKS <= end - start:
+        raise InvalidParamsError()
+    try:
+        return rpc.get_difficulties(start, end)
+    except ConnectionRefusedError:
+        raise AlchemyConnectionRefusedError()
+
+
+def subscribe(params: Dict[str, Any]):
+    after_height = params.get("after_height")
+    addresses = params.get("addresses", [])
+    rates = params.get("rates", False)
+    timeout = params.get("timeout", rpc.LONG_POLL_MAX_SECONDS)
+    if type(after_height) != int or after_height < -1 or type(rates) != bool:
+        raise InvalidParamsError()
+    if type(addresses) != list or 100 < len(addresses) or not all(FactoidAddress.is_valid(a) for a in addresses):
+        raise InvalidParamsError()
+    if type(timeout) not in {int, float} or timeout < 0 or rpc.LONG_POLL_MAX_SECONDS < timeout:
+        raise InvalidParamsError()
+    try:
+        return rpc.subscribe(after_height, addresses, rates, timeout)
+    except ConnectionRefusedError:
+        raise AlchemyConnectionRefusedError()
+
+
+def quote_conversion(params: Dict[str, Any]):
+    from_ticker = params.get("from")
+    to_ticker = params.get("to")
+    amount = params.get("amount")
+    height = params.get("height")
+    for ticker in (from_ticker, to_ticker):
+        if type(ticker) != str or (ticker not in consts.ALL_ASSETS and ticker[1:] not in consts.ALL_ASSETS):
+            raise InvalidParamsError()
+    if type(amount) != int or amount < 0:
+        raise InvalidParamsError()
+    if height is not None and (type(height) != int or height < 0):
+        raise InvalidParamsError()
+    try:
+        return rpc.quote_conversion(from_ticker, to_ticker, amount, height)
+    except ConnectionRefusedError:
+        raise AlchemyConnectionRefusedError()
+
+
 def send_transactions(params: Dict[str, Any]):
     transactions = params.get("transactions")
     ec_address = params.get("ec_address")
@@ -212,12 +458,20 @@ def send_transactions(params: Dict[str, Any]):
 
 
 app = bottle.default_app()
+app.install(compress_responses)
 method_map = {
     "get_balances": get_balances,
     "get_rates": get_rates,
     "get_sync_head": get_sync_head,
     "get_winners": get_winners,
     "get_latest_winners": get_latest_winners,
+    "find_winner": find_winner,
+    "get_top_holders": get_top_holders,
+    "get_address_history": get_address_history,
+    "get_miner_stats": get_miner_stats,
+    "get_difficulties": get_difficulties,
+    "subscribe": subscribe,
+    "quote_conversion": quote_conversion,
     "send_transactions": send_transactions,
 }
 
@@ -259,6 +513,27 @@ def parse_request(request_json: Dict[str, Any]) -> (Union[str, int, None], str,
     return request_id, method, params
 
 
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, wsgiref.simple_server.WSGIServer):
+    """bottle's default wsgiref server, but handling every request on its own thread"""
+
+    daemon_threads = True
+
+
+def serve(host: str = "localhost", port: int = 8000, server: str = "threading"):
+    """
+    Runs the API. Long polling subscribers hold a request open for up to LONG_POLL_MAX_SECONDS, so the default server
+    is threaded. Anything else is the name of a bottle server adapter, e.g. "gevent" or "wsgiref" (single threaded).
+    """
+    if server == "threading":
+        bottle.run(app, host=host, port=port, server="wsgiref", server_class=ThreadingWSGIServer)
+    else:
+        bottle.run(app, host=host, port=port, server=server)
+
+
 # Entry point ONLY when run locally. The docker setup uses gunicorn and this block will not be executed.
 if __name__ == "__main__":
-    bottle.run(host="localhost", port=8000)
+    serve(
+        os.getenv("ALCHEMY_API_HOST", "localhost"),
+        int(os.getenv("ALCHEMY_API_PORT", "8000")),
+        os.getenv("ALCHEMY_API_SERVER", "threading"),
+    )
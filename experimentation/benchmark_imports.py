@@ -0,0 +1,33 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = [
+    ["-c", "import alchemy.rpc"],
+    ["alchemy.py", "--help"],
+    ["alchemy.py", "get-sync-head", "--help"],
+    ["alchemy.py", "get-balances", "--help"],
+    ["-c", "import alchemy_api"],
+]
+
+
+def run(n_runs: int = 10):
+    """Prints the median wall time of starting python and importing what each command needs"""
+    for args in COMMANDS:
+        timings = []
+        for _ in range(n_runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *args], cwd=REPO_ROOT, stdout=subprocess.DEVNULL, check=True)
+            timings.append(time.perf_counter() - start)
+        print(f"{statistics.median(timings) * 1000:8.1f} ms  python {' '.join(args)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2:
+        run(int(sys.argv[1]))
+    else:
+        run()
@@ -0,0 +1,86 @@
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from alchemy.db import AlchemyDB
+from alchemy.storage import ENGINES
+
+TICKERS = ["PNT", "pFCT", "pUSD", "pXBT", "pEUR"]
+
+
+def replay(database: AlchemyDB, n_blocks: int, n_addresses: int, writes_per_block: int, rng: random.Random):
+    """Executes blocks the way alchemy.main does: a staged batch of balance updates and history records each"""
+    addresses = [rng.getrandbits(256).to_bytes(32, "big") for _ in range(n_addresses)]
+    for height in range(n_blocks):
+        database.begin_block(height)
+        for _ in range(writes_per_block):
+            address = rng.choice(addresses)
+            deltas = {rng.choice(TICKERS): rng.randint(1, 10 ** 10)}
+            database.update_balances(address, deltas)
+            database.put_history(address, height, "transfer", deltas, os.urandom(32))
+        database.put_sync_head(height)
+        database.commit_block()
+    return addresses
+
+
+def run(n_blocks: int = 2000, n_addresses: int = 5000, writes_per_block: int = 20, n_reads: int = 20000):
+    """
+    Compares the storage engines on alchemy's access pattern:
+    per-block batches of small json blobs, then point reads of balances and the range reads behind
+    get_top_holders and get_address_history, each through AlchemyDB and against the read snapshot.
+    The memory engine is a reference point rather than a contender: it keeps its keys in a sorted list, so every new
+    key is an O(n) insert and every snapshot a full copy, and its blocks/s drops as the data set grows.
+    """
+    print(f"{n_blocks} blocks x {writes_per_block} balance updates, {n_addresses} addresses, {n_reads} reads\n")
+    print(f"{'engine':>8}  {'blocks/s':>9}  {'point reads/s':>13}  {'top holders/s':>13}  {'history/s':>9}")
+    for storage in ENGINES:
+        home = tempfile.mkdtemp()
+        original_home = os.environ.get("HOME")
+        os.environ["HOME"] = home
+        try:
+            database = AlchemyDB(storage=storage, create_if_missing=True)
+            rng = random.Random(42)
+
+            start = time.perf_counter()
+            addresses = replay(database, n_blocks, n_addresses, writes_per_block, rng)
+            blocks_per_second = n_blocks / (time.perf_counter() - start)
+
+            view = database.read_view()
+            start = time.perf_counter()
+            for _ in range(n_reads):
+                view.get_balances(rng.choice(addresses))
+            reads_per_second = n_reads / (time.perf_counter() - start)
+
+            n_range_reads = n_reads // 10
+            start = time.perf_counter()
+            for _ in range(n_range_reads):
+                view.get_top_holders(rng.choice(TICKERS), 10)
+            top_holders_per_second = n_range_reads / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in range(n_range_reads):
+                view.get_address_history(rng.choice(addresses), 10)
+            history_per_second = n_range_reads / (time.perf_counter() - start)
+
+            print(
+                f"{storage:>8}  {blocks_per_second:9.0f}  {reads_per_second:13.0f}  "
+                f"{top_holders_per_second:13.0f}  {history_per_second:9.0f}"
+            )
+            view = None
+            database.close()
+        finally:
+            if original_home is None:
+                os.environ.pop("HOME")
+            else:
+                os.environ["HOME"] = original_home
+            shutil.rmtree(home)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2:
+        run(int(sys.argv[1]))
+    else:
+        run()
@@ -4,15 +4,15 @@ import sys
 from factom import Factomd
 
 import alchemy.consts as consts
-import alchemy.grading.graders as graders
+from alchemy.grading import GradingPipeline
 from alchemy.opr import OPR
 
 
 def run(n_blocks: int = None):
     factomd = Factomd()
     lxr = pylxr.LXR()
-    stock_grader = graders.StockGrader(lxr)
-    custom_grader = graders.StraightDifficultyGrader(lxr)
+    # Honesty is verified once per block, then both graders grade the same top 50
+    pipeline = GradingPipeline(lxr, "stock", shadow_graders=["straight_difficulty"])
 
     start_height = consts.START_HEIGHT
     prev_winners = ["" for _ in range(10)]
@@ -32,8 +32,8 @@ def run(n_blocks: int = None):
             current_block_records.append(record)
 
         # Run the two graders
-        stock_prices, stock_winners, stock_top50 = stock_grader.grade_records(prev_winners, current_block_records)
-        custom_prices, custom_winners, custom_top50 = custom_grader.grade_records(prev_winners, current_block_records)
+        stock_prices, stock_winners, stock_top50, _ = pipeline.grade_records(prev_winners, current_block_records)
+        custom_prices, custom_winners, custom_top50 = pipeline.shadow_results.get("straight_difficulty", (None,) * 3)
 
         if stock_winners is not None:
             print(f"\nBlock {height}")
@@ -0,0 +1,40 @@
+import sys
+import time
+
+import alchemy.grading.graders as graders
+from alchemy.archive import OPRArchive
+
+
+def run(grader_name: str = "straight_difficulty", start: int = 0, end: int = None):
+    """
+    Grades archived blocks (see `alchemy.py run --archive-oprs`) with the stock grader and the given one, and counts
+    how many winners they share. No factomd or LXR hashing is needed, graders only see the verified top 50.
+    """
+    stock_grader = graders.make_grader("stock", None)
+    custom_grader = graders.make_grader(grader_name, None)
+
+    archived = OPRArchive().load(start, end)
+    print(f"Loaded {len(archived)} records")
+
+    n_blocks, n_shared = 0, 0
+    started = time.perf_counter()
+    for height, block in archived.blocks():
+        _, stock_winners, _ = stock_grader.grade_eligible_records(block.to_records())
+        _, custom_winners, _ = custom_grader.grade_eligible_records(block.to_records())
+        if stock_winners is None or custom_winners is None:
+            continue
+        shared = set(r.entry_hash for r in stock_winners[:10]).intersection(r.entry_hash for r in custom_winners[:10])
+        n_blocks += 1
+        n_shared += len(shared)
+    elapsed = time.perf_counter() - started
+
+    print(f"Graded {n_blocks} blocks in {elapsed:.1f}s ({n_blocks / max(elapsed, 1e-9):.0f} blocks/s)")
+    if n_blocks != 0:
+        print(f"{grader_name} shared {n_shared / n_blocks:.2f}/10 winners with stock on average")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2:
+        run(sys.argv[1])
+    else:
+        run()
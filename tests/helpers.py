@@ -0,0 +1,125 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+import unittest
+
+import factom.exceptions
+from factom.client import NULL_BLOCK
+
+from alchemy import consts
+from alchemy.db import AlchemyDB
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Opens a fresh AlchemyDB as self.db for each test, with HOME pointed at a temporary directory"""
+
+    storage = "memory"
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.original_home = os.environ.get("HOME")
+        os.environ["HOME"] = self.home
+        self.db = AlchemyDB(storage=self.storage, create_if_missing=True)
+
+    def tearDown(self):
+        self.db.close()
+        if self.original_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = self.original_home
+        shutil.rmtree(self.home)
+
+
+def make_factoid_block(height: int):
+    """A factoid block with a burn at even heights and a transaction that isn't a burn at every height"""
+    burn = {
+        "txid": f"{height:064x}",
+        "inputs": [{"address": f"{height:064x}", "amount": height}],
+        "outputs": [],
+        "outecs": [{"useraddress": consts.BurnAddresses.MAINNET.value}],
+    }
+    not_a_burn = {
+        "txid": "ff" * 32,
+        "inputs": [{"address": "ff" * 32, "amount": 1}],
+        "outputs": [],
+        "outecs": [{"useraddress": "EC2DKSYyRcNWf7RS963VFYgMExo1824HVeCfQ9PGPmNzwrcmgm2r"}],
+    }
+    return {"fblock": {"transactions": [not_a_burn, burn] if height % 2 == 0 else [not_a_burn]}}
+
+
+class FakeFactomd:
+    def __init__(
+        self,
+        height: int = 100,
+        entry_heights=(),
+        statuses=(),
+        missing_heights=(),
+        delay: float = 0,
+        jitter: float = 0,
+    ):
+        """
+        A factomd at the given height that records the name of every call in self.calls
+
+        entry_heights: heights with one entry each on the entry chain
+        statuses: the current_minute responses, returned in order
+        missing_heights: heights whose factoid block isn't found
+        delay: seconds each balance lookup takes
+        jitter: up to how many seconds each factoid block lookup takes
+        """
+        self.height = height
+        self.statuses = list(statuses)
+        self.missing_heights = set(missing_heights)
+        self.delay = delay
+        self.jitter = jitter
+        self.blocks = {}
+        self.head = NULL_BLOCK
+        self.extend_chain(entry_heights)
+        self.calls = []
+
+    def extend_chain(self, entry_heights):
+        """Adds an entry block with one entry at each of the given heights, which must be above the current head"""
+        for height in sorted(entry_heights):
+            keymr = f"{height:064x}"
+            self.blocks[keymr] = {
+                "header": {"dbheight": height, "prevkeymr": self.head},
+                "entrylist": [{"entryhash": f"{height:064x}", "timestamp": height}],
+            }
+            self.head = keymr
+
+    def heights(self):
+        self.calls.append("heights")
+        return {"directoryblockheight": self.height}
+
+    def current_minute(self):
+        self.calls.append("current_minute")
+        return self.statuses.pop(0)
+
+    def factoid_balance(self, fct_address=None):
+        self.calls.append("factoid_balance")
+        time.sleep(self.delay)
+        return {"balance": 1000 + self.height}
+
+    def factoid_block_by_height(self, height: int):
+        self.calls.append("factoid_block_by_height")
+        time.sleep(random.random() * self.jitter)
+        if height in self.missing_heights:
+            raise factom.exceptions.BlockNotFound(-32008, "Block not found", None)
+        return make_factoid_block(height)
+
+    def chain_head(self, chain_id):
+        self.calls.append("chain_head")
+        return {"chainhead": self.head}
+
+    def entry_block(self, keymr):
+        self.calls.append("entry_block")
+        return self.blocks[keymr]
+
+    def entries_in_entry_block(self, block, include_entry_context=False):
+        self.calls.append("entries_in_entry_block")
+        return [{"entryhash": e["entryhash"]} for e in block["entrylist"]]
+
+    def entries_at_height(self, chain_id, height, include_entry_context=False):
+        self.calls.append("entries_at_height")
+        return []
@@ -0,0 +1,161 @@
+import gzip
+import io
+import json
+import threading
+import unittest
+import urllib.request
+import wsgiref.simple_server
+from unittest import mock
+
+import alchemy_api
+import alchemy.rpc as rpc
+
+
+def request(method: str, path: str, body: bytes = b"", **headers):
+    """Calls the bottle app directly through WSGI and returns (status, headers with lowercase names, body)"""
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "8000",
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(body),
+        "CONTENT_LENGTH": str(len(body)),
+        "CONTENT_TYPE": "application/json",
+    }
+    for name, value in headers.items():
+        environ[f"HTTP_{name.upper()}"] = value
+    response = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        response["status"] = int(status.split()[0])
+        response["headers"] = {name.lower(): value for name, value in response_headers}
+
+    body = b"".join(alchemy_api.app(environ, start_response))
+    return response["status"], response["headers"], body
+
+
+class TestNegotiateEncoding(unittest.TestCase):
+    def test_negotiate_encoding(self):
+        self.assertEqual(alchemy_api.negotiate_encoding("gzip, deflate"), "gzip")
+        self.assertEqual(alchemy_api.negotiate_encoding("deflate;q=1, GZIP;q=0.5"), "gzip")
+        self.assertIsNone(alchemy_api.negotiate_encoding("gzip;q=0"))
+        self.assertIsNone(alchemy_api.negotiate_encoding(""))
+        self.assertIsNone(alchemy_api.negotiate_encoding("identity"))
+        with mock.patch.object(alchemy_api, "brotli", object()):
+            self.assertEqual(alchemy_api.negotiate_encoding("gzip, br"), "br")
+            self.assertEqual(alchemy_api.negotiate_encoding("*"), "br")
+            self.assertEqual(alchemy_api.negotiate_encoding("gzip, br;q=0"), "gzip")
+        with mock.patch.object(alchemy_api, "brotli", None):
+            self.assertEqual(alchemy_api.negotiate_encoding("br, *;q=0.1"), "gzip")
+
+
+class TestCaching(unittest.TestCase):
+    def test_graph_etag(self):
+        graph = "<html>" + "x" * 5000 + "</html>"
+        with mock.patch.object(rpc, "get_sync_head", return_value={"sync_head": 100}), mock.patch.object(
+            rpc, "graph_difficulties", return_value=graph
+        ) as graph_difficulties:
+            status, headers, body = request("GET", "/graphs/miners", Accept_Encoding="gzip")
+            self.assertEqual(status, 200)
+            self.assertEqual(headers["etag"], 'W/"100"')
+            self.assertEqual(headers["content-encoding"], "gzip")
+            self.assertEqual(gzip.decompress(body).decode(), graph)
+
+            status, headers, body = request("GET", "/graphs/miners", If_None_Match='"100"')
+            self.assertEqual((status, body), (304, b""))
+            self.assertEqual(headers["etag"], 'W/"100"')
+            self.assertEqual(graph_difficulties.call_count, 1)
+
+            status, _, body = request("GET", "/graphs/miners", If_None_Match='W/"99"')
+            self.assertEqual((status, body.decode()), (200, graph))
+
+    def test_graph_without_node(self):
+        with mock.patch.object(rpc, "get_sync_head", side_effect=ConnectionRefusedError), mock.patch.object(
+            rpc, "graph_difficulties", return_value="<html></html>"
+        ):
+            status, headers, body = request("GET", "/graphs/miners", If_None_Match="*")
+            self.assertEqual((status, body), (200, b"<html></html>"))
+            self.assertNotIn("etag", headers)
+
+    def test_json_rpc_is_not_cached(self):
+        call = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "get_rates", "params": {"height": 10}}).encode()
+        with mock.patch.object(rpc, "get_rates", return_value={"rates": {"PEG": 0.0}}):
+            status, headers, body = request("POST", "/v1", call)
+            self.assertEqual(status, 200)
+            self.assertNotIn("cache-control", headers)
+            self.assertEqual(json.loads(body)["result"], {"rates": {"PEG": 0.0}})
+
+    def test_rates_revalidate(self):
+        with mock.patch.object(rpc, "get_sync_head", return_value={"sync_head": 100}), mock.patch.object(
+            rpc, "get_rates", return_value={"rates": {"PEG": 0.0}}
+        ) as get_rates:
+            status, headers, body = request("GET", "/rates/10")
+            self.assertEqual((status, json.loads(body)), (200, {"rates": {"PEG": 0.0}}))
+            self.assertEqual(headers["etag"], 'W/"100"')
+            self.assertEqual(headers["cache-control"], alchemy_api.REVALIDATE_CACHE_CONTROL)
+            get_rates.assert_called_once_with(10)
+
+            status, _, body = request("GET", "/rates/10", If_None_Match='W/"100"')
+            self.assertEqual((status, body), (304, b""))
+            self.assertEqual(get_rates.call_count, 1)
+
+        with mock.patch.object(rpc, "get_sync_head", side_effect=ConnectionRefusedError), mock.patch.object(
+            rpc, "get_winners", side_effect=ConnectionRefusedError
+        ):
+            self.assertEqual(request("GET", "/winners/10")[0], 503)
+
+
+class QuietHandler(wsgiref.simple_server.WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.server = wsgiref.simple_server.make_server(
+            "127.0.0.1", 0, alchemy_api.app, alchemy_api.ThreadingWSGIServer, QuietHandler
+        )
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+
+    def call(self, method: str, params: dict, timeout: float):
+        call = json.dumps({"jsonrpc": "2.0", "id": 1, "method": method, "params": params}).encode()
+        url = f"http://127.0.0.1:{self.server.server_port}/v1"
+        request = urllib.request.Request(url, call, {"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())["result"]
+
+    def test_calls_are_not_serialized_behind_subscribe(self):
+        subscribed = threading.Event()
+        released = threading.Event()
+
+        def subscribe(*args):
+            subscribed.set()
+            released.wait(10)
+            return {"sync_head": 11, "complete": True, "events": [{"height": 11}]}
+
+        results = []
+        with mock.patch.object(rpc, "subscribe", side_effect=subscribe), mock.patch.object(
+            rpc, "get_sync_head", return_value={"sync_head": 10}
+        ):
+            subscriber = threading.Thread(
+                target=lambda: results.append(self.call("subscribe", {"after_height": 10}, 10))
+            )
+            subscriber.start()
+            self.assertTrue(subscribed.wait(5))
+            try:
+                # Both answered while the subscriber is still waiting for its block
+                self.assertEqual(self.call("get_sync_head", {}, 2), {"sync_head": 10})
+                self.assertEqual(self.call("get_sync_head", {}, 2), {"sync_head": 10})
+                self.assertEqual(results, [])
+            finally:
+                released.set()
+                subscriber.join()
+        self.assertEqual(results[0]["events"], [{"height": 11}])
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import alchemy.consts as consts
+from alchemy.archive import COLUMNS, OPRArchive
+from alchemy.opr import OPR
+
+COINBASES = [
+    "FA2jK2HcLnRdS94dEcU27rF3meoJfpUcZPSinpb7AwQvPRY6RL1Q",
+    "FA3EPZYqodgyEGXNMbiZKE5TS2x2J9wF8J9MvPZb52iGR78xMgCb",
+]
+
+
+def make_record(height: int, i: int, coinbase: str) -> OPR:
+    return OPR(
+        entry_hash=bytes([i]) * 32,
+        nonce=b"nonce",
+        self_reported_difficulty=(2 ** 64 - 1 - i).to_bytes(8, "big"),
+        coinbase_address=coinbase,
+        height=height,
+        asset_estimates={asset: 1 + j + i / 10 for j, asset in enumerate(consts.ASSET_GRADING_ORDER)},
+        prev_winners=["" for _ in range(10)],
+        miner_id="miner",
+        timestamp=1565000000,
+    )
+
+
+def make_block(height: int, n: int = 3):
+    return [make_record(height, i, COINBASES[i % 2]) for i in range(n)]
+
+
+class TestOPRArchive(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.archive = OPRArchive(path=self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_put_and_load(self):
+        for height in range(10, 15):
+            self.archive.put(height, make_block(height))
+        self.assertEqual(len(self.archive), 15)
+
+        archived = self.archive.load(11, 12)
+        self.assertEqual(len(archived), 6)
+        self.assertEqual(list(archived.heights), [11, 11, 11, 12, 12, 12])
+        self.assertEqual(archived.estimates.shape, (6, len(consts.ASSET_GRADING_ORDER)))
+        self.assertEqual(int(archived.difficulties[1]), 2 ** 64 - 2)
+        self.assertEqual(archived.coinbases, COINBASES)
+        self.assertEqual([archived.coinbases[i] for i in archived.coinbase_ids[:3]], COINBASES + COINBASES[:1])
+
+        self.assertEqual([height for height, _ in archived.blocks()], [11, 12])
+        self.assertEqual(len(self.archive.load(13)), 6)
+        self.assertEqual(len(self.archive.load(20)), 0)
+
+    def test_to_records(self):
+        block = make_block(10)
+        self.archive.put(10, block)
+        records = self.archive.load().to_records()
+        for original, record in zip(block, records):
+            self.assertEqual(record.entry_hash, original.entry_hash[:8])
+            self.assertEqual(record.self_reported_difficulty, original.self_reported_difficulty)
+            self.assertEqual(record.coinbase_address, original.coinbase_address)
+            self.assertEqual(record.height, 10)
+            self.assertEqual(record.asset_estimates, original.asset_estimates)
+
+    def test_rewrite_drops_higher_heights(self):
+        for height in range(10, 15):
+            self.archive.put(height, make_block(height))
+        self.archive.put(12, make_block(12, n=1))
+        self.assertEqual(list(self.archive.load().heights), [10, 10, 10, 11, 11, 11, 12])
+        self.archive.put(11, [])
+        self.assertEqual(list(self.archive.load().heights), [10, 10, 10])
+
+    def test_reopen_repairs_partial_append(self):
+        self.archive.put(10, make_block(10))
+        self.archive.put(11, make_block(11))
+        with open(os.path.join(self.directory, "heights"), "ab") as f:
+            f.write(COLUMNS["heights"][0].type(12).tobytes())  # As if a crash hit after the first column of a block
+
+        archive = OPRArchive(path=self.directory)
+        self.assertEqual(len(archive), 6)
+        self.assertEqual(archive.coinbases, COINBASES)
+        self.assertEqual(len(archive.load().estimates), 6)
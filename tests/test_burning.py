@@ -0,0 +1,52 @@
+import functools
+import threading
+import unittest
+
+from factom import Factomd
+
+from alchemy import burning
+from alchemy.factomd_standin import Chain, FactomdStandin, make_server
+from tests.helpers import FakeFactomd, make_factoid_block
+
+
+class TestBurning(unittest.TestCase):
+    def test_parse_factoid_block(self):
+        burns = burning.parse_factoid_block(make_factoid_block(10)["fblock"])
+        self.assertEqual(burns, [burning.Burn(address=bytes.fromhex(f"{10:064x}"), amount=10, tx_id=f"{10:064x}")])
+        self.assertEqual(burning.parse_factoid_block(make_factoid_block(10)["fblock"], is_testnet=True), [])
+
+    def test_scan_range_matches_sequential(self):
+        factory = functools.partial(FakeFactomd, missing_heights={13}, jitter=0.01)
+        scanned = list(burning.scan_range(1, 40, workers=4, window=8, factomd_factory=factory))
+        self.assertEqual([height for height, _ in scanned], list(range(1, 41)))
+        for height, burns in scanned:
+            if height == 13:
+                self.assertEqual(burns, [])
+            else:
+                self.assertEqual(burns, burning.process_block(height, FakeFactomd()))
+
+    def test_client_factory(self):
+        factomd = Factomd(host="http://factomd.example:8088", username="user", password="secret", certfile="ca.pem")
+        make = burning.client_factory(factomd)
+        clients = [make(), make()]
+        self.assertIsNot(clients[0].session, clients[1].session)
+        for client in clients:
+            self.assertIsNot(client.session, factomd.session)
+            self.assertEqual(client.host, "http://factomd.example:8088")
+            self.assertEqual(client.session.headers["Authorization"], factomd.session.headers["Authorization"])
+            self.assertEqual(client.session.verify, "ca.pem")
+
+    def test_scan_range_uses_the_given_factomd(self):
+        blocks = [
+            {"height": h, "timestamp": 1565000000 + h * 600, "fblock": make_factoid_block(h)["fblock"]}
+            for h in (10, 11, 12)
+        ]
+        server = make_server(FactomdStandin(Chain({"blocks": blocks})), port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        # Not the default localhost:8088 a stock Factomd() would scan
+        factomd = Factomd(host=f"http://127.0.0.1:{server.server_address[1]}")
+        scanned = list(burning.scan_range(10, 12, workers=2, factomd_factory=burning.client_factory(factomd)))
+        self.assertEqual(scanned, [(h, burning.process_block(h, FakeFactomd())) for h in (10, 11, 12)])
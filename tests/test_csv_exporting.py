@@ -0,0 +1,33 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import alchemy.csv_exporting as csv_exporting
+
+
+class TestTruncate(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "prices", "data.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_truncate(self):
+        for height in range(10, 15):
+            csv_exporting.write_prices({"XBT": height * 100}, height, 1570000000 + height * 600, self.filename)
+        with open(self.filename) as f:
+            lines = f.readlines()
+
+        csv_exporting.truncate(12, self.filename)
+        with open(self.filename) as f:
+            self.assertEqual(f.readlines(), lines[:4])
+
+        # Redone blocks are appended as usual, once
+        csv_exporting.write_prices({"XBT": 1300}, 13, 1570000000 + 13 * 600, self.filename)
+        with open(self.filename) as f:
+            self.assertEqual(f.readlines(), lines[:5])
+
+        csv_exporting.truncate(12, os.path.join(self.directory, "missing.csv"))
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "missing.csv")))
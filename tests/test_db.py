@@ -0,0 +1,318 @@
+from factom_keys.fct import FactoidAddress
+
+from alchemy.db import AlchemyDB
+from tests.helpers import DatabaseTestCase
+
+
+class TestAlchemyDB(DatabaseTestCase):
+    storage = "leveldb"
+    addresses = [
+        FactoidAddress(address_string="FA2jK2HcLnRdS94dEcU27rF3meoJfpUcZPSinpb7AwQvPRY6RL1Q").rcd_hash,
+        FactoidAddress(address_string="FA1zT4aFpEvcnPqPCigB3fvGu4Q4mTXY22iiuV69DqE1pNhdF2MC").rcd_hash,
+        bytes(32),
+    ]
+
+    def test_block_staging(self):
+        self.db.begin_block()
+        self.db.update_balances(self.addresses[0], {"pFCT": 5})
+        self.db.update_balances(self.addresses[0], {"pFCT": 5})
+        self.db.put_sync_head(10)
+        self.assertEqual(self.db.get_balances(self.addresses[0]), {"pFCT": 10})
+        self.assertEqual(self.db._db.get(b"Balances" + self.addresses[0]), None)
+        self.db.commit_block()
+        self.assertEqual(self.db.get_balances(self.addresses[0]), {"pFCT": 10})
+        self.assertEqual(self.db.get_sync_head(), 10)
+
+        self.db.begin_block()
+        self.db.update_balances(self.addresses[0], {"pFCT": 5})
+        self.db.abort_block()
+        self.assertEqual(self.db.get_balances(self.addresses[0]), {"pFCT": 10})
+
+    def test_read_view(self):
+        self.db.begin_block(10)
+        self.db.update_balances(self.addresses[0], {"pFCT": 5})
+        self.db.put_sync_head(10)
+        self.db.commit_block()
+
+        view = self.db.read_view()
+        self.assertIs(self.db.read_view(), view)
+        self.db.begin_block(11)
+        self.db.update_balances(self.addresses[0], {"pFCT": 5})
+        self.db.put_sync_head(11)
+        self.assertEqual(self.db.read_view().get_sync_head(), 10)  # Staged writes are invisible to readers
+        self.db.commit_block()
+
+        self.assertEqual(view.get_balances(self.addresses[0]), {"pFCT": 5})  # Held views stay consistent
+        self.assertEqual(view.get_top_holders("pFCT")[0]["balance"], 5)
+        self.assertEqual(self.db.read_view().get_sync_head(), 11)
+        self.assertEqual(self.db.read_view().get_balances(self.addresses[0]), {"pFCT": 10})
+
+    def test_top_holders(self):
+        self.db.begin_block()
+        self.db.update_balances(self.addresses[0], {"pXBT": 300, "PNT": 1})
+        self.db.update_balances(self.addresses[1], {"pXBT": 200})
+        self.db.update_balances(self.addresses[2], {"pXBT": 100})
+        self.db.commit_block()
+        holders = self.db.get_top_holders("pXBT", 2)
+        self.assertEqual([h["balance"] for h in holders], [300, 200])
+        self.assertEqual(holders[0]["address"], "FA2jK2HcLnRdS94dEcU27rF3meoJfpUcZPSinpb7AwQvPRY6RL1Q")
+        self.assertEqual([h["balance"] for h in self.db.get_top_holders("pXBT", 10, offset=2)], [100])
+
+        # Moving a balance re-orders the index and drops empty balances
+        self.db.begin_block()
+        self.db.update_balances(self.addresses[0], {"pXBT": -300})
+        self.db.update_balances(self.addresses[2], {"pXBT": 300})
+        self.db.commit_block()
+        holders = self.db.get_top_holders("pXBT", 10)
+        self.assertEqual([h["balance"] for h in holders], [400, 200])
+        self.assertEqual([h["rank"] for h in holders], [1, 2])
+        self.assertEqual(len(self.db.get_top_holders("PNT")), 1)
+
+    def test_rich_list_backfill(self):
+        if self.storage == "memory":
+            self.skipTest("Nothing persists across reopening")
+        self.db._db.put(b"Balances" + self.addresses[1], b'{"pUSD": 42}')
+        self.db._db.delete(b"RichListVersion")
+        self.db.close()
+        self.db = AlchemyDB(storage=self.storage)
+        self.assertEqual(self.db.get_top_holders("pUSD")[0]["balance"], 42)
+
+    def test_address_history(self):
+        for height in range(10, 13):
+            self.db.begin_block()
+            self.db.put_history(self.addresses[0], height, "burn", {"pFCT": height}, "ab" * 32)
+            self.db.put_history(self.addresses[0], height, "reward", {"PNT": 1}, bytes(32))
+            self.db.put_history(self.addresses[1], height, "transfer", {"pUSD": 1})
+            self.db.commit_block()
+
+        page = self.db.get_address_history(self.addresses[0], limit=4)
+        self.assertEqual([(r["height"], r["seq"]) for r in page["history"]], [(12, 1), (12, 0), (11, 1), (11, 0)])
+        self.assertEqual(
+            page["history"][1],
+            {"source": "burn", "entry_hash": "ab" * 32, "deltas": {"pFCT": 12}, "height": 12, "seq": 0},
+        )
+        page = self.db.get_address_history(self.addresses[0], limit=4, cursor=page["next_cursor"])
+        self.assertEqual([(r["height"], r["seq"]) for r in page["history"]], [(10, 1), (10, 0)])
+        self.assertIsNone(page["next_cursor"])
+
+        page = self.db.get_address_history("FA1zT4aFpEvcnPqPCigB3fvGu4Q4mTXY22iiuV69DqE1pNhdF2MC", limit=3)
+        self.assertEqual(len(page["history"]), 3)
+        self.assertIsNone(page["next_cursor"])
+
+    def test_rewind(self):
+        for height in range(10, 15):
+            self.db.begin_block(height)
+            self.db.update_balances(self.addresses[0], {"pFCT": height})
+            self.db.update_balances(self.addresses[height % 2], {"PNT": 1})
+            self.db.put_history(self.addresses[0], height, "burn", {"pFCT": height})
+            self.db.put_winners(height, [bytes([height]) * 32] * 10)
+            self.db.put_winners_head(height)
+            self.db.put_rates(height, {"USD": height})
+            self.db.put_sync_head(height)
+            self.db.commit_block()
+            if height == 11:
+                expected = {
+                    "balances": [self.db.get_balances(a) for a in self.addresses],
+                    "holders": self.db.get_top_holders("pFCT"),
+                    "history": self.db.get_address_history(self.addresses[0]),
+                }
+        self.assertEqual(self.db.get_undo_floor(), 9)
+
+        undone = []
+        self.db.rewind(11, progress=undone.append)
+        self.assertEqual(undone, [14, 13, 12])
+        self.assertEqual(self.db.get_sync_head(), 11)
+        self.assertEqual(self.db.get_winners_head(), 11)
+        self.assertEqual(self.db.get_winners(12), [])
+        self.assertIsNone(self.db.get_rates(12))
+        self.assertEqual(self.db.get_highest_winners()[0], bytes([11]) * 32)
+        self.assertEqual([self.db.get_balances(a) for a in self.addresses], expected["balances"])
+        self.assertEqual(self.db.get_top_holders("pFCT"), expected["holders"])
+        self.assertEqual(self.db.get_address_history(self.addresses[0]), expected["history"])
+
+        with self.assertRaises(ValueError):
+            self.db.rewind(5)
+        self.assertEqual(self.db.get_sync_head(), 11)
+
+    def test_undo_retention(self):
+        self.db.max_rewind_depth = 5
+        for height in range(10, 20):
+            self.db.begin_block(height)
+            self.db.put_rates(height, {"USD": height})
+            self.db.put_sync_head(height)
+            self.db.commit_block()
+            self.assertEqual(self.db.get_undo_floor(), max(9, height - 5))
+        self.assertEqual(len(list(self.db._db.iterator(prefix=b"Undo", include_value=False))), 5)
+
+        # Narrowing the window prunes everything that fell out of it at once
+        self.db.max_rewind_depth = 2
+        self.db.begin_block(20)
+        self.db.put_sync_head(20)
+        self.db.commit_block()
+        self.assertEqual(self.db.get_undo_floor(), 18)
+        with self.assertRaises(ValueError):
+            self.db.rewind(17)
+        self.db.rewind(18)
+        self.assertEqual(self.db.get_sync_head(), 18)
+        self.assertEqual(self.db.get_rates(18), {"USD": 18})
+
+    def test_find_winner(self):
+        winners = [bytes([i]) * 32 for i in range(10)]
+        self.db.begin_block(10)
+        self.db.put_winners(10, winners)
+        self.db.put_sync_head(10)
+        self.db.commit_block()
+        self.db.begin_block(11)
+        self.db.put_winners(11, [bytes([3]) * 8 + bytes(24)] + [bytes([i + 10]) * 32 for i in range(1, 10)])
+        self.db.put_sync_head(11)
+        self.db.commit_block()
+
+        self.assertEqual(self.db.find_winner(winners[3]), [{"height": 10, "place": 4, "entry_hash": "03" * 32}])
+        self.assertEqual(self.db.find_winner("00" * 32), [{"height": 10, "place": 1, "entry_hash": "00" * 32}])
+        self.assertEqual(self.db.find_winner(winners[3], height=11), [])
+        self.assertEqual(self.db.find_winner(b"\xff" * 32), [])
+
+        # Short hashes are only unique within a height
+        matches = self.db.find_winner("03" * 8)
+        self.assertEqual([(m["height"], m["place"]) for m in matches], [(10, 4), (11, 1)])
+        self.assertEqual(matches[1]["entry_hash"], "03" * 8 + "00" * 24)
+        self.assertEqual(self.db.find_winner("03" * 8, height=11), matches[1:])
+        self.assertEqual(self.db.read_view().find_winner("03" * 8, height=10), matches[:1])
+        with self.assertRaises(ValueError):
+            self.db.find_winner("03" * 4)
+
+        # Overwriting the winners of a height drops the old ones from the index
+        self.db.put_winners(11, winners)
+        self.assertEqual([(m["height"], m["place"]) for m in self.db.find_winner("03" * 8)], [(10, 4), (11, 4)])
+
+        self.db.rewind(10)
+        self.assertEqual(self.db.find_winner("03" * 8), [{"height": 10, "place": 4, "entry_hash": "03" * 32}])
+
+    def test_winner_index_backfill(self):
+        if self.storage == "memory":
+            self.skipTest("Nothing persists across reopening")
+        self.db.put_winners(10, [bytes([i]) * 32 for i in range(10)])
+        self.db.put_winners_head(10)
+        for key, _ in list(self.db._db.iterator(prefix=b"WinnerBy")):
+            self.db._db.delete(key)
+        self.db._db.delete(b"WinnerIndexVersion")
+        self.db.close()
+        self.db = AlchemyDB(storage=self.storage)
+        self.assertEqual(self.db.find_winner("09" * 8), [{"height": 10, "place": 10, "entry_hash": "09" * 32}])
+
+    def test_miner_stats(self):
+        coinbases = [
+            "FA2jK2HcLnRdS94dEcU27rF3meoJfpUcZPSinpb7AwQvPRY6RL1Q",
+            "FA1zT4aFpEvcnPqPCigB3fvGu4Q4mTXY22iiuV69DqE1pNhdF2MC",
+        ]
+        for height in range(10, 13):
+            self.db.begin_block(height)
+            records = [(coinbases[0], "pool", 1, 800), (coinbases[1], "solo", 2, 600), (coinbases[0], "pool", 0, 0)]
+            if height == 12:
+                records = [
+                    (coinbases[1], "solo", 1, 800),
+                    (coinbases[0], "pool", 2, 600),
+                    (coinbases[0], "pool\ud800", 0, 0),
+                ]
+            self.db.put_miner_block(height, records)
+            self.db.put_sync_head(height)
+            self.db.commit_block()
+
+        stats = self.db.get_miner_stats("coinbase", coinbases[0])[coinbases[0]]
+        self.assertEqual(stats["wins"], [2, 1, 0, 0, 0, 0, 0, 0, 0, 0])
+        self.assertEqual((stats["pnt"], stats["appearances"]), (2200, 6))
+        self.assertEqual((stats["first_height"], stats["last_height"]), (10, 12))
+
+        miners = self.db.get_miner_stats("miner_id")
+        self.assertEqual(sorted(miners), ["pool", "pool\ud800", "solo"])
+        self.assertEqual(miners["solo"]["wins"][:3], [1, 2, 0])
+        self.assertEqual(miners["solo"]["pnt"], 2000)
+
+        window = self.db.get_miner_stats("coinbase", blocks=2)
+        self.assertEqual(window[coinbases[0]]["appearances"], 4)
+        self.assertEqual(window[coinbases[0]]["first_height"], 11)
+        self.assertEqual(window[coinbases[1]]["wins"][:2], [1, 1])
+        self.assertEqual(self.db.get_miner_stats("miner_id", "pool", blocks=1)["pool"]["wins"][:2], [0, 1])
+        self.assertEqual(self.db.get_miner_stats("miner_id", "nobody", blocks=1), {})
+        self.assertEqual(self.db.get_miner_stats("miner_id", "nobody"), {})
+        for blocks in (0, 1001):
+            with self.assertRaises(ValueError):
+                self.db.get_miner_stats("coinbase", blocks=blocks)
+
+        self.db.rewind(10)
+        stats = self.db.read_view().get_miner_stats("coinbase", coinbases[0])[coinbases[0]]
+        self.assertEqual((stats["pnt"], stats["appearances"], stats["last_height"]), (800, 2, 10))
+        self.assertNotIn("pool\ud800", self.db.get_miner_stats("miner_id"))
+
+    def test_difficulties(self):
+        top = 2**64 - 1
+        for height in range(10, 13):
+            self.db.begin_block(height)
+            difficulties = [top - i for i in range(50)] if height != 11 else [top - 7, 3]
+            self.db.put_difficulties(height, 60 + height, 50 + height, height - 10, difficulties)
+            self.db.put_sync_head(height)
+            self.db.commit_block()
+
+        blocks = self.db.get_difficulties(11, 20)
+        self.assertEqual([b["height"] for b in blocks], [11, 12])
+        self.assertEqual(
+            blocks[0], {"height": 11, "entries": 71, "records": 61, "dishonest": 1, "difficulties": [top - 7, 3]}
+        )
+        self.assertEqual(blocks[1]["difficulties"], [top - i for i in range(50)])
+        self.assertEqual([b["height"] for b in self.db.get_difficulties(10)], [10])
+        self.assertEqual(self.db.get_difficulties(12, 11), [])
+        with self.assertRaises(ValueError):
+            self.db.get_difficulties(0, 1000)
+
+        self.db.rewind(10)
+        self.assertEqual([b["height"] for b in self.db.read_view().get_difficulties(0, 20)], [10])
+
+    def test_commit_listener(self):
+        address = FactoidAddress(address_string="FA2jK2HcLnRdS94dEcU27rF3meoJfpUcZPSinpb7AwQvPRY6RL1Q")
+        blocks = []
+        self.db.begin_block(10)
+        self.db.update_balances(address.rcd_hash, {"PNT": 5, "pFCT": 2})
+        self.db.commit_block()
+        self.db.add_commit_listener(blocks.append)
+
+        self.db.begin_block(11)
+        self.db.update_balances(address.rcd_hash, {"PNT": 3})
+        self.db.put_rates(11, {"PEG": 0.5})
+        self.db.put_sync_head(11)
+        self.assertEqual(blocks, [])
+        self.db.commit_block()
+        balances = {"balances": {"PNT": 8, "pFCT": 2}, "deltas": {"PNT": 3}}
+        self.assertEqual(blocks, [{"height": 11, "rates": {"PEG": 0.5}, "balances": {address.to_string(): balances}}])
+
+        self.db.begin_block(12)
+        self.db.put_sync_head(12)
+        self.db.commit_block()
+        self.assertEqual(blocks[1], {"height": 12, "rates": None, "balances": {}})
+
+        # Balance changes aren't worked out for listeners that don't want them at the time
+        uninterested = []
+        self.db.add_commit_listener(uninterested.append, lambda: False)
+        self.db.begin_block(13)
+        self.db.update_balances(address.rcd_hash, {"PNT": 1})
+        self.db.commit_block()
+        self.assertEqual(uninterested, [{"height": 13, "rates": None, "balances": None}])
+        self.assertEqual(blocks[2]["balances"][address.to_string()]["deltas"], {"PNT": 1})
+
+    def test_signature_verdicts_survive_rewind(self):
+        self.db.begin_block(1)
+        self.db.put_signature_verdict(b"\x01" * 32, True)
+        self.db.put_signature_verdict(b"\x02" * 32, False)
+        self.db.put_sync_head(1)
+        self.db.commit_block()
+        self.db.rewind(0)
+        self.assertTrue(self.db.get_signature_verdict(b"\x01" * 32))
+        self.assertFalse(self.db.get_signature_verdict(b"\x02" * 32))
+        self.assertIsNone(self.db.get_signature_verdict(b"\x03" * 32))
+
+
+class TestAlchemyDBSQLite(TestAlchemyDB):
+    storage = "sqlite"
+
+
+class TestAlchemyDBMemory(TestAlchemyDB):
+    storage = "memory"
@@ -0,0 +1,34 @@
+import unittest
+
+from alchemy.entry_blocks import EntryBlockIndex
+from tests.helpers import FakeFactomd
+
+
+class TestEntryBlockIndex(unittest.TestCase):
+    def test_skips_empty_heights(self):
+        factomd = FakeFactomd(entry_heights=[5, 20, 50, 90])
+        index = EntryBlockIndex("chain")
+        index.update(factomd, from_height=10, to_height=100)
+        self.assertEqual(factomd.calls.count("entry_block"), 4)  # Walked back to height 5, then stopped
+
+        factomd.calls = []
+        found = {h: index.entries_at_height(factomd, h) for h in range(10, 101)}
+        self.assertEqual({h for h, entries in found.items() if entries}, {20, 50, 90})
+        self.assertEqual(factomd.calls.count("entry_block"), 3)
+        self.assertNotIn("entries_at_height", factomd.calls)
+
+        # Past the covered height, fall back to the directory block lookup
+        index.entries_at_height(factomd, 101)
+        self.assertIn("entries_at_height", factomd.calls)
+
+    def test_incremental_update(self):
+        factomd = FakeFactomd(entry_heights=[20, 50])
+        index = EntryBlockIndex("chain")
+        index.update(factomd, from_height=10, to_height=60)
+        factomd.extend_chain([70])
+        factomd.calls = []
+        index.prune(55)
+        index.update(factomd, from_height=55, to_height=80)
+        self.assertEqual(factomd.calls.count("entry_block"), 2)  # Only walked 70, then 50 (below from_height)
+        self.assertEqual(len(index.entries_at_height(factomd, 70)), 1)
+        self.assertEqual(index.entries_at_height(factomd, 60), [])
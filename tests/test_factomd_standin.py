@@ -0,0 +1,114 @@
+import threading
+import time
+import unittest
+
+import factom
+from factom import Factomd
+
+import alchemy.consts as consts
+from alchemy.factomd_standin import Chain, FactomdStandin, entry_hash, make_server
+
+FIXTURE = {
+    "blocks": [
+        {
+            "height": 100,
+            "timestamp": 1565000000,
+            "entry_blocks": [
+                {"chainid": consts.OPR_CHAIN_ID, "entries": [{"extids": ["00", "ff"], "content": "7b7d"}]},
+            ],
+        },
+        {"height": 101, "timestamp": 1565000600},
+        {
+            "height": 102,
+            "timestamp": 1565001200,
+            "entry_blocks": [
+                {
+                    "chainid": consts.OPR_CHAIN_ID,
+                    "entries": [
+                        {"extids": [], "content": "", "timestamp": 1565001260},
+                        {"extids": ["01"], "content": "02"},
+                    ],
+                }
+            ],
+            "fblock": {"transactions": [{"txid": "ab" * 32, "inputs": [], "outputs": [], "outecs": []}]},
+        },
+    ],
+    "balances": {"FA2jK2HcLnRdS94dEcU27rF3meoJfpUcZPSinpb7AwQvPRY6RL1Q": 12345},
+}
+
+
+class TestFactomdStandin(unittest.TestCase):
+    def serve(self, **kwargs) -> Factomd:
+        server = make_server(FactomdStandin(Chain(FIXTURE), **kwargs), port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return Factomd(host=f"http://127.0.0.1:{server.server_address[1]}")
+
+    def test_entry_hash(self):
+        # The first entry of the mainnet Factom anchor chain, as factomd serves it
+        self.assertEqual(
+            entry_hash(
+                "df3ade9eec4b08d5379cc64270c30ea7315d8a8a1a69efe2b98a60ecdd69e604",
+                [b"FactomAnchorChain"],
+                b"This is the Factom anchor chain, which records the anchors Factom puts on Bitcoin and other networks.\n",
+            ),
+            "24674e6bc3094eb773297de955ee095a05830e431da13a37382dcdc89d73c7d7",
+        )
+        # External id boundaries are part of the hash
+        self.assertNotEqual(
+            entry_hash(consts.TRANSACTIONS_CHAIN_ID, [b"hel", b"lo"], b"world"),
+            entry_hash(consts.TRANSACTIONS_CHAIN_ID, [b"hello"], b"world"),
+        )
+
+    def test_serves_factomd_api(self):
+        factomd = self.serve()
+        self.assertEqual(factomd.heights()["directoryblockheight"], 102)
+
+        entries = list(factomd.entries_at_height(consts.OPR_CHAIN_ID, 102, include_entry_context=True))
+        self.assertEqual([e["extids"] for e in entries], [[], [b"\x01"]])
+        self.assertEqual([e["timestamp"] for e in entries], [1565001260, 1565001200])
+        self.assertEqual(entries[1]["entryhash"], entry_hash(consts.OPR_CHAIN_ID, [b"\x01"], b"\x02"))
+        self.assertEqual(list(factomd.entries_at_height(consts.OPR_CHAIN_ID, 101)), [])
+        self.assertEqual(list(factomd.entries_at_height(consts.TRANSACTIONS_CHAIN_ID, 102)), [])
+
+        # The chain can be walked back from its head
+        keymr = factomd.chain_head(consts.OPR_CHAIN_ID)["chainhead"]
+        previous_keymr = factomd.entry_block(keymr)["header"]["prevkeymr"]
+        self.assertEqual(factomd.entry_block(previous_keymr)["header"]["dbheight"], 100)
+
+        self.assertEqual(len(factomd.factoid_block_by_height(102)["fblock"]["transactions"]), 1)
+        self.assertEqual(factomd.factoid_block_by_height(101)["fblock"]["transactions"], [])
+        with self.assertRaises(factom.exceptions.BlockNotFound):
+            factomd.factoid_block_by_height(103)
+
+        self.assertEqual(
+            factomd.factoid_balance("FA2jK2HcLnRdS94dEcU27rF3meoJfpUcZPSinpb7AwQvPRY6RL1Q")["balance"], 12345
+        )
+        self.assertEqual(factomd.factoid_balance("FA1zT4aFpEvcnPqPCigB3fvGu4Q4mTXY22iiuV69DqE1pNhdF2MC")["balance"], 0)
+        with self.assertRaises(factom.exceptions.InvalidParams):
+            factomd.factoid_balance("FAinvalid")
+
+    def test_releases_blocks_over_time(self):
+        factomd = self.serve(block_time=3600, initial_height=100)
+        self.assertEqual(factomd.heights()["directoryblockheight"], 100)
+        self.assertEqual(factomd.current_minute()["leaderheight"], 101)
+        with self.assertRaises(factom.exceptions.BlockNotFound):
+            factomd.directory_block_by_height(101)
+        self.assertEqual(list(factomd.entries_at_height(consts.OPR_CHAIN_ID, 100))[0]["content"], b"{}")
+
+    def test_current_minute(self):
+        standin = FactomdStandin(Chain(FIXTURE), block_time=10, initial_height=100)
+        for elapsed, height in ((3, 100), (13.5, 101)):
+            standin.started_at = time.time() - elapsed
+            result = standin.current_minute()
+            self.assertEqual(result["directoryblockheight"], height)
+            self.assertTrue(0 <= result["minute"] <= 9)
+            self.assertEqual(result["minute"], 3)
+            self.assertLessEqual(result["currentblockstarttime"], result["currentminutestarttime"])
+            self.assertLessEqual(result["currentminutestarttime"], result["currenttime"])
+
+    def test_failure_injection(self):
+        factomd = self.serve(failure_rate=1)
+        with self.assertRaises(factom.exceptions.InternalError):
+            factomd.heights()
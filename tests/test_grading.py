@@ -0,0 +1,194 @@
+import collections
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import alchemy.consts as consts
+import alchemy.grading.graders as graders
+import alchemy.grading.grading as grading
+import alchemy.metrics as metrics
+from alchemy.grading import GradingPipeline
+from alchemy.grading.graders import BaseGrader, StockGrader
+from alchemy.opr import OPR
+
+PREVIOUS_WINNERS = ["" for _ in range(10)]
+
+
+class CountingLXR:
+    """Stands in for pylxr.LXR, counting how many hashes were computed"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def h(self, data: bytes) -> bytes:
+        self.calls += 1
+        return hashlib.sha256(data).digest()
+
+
+def make_record(i: int, honest: bool = True, prev_winners=None) -> OPR:
+    opr_hash = hashlib.sha256(f"opr {i}".encode()).digest()
+    nonce = i.to_bytes(4, "big")
+    difficulty = hashlib.sha256(opr_hash + nonce).digest()[:8]
+    if not honest:
+        difficulty = b"\xff" * 8
+    return OPR(
+        entry_hash=hashlib.sha256(f"entry {i}".encode()).digest(),
+        nonce=nonce,
+        self_reported_difficulty=difficulty,
+        coinbase_address="FA2jK2HcLnRdS94dEcU27rF3meoJfpUcZPSinpb7AwQvPRY6RL1Q",
+        height=consts.START_HEIGHT,
+        asset_estimates={asset: 1 + j + (i % 7) / 100 for j, asset in enumerate(consts.ASSET_GRADING_ORDER)},
+        prev_winners=prev_winners if prev_winners is not None else PREVIOUS_WINNERS,
+        miner_id="miner",
+        timestamp=0,
+        opr_hash=opr_hash,
+    )
+
+
+class TestFilterTop50(unittest.TestCase):
+    def setUp(self):
+        self.lxr = CountingLXR()
+        self.grader = BaseGrader(self.lxr)
+        self.rejections_before = self.rejections_total()
+
+    @staticmethod
+    def rejections_total():
+        samples = metrics.snapshot()["alchemy_opr_rejections_total"]["samples"]
+        return {sample["labels"]["reason"]: sample["value"] for sample in samples}
+
+    def rejections(self, reason: str) -> int:
+        """Rejections counted during the test, the registry is shared"""
+        return self.rejections_total().get(reason, 0) - self.rejections_before.get(reason, 0)
+
+    def test_top_50_by_difficulty(self):
+        records = [make_record(i) for i in range(80)]
+        top50 = self.grader.filter_top_50(PREVIOUS_WINNERS, list(records))
+        expected = sorted(records, key=lambda x: x.self_reported_difficulty, reverse=True)[:50]
+        self.assertEqual(top50, expected)
+        self.assertEqual(self.lxr.calls, 50)
+
+    def test_cheap_rejections_are_not_hashed(self):
+        wrong_winners = ["0000000000000000" for _ in range(10)]
+        records = [make_record(i, prev_winners=wrong_winners) for i in range(20)]
+        records[0].self_reported_difficulty = b"\xff" * 9
+        records[1].prev_winners = PREVIOUS_WINNERS
+        records += [make_record(1) for _ in range(5)]
+
+        top50 = self.grader.filter_top_50(PREVIOUS_WINNERS, records)
+        self.assertEqual([r.nonce for r in top50], [make_record(1).nonce])
+        self.assertEqual(self.lxr.calls, 1)
+        self.assertEqual(self.rejections("malformed_difficulty"), 1)
+        self.assertEqual(self.rejections("wrong_previous_winners"), 18)
+        self.assertEqual(self.rejections("duplicate"), 5)
+
+    def test_first_copy_of_the_same_work_is_graded(self):
+        # Someone resubmits a miner's work claiming a higher difficulty than it has: only the first copy in entry
+        # order counts, like the reference implementation's RemoveDuplicateSubmissions
+        honest = make_record(1)
+        copy = make_record(1, honest=False)
+        top50 = self.grader.filter_top_50(PREVIOUS_WINNERS, [honest, copy, make_record(1)])
+        self.assertEqual(top50, [honest])
+        self.assertEqual(self.lxr.calls, 1)
+        self.assertEqual(self.rejections("duplicate"), 2)
+
+        # Even if the first copy turns out to be the dishonest one
+        top50 = self.grader.filter_top_50(PREVIOUS_WINNERS, [copy, honest, make_record(2)])
+        self.assertEqual(top50, [make_record(2)])
+        self.assertEqual(self.lxr.calls, 3)
+        self.assertEqual(self.rejections("duplicate"), 3)
+        self.assertEqual(self.rejections("dishonest_difficulty"), 1)
+
+    def test_lxr_verify_is_observed_once_per_block(self):
+        def observations() -> int:
+            samples = metrics.snapshot()["alchemy_stage_seconds"]["samples"]
+            return sum(s["value"]["count"] for s in samples if s["labels"] == {"stage": "lxr_verify"})
+
+        before = observations()
+        self.grader.filter_top_50(PREVIOUS_WINNERS, [make_record(i) for i in range(80)])
+        self.assertEqual(self.lxr.calls, 50)
+        self.assertEqual(observations(), before + 1)
+
+    def test_rejections_are_counted(self):
+        rejections = collections.Counter()
+        records = [make_record(i) for i in range(5)] + [make_record(5, honest=False), make_record(1)]
+        records[0].self_reported_difficulty = b"\x00"
+        top50 = self.grader.filter_top_50(PREVIOUS_WINNERS, records, rejections)
+        self.assertEqual(len(top50), 4)
+        self.assertEqual(rejections, {"malformed_difficulty": 1, "duplicate": 1, "dishonest_difficulty": 1})
+
+
+class MutatingGrader(StockGrader):
+    """A careless research grader, changing the estimates it's given in place"""
+
+    def grade_eligible_records(self, eligible_records):
+        for record in eligible_records[::2]:
+            record.asset_estimates["XBT"] = 0.0
+        return super().grade_eligible_records(eligible_records)
+
+
+class TestGraderRegistry(unittest.TestCase):
+    def test_make_grader(self):
+        lxr = CountingLXR()
+        grader = graders.make_grader("stock", lxr)
+        self.assertIsInstance(grader, StockGrader)
+        self.assertIs(grader.lxr, lxr)
+        with self.assertRaises(ValueError):
+            graders.make_grader("no_such_grader", lxr)
+
+    def test_register_grader(self):
+        graders.register_grader("mutating", MutatingGrader)
+        self.addCleanup(graders.GRADERS.pop, "mutating")
+        self.assertIsInstance(graders.make_grader("mutating", None), MutatingGrader)
+
+
+class TestGradingPipeline(unittest.TestCase):
+    def setUp(self):
+        graders.register_grader("mutating", MutatingGrader)
+        self.addCleanup(graders.GRADERS.pop, "mutating")
+
+    @staticmethod
+    def grade(pipeline: GradingPipeline):
+        return pipeline.grade_records(PREVIOUS_WINNERS, [make_record(i) for i in range(80)])
+
+    def test_shadow_graders_cost_no_hashing(self):
+        lxr = CountingLXR()
+        pipeline = GradingPipeline(lxr, "stock", ["straight_difficulty", "mutating"])
+        self.grade(pipeline)
+        self.assertEqual(lxr.calls, 50)
+        self.assertEqual(sorted(pipeline.shadow_results), ["mutating", "straight_difficulty"])
+
+    def test_shadow_graders_do_not_change_consensus(self):
+        prices, winners, _, _ = self.grade(GradingPipeline(CountingLXR()))
+        shadowed_prices, shadowed_winners, _, _ = self.grade(
+            GradingPipeline(CountingLXR(), "stock", ["mutating", "straight_difficulty"])
+        )
+        self.assertEqual(shadowed_prices, prices)
+        self.assertEqual([r.entry_hash for r in shadowed_winners], [r.entry_hash for r in winners])
+        self.assertEqual([r.asset_estimates for r in shadowed_winners], [r.asset_estimates for r in winners])
+
+    def test_report_shadow_results(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        pipeline = GradingPipeline(CountingLXR(), "stock", ["straight_difficulty"])
+        _, winners, _, _ = self.grade(pipeline)
+        with mock.patch.object(grading, "shadow_path", directory):
+            pipeline.report_shadow_results(consts.START_HEIGHT, winners)
+        with open(os.path.join(directory, "straight_difficulty", "prices.csv")) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("Date,Height,"))
+
+    def test_submissions(self):
+        records = [make_record(i) for i in range(60)] + [make_record(60, honest=False)]
+        _, winners, _, submissions = GradingPipeline(CountingLXR()).grade_records(PREVIOUS_WINNERS, records, entries=70)
+        self.assertEqual((submissions.entries, submissions.records, submissions.dishonest), (70, 61, 1))
+        expected = sorted((int.from_bytes(r.self_reported_difficulty, "big") for r in records[:60]), reverse=True)
+        self.assertEqual(submissions.difficulties, expected[:50])
+
+        # Too few records to grade, but still verified
+        result = GradingPipeline(CountingLXR()).grade_records(PREVIOUS_WINNERS, records[:5])
+        self.assertEqual(result[:3], (None, None, None))
+        self.assertEqual((result[3].entries, result[3].records, len(result[3].difficulties)), (5, 5, 5))
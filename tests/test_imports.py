@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencies that only the node or the graphing commands should ever load
+HEAVY_MODULES = {"pylxr", "plyvel", "numpy", "pandas", "plotly", "uvloop", "factom"}
+
+
+def imported_modules(*args: str):
+    """Runs the given python arguments with -X importtime and returns the set of top level modules that were imported"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            modules.add(name.split(".")[0])
+    return modules
+
+
+class TestImports(unittest.TestCase):
+    def test_rpc_is_light(self):
+        self.assertEqual(imported_modules("-c", "import alchemy.rpc") & HEAVY_MODULES, set())
+
+    def test_cli_is_light(self):
+        for command in ["get-sync-head", "get-balances", "get-winners", "get-rates"]:
+            heavy = imported_modules("alchemy.py", command, "--help") & HEAVY_MODULES
+            self.assertEqual(heavy, set(), f"{command} imports {heavy}")
@@ -0,0 +1,39 @@
+import threading
+import unittest
+from unittest import mock
+
+from factom import Factomd
+
+import alchemy.main as main
+from alchemy import burning, consts
+from alchemy.factomd_standin import Chain, FactomdStandin, make_server
+from alchemy.profiling import BlockProfiler
+
+
+def make_burn(height: int):
+    return {
+        "txid": f"{height:064x}",
+        "inputs": [{"address": f"{height:064x}", "amount": height}],
+        "outputs": [],
+        "outecs": [{"useraddress": consts.BurnAddresses.MAINNET.value}],
+    }
+
+
+class TestExecuteBlocks(unittest.TestCase):
+    def test_burns_are_scanned_from_the_nodes_factomd(self):
+        blocks = [
+            {"height": h, "timestamp": 1565000000 + h * 600, "fblock": {"transactions": [make_burn(h)]}}
+            for h in (10, 11, 12)
+        ]
+        server = make_server(FactomdStandin(Chain({"blocks": blocks})), port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        factomd = Factomd(host=f"http://127.0.0.1:{server.server_address[1]}")
+
+        with mock.patch.object(main, "execute_block") as execute_block:
+            main.execute_blocks(10, 12, 12, factomd, None, None, False, BlockProfiler(0), mock.Mock())
+        scanned = [(c.args[0], c.args[5]) for c in execute_block.call_args_list]
+        self.assertEqual(
+            scanned, [(h, burning.parse_factoid_block({"transactions": [make_burn(h)]})) for h in (10, 11, 12)]
+        )
@@ -0,0 +1,32 @@
+import unittest
+
+from alchemy.metrics import Registry, to_prometheus_text
+
+
+class TestMetrics(unittest.TestCase):
+    def test_prometheus_text(self):
+        registry = Registry()
+        registry.increment("alchemy_dishonest_difficulty_total")
+        registry.increment("alchemy_dishonest_difficulty_total", 2)
+        registry.set_gauge("alchemy_sync_lag_blocks", 7)
+        registry.observe("alchemy_stage_seconds", 0.003, stage="grading")
+        registry.observe("alchemy_stage_seconds", 0.5, stage="grading")
+        registry.observe("alchemy_stage_seconds", 100, stage="grading")
+
+        text = to_prometheus_text(registry.snapshot())
+        self.assertIn("# TYPE alchemy_dishonest_difficulty_total counter\nalchemy_dishonest_difficulty_total 3\n", text)
+        self.assertIn("alchemy_sync_lag_blocks 7\n", text)
+        self.assertIn('alchemy_stage_seconds_bucket{stage="grading",le="0.001"} 0\n', text)
+        self.assertIn('alchemy_stage_seconds_bucket{stage="grading",le="0.005"} 1\n', text)
+        self.assertIn('alchemy_stage_seconds_bucket{stage="grading",le="0.5"} 2\n', text)
+        self.assertIn('alchemy_stage_seconds_bucket{stage="grading",le="60"} 2\n', text)
+        self.assertIn('alchemy_stage_seconds_bucket{stage="grading",le="+Inf"} 3\n', text)
+        self.assertIn('alchemy_stage_seconds_count{stage="grading"} 3\n', text)
+
+    def test_timed(self):
+        registry = Registry()
+        with registry.timed("alchemy_rpc_seconds", method="balances"):
+            pass
+        samples = registry.snapshot()["alchemy_rpc_seconds"]["samples"]
+        self.assertEqual(samples[0]["labels"], {"method": "balances"})
+        self.assertEqual(samples[0]["value"]["count"], 1)
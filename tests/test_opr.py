@@ -1,5 +1,8 @@
+import json
 import unittest
+from unittest import mock
 
+import alchemy.decoding
 from alchemy.opr import OPR
 
 
@@ -128,10 +131,97 @@ class TestOPR(unittest.TestCase):
         for name, case in TestOPR.cases.items():
             record = OPR.from_entry(
                 entry_hash=case["entry_hash"],
-                external_ids=[case["nonce"], case["self_reported_difficulty"]],
+                external_ids=[case["nonce"], case["self_reported_difficulty"], b"\x01"],
                 content=case["content"],
+                timestamp=1565000000,
             )
             if case["should_be_valid"]:
                 self.assertIsNotNone(record, f'Case "{name}"')
             else:
                 self.assertIsNone(record, f'Case "{name}"')
+
+    @staticmethod
+    def from_content(content: bytes, external_ids=None):
+        valid = TestOPR.cases["valid"]
+        if external_ids is None:
+            external_ids = [valid["nonce"], valid["self_reported_difficulty"], b"\x01"]
+        return OPR.from_entry(valid["entry_hash"], external_ids, content, 1565000000)
+
+    @staticmethod
+    def mutated_content(mutate) -> bytes:
+        record = json.loads(TestOPR.cases["valid"]["content"])
+        mutate(record)
+        return json.dumps(record).encode()
+
+    mutations = {
+        # name --> (mutation of the valid record, should be valid)
+        "zero PNT": (lambda r: r["assets"].update(PNT=0), True),
+        "nonzero PNT": (lambda r: r["assets"].update(PNT=5), True),
+        "negative estimate": (lambda r: r["assets"].update(USD=-1), True),
+        "integer estimate": (lambda r: r["assets"].update(USD=1), True),
+        "huge integer estimate": (lambda r: r["assets"].update(USD=10**30), True),
+        "extra field": (lambda r: r.update(extra=[1, 2]), True),
+        "zero estimate": (lambda r: r["assets"].update(USD=0), False),
+        "zero float estimate": (lambda r: r["assets"].update(USD=0.0), False),
+        "boolean estimate": (lambda r: r["assets"].update(USD=True), False),
+        "string estimate": (lambda r: r["assets"].update(USD="1.0"), False),
+        "null estimate": (lambda r: r["assets"].update(USD=None), False),
+        "assets not an object": (lambda r: r.update(assets=list(r["assets"])), False),
+        "boolean height": (lambda r: r.update(dbht=True), False),
+        "float height": (lambda r: r.update(dbht=49.0), False),
+        "negative height": (lambda r: r.update(dbht=-1), False),
+        "huge height": (lambda r: r.update(dbht=10**30), True),
+        "missing height": (lambda r: r.pop("dbht"), False),
+        "missing miner id": (lambda r: r.pop("minerid"), False),
+        "coinbase not a string": (lambda r: r.update(coinbase=5), False),
+        "coinbase bad checksum": (lambda r: r.update(coinbase=r["coinbase"][:-1] + "M"), False),
+        "9 winners": (lambda r: r.update(winners=r["winners"][:9]), False),
+        "null winner": (lambda r: r["winners"].__setitem__(3, None), False),
+        "winners not a list": (lambda r: r.update(winners={}), False),
+    }
+
+    def test_from_entry_mutations(self):
+        for name, (mutate, should_be_valid) in TestOPR.mutations.items():
+            record = TestOPR.from_content(TestOPR.mutated_content(mutate))
+            self.assertEqual(record is not None, should_be_valid, f'Case "{name}"')
+
+    raw_contents = {
+        # name --> (content, should be valid)
+        "NaN estimate": (cases["valid"]["content"].replace(b'"USD":1.0112', b'"USD":NaN'), True),
+        "infinite estimate": (cases["valid"]["content"].replace(b'"USD":1.0112', b'"USD":1e400'), True),
+        "byte order mark": (b"\xef\xbb\xbf" + cases["valid"]["content"], False),
+        "invalid utf-8": (cases["valid"]["content"].replace(b"prototype", b"proto\xfftype"), False),
+        "lone surrogate in miner id": (cases["valid"]["content"].replace(b"prototype", b"\\ud800"), True),
+        "trailing garbage": (cases["valid"]["content"] + b"}", False),
+        "not an object": (b"[1, 2, 3]", False),
+        "a string": (b'"coinbase"', False),
+        "empty": (b"", False),
+    }
+
+    def test_from_entry_raw_content(self):
+        for name, (content, should_be_valid) in TestOPR.raw_contents.items():
+            record = TestOPR.from_content(content)
+            self.assertEqual(record is not None, should_be_valid, f'Case "{name}"')
+
+    def test_from_entry_external_ids(self):
+        valid = TestOPR.cases["valid"]
+        cases = {
+            "two external ids": [valid["nonce"], valid["self_reported_difficulty"]],
+            "version 2": [valid["nonce"], valid["self_reported_difficulty"], b"\x02"],
+            "long version": [valid["nonce"], valid["self_reported_difficulty"], b"\x01\x00"],
+            "string nonce": ["nonce", valid["self_reported_difficulty"], b"\x01"],
+        }
+        for name, external_ids in cases.items():
+            self.assertIsNone(TestOPR.from_content(valid["content"], external_ids), f'Case "{name}"')
+
+    def test_stdlib_json_fallback(self):
+        """Decoding with and without orjson must accept, reject and parse exactly the same contents"""
+        contents = [case["content"] for case in TestOPR.cases.values()]
+        contents += [TestOPR.mutated_content(mutate) for mutate, _ in TestOPR.mutations.values()]
+        contents += [content for content, _ in TestOPR.raw_contents.values()]
+        fast = [TestOPR.from_content(content) for content in contents]
+        with mock.patch.object(alchemy.decoding, "orjson", None):
+            reference = [TestOPR.from_content(content) for content in contents]
+        self.assertEqual(len(fast), len(reference))
+        for content, fast_record, reference_record in zip(contents, fast, reference):
+            self.assertEqual(repr(fast_record), repr(reference_record), content)
@@ -0,0 +1,47 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import alchemy.metrics as metrics
+from alchemy.polling import BlockPoller, next_poll_delay
+from tests.helpers import FakeFactomd
+
+SECOND = 10**9
+
+
+def status(leaderheight, directoryblockheight, minute, block_start, minute_start, now, stalled=False):
+    return {
+        "leaderheight": leaderheight,
+        "directoryblockheight": directoryblockheight,
+        "minute": minute,
+        "currentblockstarttime": block_start * SECOND,
+        "currentminutestarttime": minute_start * SECOND,
+        "currenttime": now * SECOND,
+        "directoryblockinseconds": 600,
+        "stalldetected": stalled,
+    }
+
+
+class TestPolling(unittest.TestCase):
+    def test_next_poll_delay(self):
+        # Minute 2 of block 101 started 10s ago: 470s left, so sleep until 5s before that (capped)
+        self.assertEqual(next_poll_delay(status(101, 100, 2, 0, 120, 130), 101, 0.5, 15, 5), 15)
+        # 3s before the end of minute 9: poll tightly
+        self.assertEqual(next_poll_delay(status(101, 100, 9, 0, 540, 597), 101, 0.5, 15, 5), 0.5)
+        # 10s before the end of minute 9: sleep until the lead window starts
+        self.assertAlmostEqual(next_poll_delay(status(101, 100, 9, 0, 540, 590), 101, 0.5, 15, 5), 5)
+        # Block 101 ended 2s ago but isn't saved yet: poll tightly, backing off the longer it takes
+        self.assertEqual(next_poll_delay(status(102, 100, 0, 600, 600, 602), 101, 0.5, 15, 5), 0.5)
+        self.assertEqual(next_poll_delay(status(102, 100, 0, 600, 600, 650), 101, 0.5, 15, 5), 5)
+        self.assertEqual(next_poll_delay(status(102, 100, 0, 600, 600, 602, stalled=True), 101, 0.5, 15, 5), 15)
+
+    def test_wait_for_block_records_detection_latency(self):
+        factomd = FakeFactomd(statuses=[status(101, 100, 9, 0, 540, 597), status(102, 101, 0, 600, 600, 603)])
+        before = metrics.snapshot()["alchemy_block_detection_seconds"]["samples"]
+        before_count = before[0]["value"]["count"] if before else 0
+        with mock.patch("asyncio.sleep", new=mock.AsyncMock()) as sleep:
+            latest_block = asyncio.run(BlockPoller(factomd).wait_for_block(101))
+        self.assertEqual(latest_block, 101)
+        sleep.assert_awaited_once_with(0.5)
+        histogram = metrics.snapshot()["alchemy_block_detection_seconds"]["samples"][0]["value"]
+        self.assertEqual(histogram["count"], before_count + 1)
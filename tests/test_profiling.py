@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import time
+import types
+import unittest
+
+import alchemy.profiling as profiling
+from alchemy.profiling import BlockProfiler, StackSampler
+
+GRADING = os.path.join("/src", "alchemy", "grading", "grading.py")
+BURNING = os.path.join("/src", "alchemy", "burning.py")
+MAIN = os.path.join("/src", "alchemy", "main.py")
+
+
+def busy(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def idle(seconds: float):
+    time.sleep(seconds)
+
+
+class TestSummarize(unittest.TestCase):
+    def test_subsystem_of(self):
+        self.assertEqual(profiling.subsystem_of(GRADING), "grading")
+        self.assertEqual(profiling.subsystem_of(BURNING), "burning")
+        self.assertEqual(profiling.subsystem_of(os.path.join("/src", "alchemy", "db.py")), "db")
+        transactions_db = os.path.join("/src", "alchemy", "transactions", "db.py")
+        self.assertEqual(profiling.subsystem_of(transactions_db), "transactions")
+        self.assertIsNone(profiling.subsystem_of(MAIN))
+        self.assertIsNone(profiling.subsystem_of("~"))
+
+    def test_summarize(self):
+        process_block = (GRADING, 10, "process_block")
+        grade = (GRADING, 20, "grade")
+        scan = (BURNING, 5, "scan")
+        execute_block = (MAIN, 100, "execute_block")
+        stats = types.SimpleNamespace(
+            stats={
+                # (primitive calls, calls, own time, cumulative time, callers)
+                process_block: (2, 2, 0.5, 3.0, {execute_block: (2, 2, 0.5, 3.0)}),
+                grade: (4, 4, 2.5, 2.5, {process_block: (4, 4, 2.5, 2.5)}),
+                scan: (1, 1, 1.0, 1.0, {execute_block: (1, 1, 1.0, 1.0)}),
+                execute_block: (2, 2, 0.1, 4.1, {}),
+            }
+        )
+        lines = profiling.summarize(stats, top_n=1).split("\n")
+
+        # Calls from inside grading are already part of process_block's cumulative time
+        self.assertEqual(lines[0], "grading: 3.000s")
+        self.assertIn("process_block (grading.py:10)", lines[1])
+        self.assertEqual(lines[2], "transactions: 0.000s")
+        self.assertEqual(lines[3], "burning: 1.000s")
+        self.assertIn("scan (burning.py:5)", lines[4])
+        self.assertEqual(lines[5], "db: 0.000s")
+        self.assertEqual(len(lines), 6)
+
+
+class TestBlockProfiler(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def written(self):
+        return sorted(os.listdir(self.output_dir))
+
+    def test_write_collapsed(self):
+        sampler = StackSampler(0)
+        sampler.stacks["main.py:run;grading.py:grade"] += 3
+        sampler.stacks["main.py:run"] += 1
+        filename = os.path.join(self.output_dir, "stacks.collapsed")
+        sampler.write_collapsed(filename)
+        with open(filename) as f:
+            self.assertEqual(f.read(), "main.py:run 1\nmain.py:run;grading.py:grade 3\n")
+
+    def test_profiles_n_blocks(self):
+        profiler = BlockProfiler(2, self.output_dir)
+        for height, remaining in ((10, 1), (11, 0)):
+            with profiler.block(height):
+                busy(0.05)
+            self.assertEqual(profiler.remaining, remaining)
+            # Time between blocks isn't sampled
+            idle(0.05)
+        names = self.written()
+        self.assertEqual(len(names), 2)
+        self.assertTrue(names[0].startswith("blocks-10-11-") and names[0].endswith(".collapsed"))
+        self.assertTrue(names[1].endswith(".pstats"))
+
+        with open(os.path.join(self.output_dir, names[0])) as f:
+            stacks = f.read()
+        self.assertIn("test_profiling.py:busy", stacks)
+        self.assertNotIn("test_profiling.py:idle", stacks)
+
+        # Once done, blocks are no longer profiled and nothing more is written
+        with profiler.block(12):
+            pass
+        profiler.finish()
+        self.assertEqual(self.written(), names)
+
+    def test_finish_early(self):
+        profiler = BlockProfiler(5, self.output_dir)
+        profiler.finish()
+        self.assertEqual(self.written(), [])
+
+        with profiler.block(10):
+            busy(0.01)
+        profiler.finish()
+        names = self.written()
+        self.assertEqual(len(names), 2)
+        self.assertTrue(names[0].startswith("blocks-10-10-"))
+
+        with profiler.block(11):
+            pass
+        self.assertEqual(self.written(), names)
@@ -0,0 +1,51 @@
+import numpy as np
+
+from alchemy.transactions.rates import ConversionRates, RatesCache
+from tests.helpers import DatabaseTestCase
+
+
+class TestRates(DatabaseTestCase):
+    rates = {"PNT": 0, "USD": 1, "FCT": 3.2319, "XBT": 10607.0505}
+
+    def test_convert_matches_reference_truncation(self):
+        conversion_rates = ConversionRates(self.rates)
+        self.assertEqual(conversion_rates.tickers, ["PNT", "USD", "XBT", "FCT"])
+        for amount in [0, 1, 50e8, 123456789, 10**15]:
+            for a in ["USD", "FCT", "XBT"]:
+                for b in ["USD", "FCT", "XBT"]:
+                    expected = np.trunc(np.float64(amount) * self.rates[a] / self.rates[b])
+                    self.assertEqual(conversion_rates.convert(amount, a, b), expected)
+        self.assertAlmostEqual(
+            conversion_rates.matrix[conversion_rates.index["XBT"], conversion_rates.index["USD"]], 10607.0505
+        )
+
+    def test_quote(self):
+        self.db.put_rates(10, self.rates)
+        self.db.put_rates(20, {**self.rates, "FCT": 4})
+        self.db.put_sync_head(25)
+        cache = RatesCache(self.db)
+
+        quote = cache.quote("pFCT", "pUSD", 5 * 10**8, 15)  # Ungraded height uses the rates from height 10
+        self.assertEqual(quote["output"], int(np.trunc(np.float64(5e8) * 3.2319 / 1)))
+        self.assertEqual(cache.quote("FCT", "USD", 10**8)["output"], 4 * 10**8)  # Defaults to the sync head
+        self.assertIsNone(cache.quote("FCT", "USD", 10**8, 5))  # Before any rates
+        self.assertIsNone(cache.quote("USD", "PNT", 10**8, 15))  # PNT has no rate yet
+        self.assertIsNone(cache.quote("USD", "BAD", 10**8, 15))
+
+    def test_rewind_drops_cached_rates(self):
+        cache = RatesCache(self.db)
+        for height, fct in [(10, 3), (11, 4)]:
+            self.db.begin_block(height)
+            self.db.put_rates(height, {**self.rates, "FCT": fct})
+            self.db.put_sync_head(height)
+            self.db.commit_block()
+        self.assertEqual(cache.quote("FCT", "USD", 10**8, 10)["output"], 3 * 10**8)
+        self.assertEqual(cache.quote("FCT", "USD", 10**8, 11)["output"], 4 * 10**8)
+
+        self.db.rewind(10)
+        self.db.begin_block(11)
+        self.db.put_rates(11, {**self.rates, "FCT": 5})
+        self.db.put_sync_head(11)
+        self.db.commit_block()
+        self.assertEqual(cache.quote("FCT", "USD", 10**8, 11)["output"], 5 * 10**8)
+        self.assertIn(10, cache._cache)  # Still valid, only later blocks were undone
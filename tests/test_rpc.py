@@ -0,0 +1,81 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import alchemy.rpc as rpc
+from alchemy.rpc import FactoidBalanceCache
+from tests.helpers import FakeFactomd
+
+
+class TestFactoidBalanceCache(unittest.TestCase):
+    address = "FA2jK2HcLnRdS94dEcU27rF3meoJfpUcZPSinpb7AwQvPRY6RL1Q"
+
+    def test_cached_until_height_changes(self):
+        factomd = FakeFactomd()
+        cache = FactoidBalanceCache(height_ttl=0)
+        self.assertEqual(cache.get(self.address, factomd), 1100)
+        self.assertEqual(cache.get(self.address, factomd), 1100)
+        self.assertEqual(factomd.calls.count("factoid_balance"), 1)
+
+        factomd.height = 101
+        self.assertEqual(cache.get(self.address, factomd), 1101)
+        self.assertEqual(factomd.calls.count("factoid_balance"), 2)
+
+    def test_height_ttl(self):
+        factomd = FakeFactomd()
+        cache = FactoidBalanceCache(height_ttl=60)
+        for _ in range(5):
+            cache.get(self.address, factomd)
+        self.assertEqual(factomd.calls.count("heights"), 1)
+
+    def test_concurrent_lookups_share_request(self):
+        factomd = FakeFactomd(delay=0.2)
+        cache = FactoidBalanceCache(height_ttl=60)
+        cache._refresh_height(factomd)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get(self.address, factomd))) for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [1100] * 5)
+        self.assertEqual(factomd.calls.count("factoid_balance"), 1)
+
+    def test_hung_height_check_does_not_block_cached_lookups(self):
+        factomd = FakeFactomd()
+        cache = FactoidBalanceCache(height_ttl=0)
+        self.assertEqual(cache.get(self.address, factomd), 1100)
+
+        asked, released = threading.Event(), threading.Event()
+        heights = factomd.heights
+
+        def hung_heights():
+            asked.set()
+            released.wait(10)
+            return heights()
+
+        factomd.heights = hung_heights
+        refresher = threading.Thread(target=cache.get, args=(self.address, factomd))
+        refresher.start()
+        try:
+            self.assertTrue(asked.wait(5))
+            started = time.monotonic()
+            self.assertEqual(cache.get(self.address, factomd), 1100)
+            self.assertLess(time.monotonic() - started, 1)
+        finally:
+            released.set()
+            refresher.join()
+        self.assertEqual(factomd.calls.count("factoid_balance"), 1)
+
+
+class TestQueryLimits(unittest.TestCase):
+    def test_difficulties_range(self):
+        with mock.patch.object(rpc, "_make_call", return_value=[]) as make_call:
+            self.assertEqual(rpc.get_difficulties(0, 999), {"blocks": []})
+            self.assertEqual(rpc.get_difficulties(5), {"blocks": []})
+            with self.assertRaises(ValueError):
+                rpc.get_difficulties(0, 1000)
+            self.assertEqual(make_call.call_count, 2)
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from alchemy.storage import ENGINES, _prefix_stop, open_engine
+
+
+class TestStorageEngines(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def engines(self):
+        for storage in ENGINES:
+            path = os.path.join(self.directory, storage if storage != "sqlite" else "db.sqlite3")
+            with self.subTest(storage=storage):
+                engine = open_engine(storage, path, create_if_missing=True)
+                try:
+                    yield engine
+                finally:
+                    engine.close()
+
+    def test_prefix_stop(self):
+        self.assertEqual(_prefix_stop(b"ab"), b"ac")
+        self.assertEqual(_prefix_stop(b"a\xff\xff"), b"b")
+        self.assertIsNone(_prefix_stop(b"\xff"))
+
+    def test_get_put_delete(self):
+        for engine in self.engines():
+            self.assertIsNone(engine.get(b"a"))
+            engine.put(b"a", b"1")
+            engine.put(b"a", b"2")
+            self.assertEqual(engine.get(b"a"), b"2")
+            engine.delete(b"a")
+            engine.delete(b"missing")
+            self.assertIsNone(engine.get(b"a"))
+
+    def test_iterator(self):
+        for engine in self.engines():
+            for key in [b"A\x00", b"A\xff", b"A\x01", b"B", b"A", b"C\x00"]:
+                engine.put(key, key + b"!")
+            self.assertEqual(
+                list(engine.iterator(prefix=b"A", include_value=False)), [b"A", b"A\x00", b"A\x01", b"A\xff"]
+            )
+            self.assertEqual(list(engine.iterator(prefix=b"A", reverse=True))[0], (b"A\xff", b"A\xff!"))
+            self.assertEqual(
+                list(engine.iterator(start=b"A\x01", stop=b"C", include_value=False)), [b"A\x01", b"A\xff", b"B"]
+            )
+            self.assertEqual(
+                list(engine.iterator(start=b"A\x01", stop=b"C", reverse=True, include_value=False)),
+                [b"B", b"A\xff", b"A\x01"],
+            )
+            self.assertEqual(len(list(engine.iterator())), 6)
+
+    def test_write_batch_is_atomic(self):
+        for engine in self.engines():
+            engine.put(b"a", b"1")
+            with engine.write_batch(transaction=True) as wb:
+                wb.put(b"b", b"2")
+                wb.delete(b"a")
+            self.assertEqual((engine.get(b"a"), engine.get(b"b")), (None, b"2"))
+            with self.assertRaises(RuntimeError):
+                with engine.write_batch(transaction=True) as wb:
+                    wb.put(b"c", b"3")
+                    raise RuntimeError()
+            self.assertIsNone(engine.get(b"c"))
+
+    def test_snapshot_isolation(self):
+        for engine in self.engines():
+            engine.put(b"a", b"1")
+            snapshot = engine.snapshot()
+            engine.put(b"a", b"2")
+            engine.put(b"b", b"3")
+            self.assertEqual(snapshot.get(b"a"), b"1")
+            self.assertEqual(list(snapshot.iterator(include_value=False)), [b"a"])
+            self.assertEqual(engine.get(b"a"), b"2")
+            snapshot.release()
+
+    def test_memory_iterator_survives_deletes(self):
+        engine = open_engine("memory", "")
+        for i in range(10):
+            engine.put(bytes([i]), bytes([i]))
+        iterator = engine.iterator()
+        with engine.write_batch() as wb:
+            for i in range(10):
+                wb.delete(bytes([i]))
+        self.assertEqual(list(iterator), [(bytes([i]), bytes([i])) for i in range(10)])
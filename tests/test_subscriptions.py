@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+import alchemy.rpc as rpc
+from alchemy.subscriptions import BlockEvents
+
+ADDRESS = "FA2jK2HcLnRdS94dEcU27rF3meoJfpUcZPSinpb7AwQvPRY6RL1Q"
+
+
+def make_block(height: int):
+    balances = {ADDRESS: {"balances": {"PNT": height}, "deltas": {"PNT": 1}}}
+    return {"height": height, "rates": {"PEG": height / 100}, "balances": balances}
+
+
+class TestBlockEvents(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.events = BlockEvents(10, self.loop, size=3)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def append(self, *heights: int):
+        for height in heights:
+            self.events._append(make_block(height))
+
+    def wait(self, *args, **kwargs):
+        return self.loop.run_until_complete(self.events.wait(*args, **kwargs))
+
+    def test_buffered_blocks(self):
+        self.append(11, 12)
+        result = self.wait(10)
+        self.assertEqual(result, {"sync_head": 12, "complete": True, "events": [{"height": 11}, {"height": 12}]})
+
+        result = self.wait(11, addresses=[ADDRESS], rates=True)
+        self.assertEqual(result["events"], [make_block(12)])
+        result = self.wait(11, addresses=["FA1zT4aFpEvcnPqPCigB3fvGu4Q4mTXY22iiuV69DqE1pNhdF2MC"])
+        self.assertEqual(result["events"], [{"height": 12, "balances": {}}])
+
+    def test_incomplete(self):
+        self.append(11, 12, 13, 14)
+        self.assertEqual(self.wait(10), {"sync_head": 14, "complete": False, "events": []})
+        self.assertEqual(len(self.wait(11)["events"]), 3)
+        self.assertFalse(self.wait(20, timeout=0)["complete"])
+
+        # A gap means blocks were committed without being published
+        self.append(16)
+        self.assertFalse(self.wait(14)["complete"])
+        self.assertEqual(self.wait(15)["events"], [{"height": 16}])
+
+    def test_long_poll(self):
+        self.assertEqual(self.wait(10, timeout=0.01), {"sync_head": 10, "complete": True, "events": []})
+        self.assertEqual(self.events._waiters, [])
+
+        publisher = threading.Timer(0.05, self.events.publish, [make_block(11)])
+        publisher.start()
+        result = self.wait(10, timeout=5)
+        publisher.join()
+        self.assertEqual(result["events"], [{"height": 11}])
+
+    def test_balances_only_described_for_subscribers(self):
+        self.assertFalse(self.events.wants_balances())
+        self.events._append({"height": 11, "rates": None, "balances": None})
+        self.assertEqual(self.wait(11, timeout=0), {"sync_head": 11, "complete": True, "events": []})
+        self.assertFalse(self.wait(10, timeout=0)["complete"])
+
+        # Subscribers that called lately are about to call again
+        self.assertTrue(self.events.wants_balances())
+        self.append(12)
+        self.assertEqual(self.wait(11, addresses=[ADDRESS], rates=True)["events"], [make_block(12)])
+
+
+class FakeClient:
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    async def call_once(self, method, *args):
+        self.calls.append(args)
+        return self.results.pop(0)
+
+
+class TestSubscribeClient(unittest.TestCase):
+    def subscribe(self, results, timeout: float):
+        client = FakeClient(results)
+
+        def make_call(f, timeout):
+            self.assertLessEqual(timeout, 5)  # Within aiorpc's default on every call
+            return asyncio.new_event_loop().run_until_complete(f(client))
+
+        with mock.patch.object(rpc, "_make_call", side_effect=make_call):
+            return rpc.subscribe(10, timeout=timeout), client.calls
+
+    def test_calls_again_until_there_are_events(self):
+        nothing = {"sync_head": 10, "complete": True, "events": []}
+        block = {"sync_head": 11, "complete": True, "events": [{"height": 11}]}
+        result, calls = self.subscribe([nothing, nothing, block], timeout=30)
+        self.assertEqual(result, block)
+        self.assertEqual(len(calls), 3)
+        self.assertTrue(all(0 < call[3] <= 30 for call in calls))
+
+        result, calls = self.subscribe([nothing, block], timeout=0)
+        self.assertEqual(result, nothing)
+        self.assertEqual(len(calls), 1)
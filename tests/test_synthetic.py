@@ -0,0 +1,54 @@
+import random
+import unittest
+from collections import defaultdict
+
+import alchemy.consts as consts
+from alchemy.burning import parse_factoid_block
+from alchemy.synthetic import Ledger, burn_transaction, make_keys, opr_content
+from alchemy.opr import OPR
+from alchemy.transactions.models import TransactionEntry
+from alchemy.transactions.rates import ConversionRates
+
+
+class TestSynthetic(unittest.TestCase):
+    def test_burns_are_found_by_the_node(self):
+        rng = random.Random(0)
+        key = make_keys(1, rng)[0]
+        fblock = {"transactions": [burn_transaction(key, 5 * 10**8, False, rng)]}
+        burns = parse_factoid_block(fblock)
+        self.assertEqual(len(burns), 1)
+        self.assertEqual(burns[0].address, key.get_factoid_address().rcd_hash)
+        self.assertEqual(burns[0].amount, 5 * 10**8)
+        self.assertEqual(parse_factoid_block(fblock, is_testnet=True), [])
+
+    def test_opr_content_parses(self):
+        prices = {asset: 1.5 for asset in consts.ALL_ASSETS if asset != consts.PNT}
+        coinbase = make_keys(1, random.Random(0))[0].get_factoid_address().to_string()
+        content = opr_content(206422, coinbase, "miner-0", ["" for _ in range(10)], prices)
+        record = OPR.from_entry(bytes(32), [bytes(8), bytes(8), b"\x01"], content, 0)
+        self.assertIsNotNone(record)
+        self.assertEqual(record.height, 206422)
+
+    def test_transactions_execute_like_the_node(self):
+        rng = random.Random(1)
+        keys = make_keys(5, rng)
+        ledger = Ledger(keys)
+        rates = ConversionRates({asset: rng.uniform(0.01, 1000) for asset in consts.ALL_ASSETS})
+        node_balances = defaultdict(dict)
+        for key in keys:
+            ledger.credit(key.get_factoid_address().rcd_hash, "pFCT", 10**10)
+            node_balances[key.get_factoid_address().rcd_hash]["pFCT"] = 10**10
+
+        n_conversions = 0
+        for i in range(100):
+            external_ids, content = ledger.random_transaction_entry(rates, 0.5, str(i), rng)
+            tx_entry = TransactionEntry.from_entry(external_ids, content)
+            self.assertIsNotNone(tx_entry)
+            n_conversions += tx_entry.is_conversion()
+            # Same bookkeeping as alchemy.transactions.process_block
+            for address, balance_deltas in tx_entry.get_deltas(rates).items():
+                for ticker, delta in balance_deltas.items():
+                    node_balances[address][f"p{ticker}"] = node_balances[address].get(f"p{ticker}", 0) + delta
+                self.assertTrue(all(0 <= balance for balance in node_balances[address].values()))
+        self.assertTrue(0 < n_conversions < 100)
+        self.assertEqual(dict(node_balances), dict(ledger.balances))
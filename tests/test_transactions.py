@@ -1,9 +1,16 @@
+import hashlib
+import json
 import unittest
+from unittest import mock
 
 import numpy as np
 from factom_keys.fct import FactoidAddress, FactoidPrivateKey
 
+import alchemy.consts as consts
+import alchemy.decoding
 from alchemy.transactions import Transaction, TransactionEntry
+from alchemy.transactions.transactions import SignatureCache
+from tests.helpers import DatabaseTestCase
 
 
 class TestTransactions(unittest.TestCase):
@@ -464,3 +471,99 @@ class TestTransactionEntry(unittest.TestCase):
         external_ids, content = tx_entry.sign()
         tx_entry_from_entry = TransactionEntry.from_entry(external_ids, content)
         self.assertIsNone(tx_entry_from_entry)
+
+    @staticmethod
+    def sign_content(content: bytes, key: FactoidPrivateKey, timestamp: bytes = b"1565000000"):
+        """Signs arbitrary content the way TransactionEntry.sign does, returning the external ids"""
+        message = b"0" + timestamp + consts.TRANSACTIONS_CHAIN_ID.encode() + content
+        rcd = b"\x01" + key.get_factoid_address().key_bytes
+        return [timestamp, rcd, key.sign(hashlib.sha512(message).digest())]
+
+    def test_from_entry_contents(self):
+        signer = FactoidPrivateKey(key_string="Fs3E9gV6DXsYzf7Fqx1fVBQPQXV695eP3k5XbmHEZVRLkMdD9qCK")
+        address = signer.get_factoid_address().to_string()
+
+        def transfer(**overrides):
+            tx = {"input": {"address": address, "type": "PNT", "amount": 50}, "outputs": [{"address": address}]}
+            tx["input"].update(overrides)
+            return json.dumps({"transactions": [tx]}).encode()
+
+        cases = {
+            # name --> (content, should be valid)
+            "transfer": (transfer(), True),
+            "float amount": (transfer(amount=50.5), True),
+            "huge amount": (transfer(amount=10**30), True),
+            "NaN amount": (transfer(amount=50).replace(b'"amount": 50', b'"amount": NaN'), True),
+            "no transactions": (b'{"transactions": []}', True),
+            "negative amount": (transfer(amount=-1), False),
+            "boolean amount": (transfer(amount=True), False),
+            "unknown type": (transfer(type="DOGE"), False),
+            "list type": (transfer(type=["PNT"]), False),
+            "object type": (transfer(type={"PNT": 1}), False),
+            "address not a string": (transfer(address=5), False),
+            "transactions not a list": (b'{"transactions": {}}', False),
+            "payload a list": (b'["transactions"]', False),
+            "payload a string": (b'"transactions"', False),
+            "payload a number": (b"5", False),
+            "not json": (b"transactions", False),
+        }
+        for name, (content, should_be_valid) in cases.items():
+            external_ids = TestTransactionEntry.sign_content(content, signer)
+            tx_entry = TransactionEntry.from_entry(external_ids, content)
+            self.assertEqual(tx_entry is not None, should_be_valid, f'Case "{name}"')
+
+            # The stdlib json fallback must decode the entry exactly the same
+            with mock.patch.object(alchemy.decoding, "orjson", None):
+                reference = TransactionEntry.from_entry(external_ids, content)
+            self.assertEqual(
+                repr(tx_entry._txs if tx_entry is not None else None),
+                repr(reference._txs if reference is not None else None),
+                f'Case "{name}"',
+            )
+
+
+class TestSignatureCache(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+
+        signer = FactoidPrivateKey(key_string="Fs3E9gV6DXsYzf7Fqx1fVBQPQXV695eP3k5XbmHEZVRLkMdD9qCK")
+        tx = Transaction()
+        tx.set_input(address=signer.get_factoid_address(), asset_type="PNT", amount=50)
+        tx.add_output(address=signer.get_factoid_address(), amount=50)
+        tx_entry = TransactionEntry()
+        tx_entry.add_transaction(tx)
+        tx_entry.add_signer(signer)
+        self.external_ids, self.content = tx_entry.sign()
+        self.entry_hash = hashlib.sha256(self.content).digest()  # Any stable key will do for the cache
+
+    def from_entry(self, cache: SignatureCache):
+        """Returns the parsed entry and how many times signatures were verified"""
+        with mock.patch.object(
+            TransactionEntry, "_verify_signatures", wraps=TransactionEntry._verify_signatures
+        ) as verify:
+            tx_entry = TransactionEntry.from_entry(self.external_ids, self.content, self.entry_hash, cache)
+        return tx_entry, verify.call_count
+
+    def test_valid_verdict_skips_verification(self):
+        cache = SignatureCache(self.db)
+        tx_entry, verifications = self.from_entry(cache)
+        self.assertIsNotNone(tx_entry)
+        self.assertEqual(verifications, 1)
+        self.assertTrue(self.db.get_signature_verdict(self.entry_hash))
+
+        tx_entry, verifications = self.from_entry(cache)
+        self.assertIsNotNone(tx_entry)
+        self.assertEqual(verifications, 0)
+
+    def test_invalid_verdict_skips_verification(self):
+        self.db.put_signature_verdict(self.entry_hash, False)
+        tx_entry, verifications = self.from_entry(SignatureCache(self.db))
+        self.assertIsNone(tx_entry)
+        self.assertEqual(verifications, 0)
+
+    def test_reverify_ignores_verdicts(self):
+        self.db.put_signature_verdict(self.entry_hash, False)
+        tx_entry, verifications = self.from_entry(SignatureCache(self.db, reverify=True))
+        self.assertIsNotNone(tx_entry)
+        self.assertEqual(verifications, 1)
+        self.assertTrue(self.db.get_signature_verdict(self.entry_hash))  # The stale verdict is replaced